@@ -0,0 +1,39 @@
+"""
+RFID Platform - API Gateway Heartbeat Buffer
+Coalesces reader last-seen updates in memory for periodic batched writes
+"""
+
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+
+class HeartbeatBuffer:
+    """
+    Last-seen map of org_id -> reader_id -> timestamp
+    Repeated reads from a reader collapse into a single pending update
+    """
+
+    def __init__(self):
+        self._pending: Dict[str, Dict[str, datetime]] = {}
+
+    def __len__(self) -> int:
+        return sum(len(readers) for readers in self._pending.values())
+
+    def touch(self, org_id: str, reader_id: str, seen_at: Optional[datetime] = None):
+        """Record that a reader was seen"""
+        seen_at = seen_at or datetime.now(timezone.utc)
+        readers = self._pending.setdefault(org_id, {})
+        previous = readers.get(reader_id)
+        if previous is None or seen_at > previous:
+            readers[reader_id] = seen_at
+
+    def drain(self) -> Dict[str, Dict[str, datetime]]:
+        """Take every pending update, leaving the buffer empty"""
+        pending, self._pending = self._pending, {}
+        return pending
+
+    def restore(self, pending: Dict[str, Dict[str, datetime]]):
+        """Put back updates from a failed flush without losing newer ones"""
+        for org_id, readers in pending.items():
+            for reader_id, seen_at in readers.items():
+                self.touch(org_id, reader_id, seen_at)
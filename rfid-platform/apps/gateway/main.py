@@ -6,14 +6,14 @@ FastAPI service with HMAC authentication, rate limiting, and Redis Streams integ
 import asyncio
 import hashlib
 import hmac
-import json
 import time
-from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID
 
 import redis.asyncio as redis
 import structlog
-from fastapi import FastAPI, HTTPException, Request, Response, status
+from fastapi import FastAPI, HTTPException, Query, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from fastapi.responses import JSONResponse
@@ -23,15 +23,42 @@ from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
 from opentelemetry.instrumentation.redis import RedisInstrumentor
 from opentelemetry.sdk.trace import TracerProvider
 from opentelemetry.sdk.trace.export import BatchSpanProcessor
-from pydantic import BaseModel, Field, validator
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, generate_latest
+from pydantic import BaseModel, Field, ValidationError, validator
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
 from slowapi.util import get_remote_address
-from supabase import create_client, Client
 
 from .config import Settings
+from .db import Database
+from .heartbeats import HeartbeatBuffer
+from .metrics import (
+    EVENTS_ACCEPTED,
+    EVENTS_REJECTED,
+    HMAC_FAILURES,
+    READER_LOOKUP_CACHE,
+    READER_LOOKUP_DB,
+    REQUEST_LATENCY,
+    XADD_BATCH,
+    XADD_SINGLE,
+    GatewayStateCollector,
+)
 from .models import CloudEvent, HealthResponse, RFIDRead, ReaderHeartbeat
-from .utils import generate_idempotency_key, validate_hmac_signature
+from .rate_limit import TokenBucketLimiter
+from .reader_cache import ReaderCache
+from .rollups import build_rollup_query, choose_rollup, format_rollup_row, parse_group_by
+from .scans import PROTOBUF_CONTENT_TYPES, decode_scan_batch, encode_scan
+from .streams import StreamRegistrar, org_stream_key
+from .utils import (
+    create_body_mac,
+    decode_supabase_jwt,
+    get_claims_org_id,
+    parse_event_batch,
+    verify_body_mac,
+    validate_epc_format,
+    validate_hmac_signature,
+    validate_rssi,
+)
 
 # Configure structured logging
 structlog.configure(
@@ -81,7 +108,7 @@ app.add_middleware(
     allowed_hosts=settings.allowed_hosts
 )
 
-# Configure rate limiting
+# Configure per-IP rate limiting for unauthenticated endpoints
 limiter = Limiter(
     key_func=get_remote_address,
     storage_uri=settings.redis_url,
@@ -90,11 +117,64 @@ limiter = Limiter(
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
+# Per-device and per-org token buckets for authenticated ingest
+ingest_limiter = TokenBucketLimiter(
+    device_rate=settings.rate_limit_device_per_minute / 60,
+    device_burst=settings.rate_limit_device_burst,
+    org_rate=settings.rate_limit_org_per_minute / 60,
+    org_burst=settings.rate_limit_org_burst,
+    lease_size=settings.rate_limit_local_lease,
+    lease_ttl_seconds=settings.rate_limit_lease_ttl_seconds
+)
+
 # Initialize Redis client
 redis_client: Optional[redis.Redis] = None
 
-# Initialize Supabase client
-supabase: Optional[Client] = None
+# Initialize database pool
+db = Database(
+    settings.database_url,
+    min_size=settings.db_pool_min_size,
+    max_size=settings.db_pool_max_size,
+    command_timeout=settings.db_command_timeout,
+    statement_cache_size=settings.db_statement_cache_size
+)
+
+# Reader registry cache for HMAC authentication
+reader_cache = ReaderCache(
+    max_size=settings.reader_cache_size,
+    ttl_seconds=settings.reader_cache_ttl_seconds,
+    negative_ttl_seconds=settings.reader_cache_negative_ttl_seconds
+)
+reader_cache_task: Optional[asyncio.Task] = None
+
+# Registry of org streams consumed by the ingest workers
+stream_registrar = StreamRegistrar()
+# Approximate MAXLEN on every org stream XADD; None leaves trimming to the workers
+STREAM_MAXLEN = settings.stream_maxlen or None
+
+# Write-behind buffer for reader last_seen_at
+heartbeat_buffer = HeartbeatBuffer()
+heartbeat_flush_task: Optional[asyncio.Task] = None
+
+# Limiter, cache and buffer state is read at scrape time
+REGISTRY.register(GatewayStateCollector(ingest_limiter, reader_cache, heartbeat_buffer))
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    """Observe request latency by route template, keeping label cardinality bounded"""
+    start = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        REQUEST_LATENCY.labels(
+            request.method,
+            route.path if route else "unmatched",
+            str(status_code)
+        ).observe(time.perf_counter() - start)
 
 # Initialize OpenTelemetry
 def setup_telemetry():
@@ -121,7 +201,7 @@ def setup_telemetry():
 @app.on_event("startup")
 async def startup_event():
     """Initialize services on startup"""
-    global redis_client, supabase
+    global redis_client, reader_cache_task, heartbeat_flush_task
     
     logger.info("Starting RFID Platform API Gateway", version="1.0.0")
     
@@ -137,14 +217,20 @@ async def startup_event():
         logger.error("Failed to connect to Redis", error=str(e))
         raise
     
-    # Initialize Supabase
+    # Initialize database pool
     try:
-        supabase = create_client(settings.supabase_url, settings.supabase_service_key)
-        logger.info("Connected to Supabase", url=settings.supabase_url)
+        await db.connect()
+        logger.info("Connected to database", pool_max_size=settings.db_pool_max_size)
     except Exception as e:
-        logger.error("Failed to connect to Supabase", error=str(e))
+        logger.error("Failed to connect to database", error=str(e))
         raise
     
+    # Start reader cache invalidation from audit events
+    reader_cache_task = asyncio.create_task(watch_reader_changes())
+    
+    # Start write-behind reader heartbeat flushing
+    heartbeat_flush_task = asyncio.create_task(flush_reader_heartbeats_periodically())
+    
     logger.info("API Gateway startup complete")
 
 @app.on_event("shutdown")
@@ -154,9 +240,21 @@ async def shutdown_event():
     
     logger.info("Shutting down API Gateway")
     
+    if reader_cache_task:
+        reader_cache_task.cancel()
+    
+    if heartbeat_flush_task:
+        heartbeat_flush_task.cancel()
+    
+    # Persist heartbeats still buffered in memory
+    await flush_reader_heartbeats()
+    
     if redis_client:
         await redis_client.close()
         logger.info("Redis connection closed")
+    
+    await db.close()
+    logger.info("Database pool closed")
 
 @app.get("/v1/health", response_model=HealthResponse)
 async def health_check():
@@ -175,10 +273,9 @@ async def health_check():
     # Check Supabase connection
     supabase_healthy = False
     try:
-        if supabase:
-            # Simple query to test connection
-            result = supabase.table("orgs").select("id").limit(1).execute()
-            supabase_healthy = True
+        # Simple query to test connection
+        await db.fetchval("SELECT 1")
+        supabase_healthy = True
     except Exception:
         pass
     
@@ -196,93 +293,67 @@ async def health_check():
     )
 
 @app.post("/v1/ingest/rfid")
-@limiter.limit("1000/minute")
-async def ingest_rfid_read(
-    request: Request,
-    event: CloudEvent
-) -> JSONResponse:
+async def ingest_rfid_read(request: Request) -> JSONResponse:
     """
     Ingest RFID read data via CloudEvents format
-    Validates HMAC signature and publishes to Redis Streams
+    Validates HMAC signature and publishes to Redis Streams; the event is only parsed once authenticated
     """
     tracer = trace.get_tracer(__name__)
     
     with tracer.start_as_current_span("ingest_rfid_read") as span:
-        span.set_attribute("event.type", event.type)
-        span.set_attribute("event.source", event.source)
-        span.set_attribute("event.id", event.id)
-        
         try:
-            # Validate HMAC signature
-            device_id = request.headers.get("X-Device-ID")
-            timestamp = request.headers.get("X-Timestamp")
-            signature = request.headers.get("X-Signature")
-            
-            if not all([device_id, timestamp, signature]):
-                logger.warning("Missing required headers", device_id=device_id)
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail="Missing required headers: X-Device-ID, X-Timestamp, X-Signature"
-                )
+            # Authenticate device headers and look up the reader
+            device_id, timestamp, signature, reader = await authenticate_device(request)
+            org_id = reader["org_id"]
             
-            # Validate timestamp (prevent replay attacks)
-            try:
-                request_time = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
-                current_time = datetime.now(timezone.utc)
-                time_diff = abs((current_time - request_time).total_seconds())
+            if settings.hmac_signature_mode == "raw":
+                # Validate HMAC signature over the body bytes as they arrive
+                body = await read_signed_body(request, reader, device_id, timestamp, signature)
+                event = parse_cloud_event(body)
+            else:
+                body = await request.body()
+                event = parse_cloud_event(body)
                 
-                if time_diff > 300:  # 5 minutes tolerance
-                    logger.warning("Request timestamp too old", time_diff=time_diff)
+                # Validate HMAC signature over the canonical event JSON
+                if not validate_hmac_signature(
+                    event.dict(),
+                    reader["api_key_hash"],
+                    timestamp,
+                    signature
+                ):
+                    logger.warning("Invalid HMAC signature", device_id=device_id)
+                    HMAC_FAILURES.labels("canonical").inc()
                     raise HTTPException(
                         status_code=status.HTTP_401_UNAUTHORIZED,
-                        detail="Request timestamp too old"
+                        detail="Invalid signature"
                     )
-            except ValueError:
-                logger.warning("Invalid timestamp format", timestamp=timestamp)
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail="Invalid timestamp format"
-                )
             
-            # Get reader info from database
-            reader_result = supabase.table("readers").select("*").eq("device_id", device_id).execute()
-            if not reader_result.data:
-                logger.warning("Unknown device", device_id=device_id)
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail="Unknown device"
-                )
+            # Only authenticated requests spend the device's and org's tokens
+            await enforce_rate_limit(org_id, device_id, cost=1)
             
-            reader = reader_result.data[0]
-            org_id = reader["org_id"]
+            span.set_attribute("event.type", event.type)
+            span.set_attribute("event.source", event.source)
+            span.set_attribute("event.id", event.id)
             
-            # Validate HMAC signature
-            if not validate_hmac_signature(
-                event.dict(),
-                reader["api_key_hash"],
-                timestamp,
-                signature
-            ):
-                logger.warning("Invalid HMAC signature", device_id=device_id)
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail="Invalid signature"
-                )
-            
-            # Update reader last seen
-            await update_reader_heartbeat(reader["id"])
+            # Record reader last seen; flushed in the background
+            heartbeat_buffer.touch(org_id, reader["id"])
             
             # Publish to Redis Stream
-            stream_key = f"org:{org_id}:rfid"
-            message_id = await redis_client.xadd(
-                stream_key,
-                {
-                    "event": json.dumps(event.dict()),
-                    "device_id": device_id,
-                    "timestamp": timestamp,
-                    "processed_at": datetime.now(timezone.utc).isoformat()
-                }
-            )
+            stream_key = org_stream_key(org_id)
+            await stream_registrar.register(redis_client, stream_key)
+            with XADD_SINGLE.time():
+                message_id = await redis_client.xadd(
+                    stream_key,
+                    {
+                        "event": event.json(),
+                        "device_id": device_id,
+                        "timestamp": timestamp,
+                        "processed_at": datetime.now(timezone.utc).isoformat()
+                    },
+                    maxlen=STREAM_MAXLEN,
+                    approximate=True
+                )
+            EVENTS_ACCEPTED.inc()
             
             logger.info(
                 "RFID read ingested",
@@ -316,6 +387,233 @@ async def ingest_rfid_read(
                 detail="Internal server error"
             )
 
+@app.post("/v1/ingest/rfid/batch")
+async def ingest_rfid_batch(request: Request) -> JSONResponse:
+    """
+    Ingest a batch of RFID reads as a CloudEvents JSON batch, NDJSON or length-delimited weft.Scan protobuf
+    One HMAC over the raw body, one reader lookup and one pipelined XADD round trip
+    """
+    tracer = trace.get_tracer(__name__)
+    
+    with tracer.start_as_current_span("ingest_rfid_batch") as span:
+        try:
+            device_id, timestamp, signature, reader = await authenticate_device(request)
+            org_id = reader["org_id"]
+            
+            # Validate HMAC signature over the whole body as it arrives
+            body = await read_signed_body(request, reader, device_id, timestamp, signature)
+            
+            content_type = request.headers.get("content-type", "")
+            processed_at = datetime.now(timezone.utc).isoformat()
+            
+            try:
+                if content_type.split(";")[0].strip().lower() in PROTOBUF_CONTENT_TYPES:
+                    results, entries = build_scan_entries(body, org_id, reader["id"])
+                else:
+                    results, entries = build_event_entries(body, content_type, device_id, timestamp, processed_at)
+            except ValueError as e:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=str(e)
+                )
+            
+            # One token per event in the batch, spent only once the body is authenticated
+            await enforce_rate_limit(org_id, device_id, cost=max(1, len(results)))
+            
+            # Record reader last seen; flushed in the background
+            heartbeat_buffer.touch(org_id, reader["id"])
+            
+            # Publish all events to the org stream in one round trip
+            stream_key = org_stream_key(org_id)
+            await stream_registrar.register(redis_client, stream_key)
+            
+            if entries:
+                with XADD_BATCH.time():
+                    async with redis_client.pipeline(transaction=False) as pipe:
+                        for _, fields in entries:
+                            pipe.xadd(stream_key, fields, maxlen=STREAM_MAXLEN, approximate=True)
+                        message_ids = await pipe.execute(raise_on_error=False)
+                
+                for (index, _), message_id in zip(entries, message_ids):
+                    if isinstance(message_id, Exception):
+                        results[index].update(status="rejected", error="Failed to publish event")
+                        logger.error("Failed to publish batch event", index=index, error=str(message_id))
+                    else:
+                        results[index]["message_id"] = message_id
+            
+            accepted = sum(1 for result in results if result["status"] == "accepted")
+            EVENTS_ACCEPTED.inc(accepted)
+            EVENTS_REJECTED.inc(len(results) - accepted)
+            
+            logger.info(
+                "RFID batch ingested",
+                org_id=org_id,
+                device_id=device_id,
+                stream_key=stream_key,
+                accepted=accepted,
+                rejected=len(results) - accepted
+            )
+            
+            span.set_attribute("org_id", org_id)
+            span.set_attribute("device_id", device_id)
+            span.set_attribute("batch.size", len(results))
+            span.set_attribute("batch.accepted", accepted)
+            
+            return JSONResponse(
+                status_code=status.HTTP_202_ACCEPTED if accepted else status.HTTP_400_BAD_REQUEST,
+                content={
+                    "message": f"{accepted} of {len(results)} RFID reads accepted",
+                    "org_id": org_id,
+                    "accepted": accepted,
+                    "rejected": len(results) - accepted,
+                    "results": results
+                }
+            )
+            
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error("Error ingesting RFID batch", error=str(e), exc_info=True)
+            span.record_exception(e)
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Internal server error"
+            )
+
+async def read_signed_body(
+    request: Request,
+    reader: Dict[str, Any],
+    device_id: str,
+    timestamp: str,
+    signature: str
+) -> bytes:
+    """
+    Read the request body while feeding each chunk straight into its HMAC
+    Oversized bodies are refused before they are fully buffered
+    """
+    mac = create_body_mac(reader["api_key_hash"], timestamp)
+    chunks = []
+    size = 0
+    
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > settings.batch_max_bytes:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"Request body exceeds {settings.batch_max_bytes} bytes"
+            )
+        mac.update(chunk)
+        chunks.append(chunk)
+    
+    if not verify_body_mac(mac, signature):
+        logger.warning("Invalid HMAC signature", device_id=device_id)
+        HMAC_FAILURES.labels("raw").inc()
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid signature"
+        )
+    
+    return b"".join(chunks)
+
+
+def parse_cloud_event(body: bytes) -> CloudEvent:
+    """Parse a single CloudEvent from a request body"""
+    try:
+        return CloudEvent.parse_raw(body)
+    except ValidationError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=e.errors()
+        )
+
+
+def build_event_entries(
+    body: bytes,
+    content_type: str,
+    device_id: str,
+    timestamp: str,
+    processed_at: str
+) -> Tuple[List[Dict[str, Any]], List[Tuple[int, Dict[str, Any]]]]:
+    """
+    Validate a CloudEvents JSON or NDJSON batch
+    Returns per-event results and the stream fields of each accepted event
+    """
+    items = parse_event_batch(body, content_type)
+    if len(items) > settings.batch_max_events:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Batch exceeds {settings.batch_max_events} events"
+        )
+    
+    # Validate every event; invalid ones are rejected individually
+    results: List[Dict[str, Any]] = []
+    entries: List[Tuple[int, Dict[str, Any]]] = []
+    for index, (item, error) in enumerate(items):
+        if error is None:
+            try:
+                event = CloudEvent(**item)
+                entries.append((index, {
+                    "event": event.json(),
+                    "device_id": device_id,
+                    "timestamp": timestamp,
+                    "processed_at": processed_at
+                }))
+                results.append({"index": index, "id": item.get("id"), "status": "accepted"})
+                continue
+            except (TypeError, ValueError) as e:
+                error = str(e)
+        
+        event_id = item.get("id") if isinstance(item, dict) else None
+        results.append({"index": index, "id": event_id, "status": "rejected", "error": error})
+    
+    return results, entries
+
+
+def build_scan_entries(
+    body: bytes,
+    org_id: str,
+    reader_id: str
+) -> Tuple[List[Dict[str, Any]], List[Tuple[int, Dict[str, Any]]]]:
+    """
+    Validate a length-delimited weft.Scan batch
+    Tenant and reader come from the authenticated device, never from the payload;
+    each accepted scan is re-encoded as a single binary stream field
+    """
+    try:
+        scans = decode_scan_batch(body)
+    except ValueError as e:
+        raise ValueError(f"Invalid protobuf batch: {e}")
+    
+    if len(scans) > settings.batch_max_events:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Batch exceeds {settings.batch_max_events} events"
+        )
+    
+    results: List[Dict[str, Any]] = []
+    entries: List[Tuple[int, Dict[str, Any]]] = []
+    for index, scan in enumerate(scans):
+        if not validate_epc_format(scan["tag_id"]):
+            error = "Invalid EPC format"
+        elif scan["ts_ms"] <= 0:
+            error = "Missing ts_ms"
+        elif not scan["antenna"]:
+            error = "Missing antenna"
+        elif not validate_rssi(scan["rssi"]):
+            error = "Invalid rssi"
+        else:
+            # The org is implied by the stream key
+            scan["tenant_id"] = ""
+            scan["reader_id"] = reader_id
+            entries.append((index, {"scan": encode_scan(scan)}))
+            results.append({"index": index, "id": scan["tag_id"], "status": "accepted"})
+            continue
+        
+        results.append({"index": index, "id": scan["tag_id"] or None, "status": "rejected", "error": error})
+    
+    return results, entries
+
+
 @app.post("/v1/readers/heartbeat")
 @limiter.limit("60/minute")
 async def reader_heartbeat(
@@ -325,23 +623,27 @@ async def reader_heartbeat(
     """Update reader heartbeat and status"""
     try:
         # Validate device
-        reader_result = supabase.table("readers").select("*").eq("device_id", heartbeat.device_id).execute()
-        if not reader_result.data:
+        reader = await db.fetchrow(
+            "SELECT id FROM readers WHERE device_id = $1 LIMIT 1",
+            heartbeat.device_id
+        )
+        if not reader:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Reader not found"
             )
         
-        reader = reader_result.data[0]
-        
         # Update reader status
-        update_data = {
-            "last_seen_at": datetime.now(timezone.utc).isoformat(),
-            "status": heartbeat.status,
-            "metadata": heartbeat.metadata or {}
-        }
-        
-        supabase.table("readers").update(update_data).eq("id", reader["id"]).execute()
+        await db.execute(
+            """
+            UPDATE readers
+            SET last_seen_at = NOW(), status = $2::reader_status, metadata = $3::jsonb
+            WHERE id = $1
+            """,
+            reader["id"],
+            heartbeat.status,
+            heartbeat.metadata or {}
+        )
         
         logger.info("Reader heartbeat updated", device_id=heartbeat.device_id, status=heartbeat.status)
         
@@ -359,32 +661,275 @@ async def reader_heartbeat(
             detail="Internal server error"
         )
 
+@app.get("/v1/reads/rollups")
+async def query_read_rollups(
+    request: Request,
+    start: datetime = Query(..., alias="from", description="Range start, inclusive"),
+    end: datetime = Query(..., alias="to", description="Range end, exclusive"),
+    step: int = Query(3600, description="Bucket width in seconds"),
+    group_by: Optional[str] = Query(None, description="Comma separated: reader, antenna, location"),
+    reader_id: Optional[UUID] = Query(None),
+    antenna: Optional[int] = Query(None),
+    location_id: Optional[UUID] = Query(None)
+) -> JSONResponse:
+    """
+    Reads per time bucket for the caller's org, from the minute or hour rollups
+    Served from the coarsest rollup whose buckets tile the range and step
+    """
+    org_id = authenticate_user(request)
+    
+    try:
+        granularity = choose_rollup(start, end, step)
+        columns = parse_group_by(group_by)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=str(e)
+        )
+    
+    query, args = build_rollup_query(
+        org_id,
+        granularity,
+        start,
+        end,
+        step,
+        group_by=columns,
+        reader_id=str(reader_id) if reader_id else None,
+        antenna=antenna,
+        location_id=str(location_id) if location_id else None
+    )
+    
+    try:
+        rows = await db.fetch(query, *args)
+    except Exception as e:
+        logger.error("Error querying read rollups", org_id=org_id, granularity=granularity, error=str(e))
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error"
+        )
+    
+    return JSONResponse(
+        status_code=status.HTTP_200_OK,
+        content={
+            "org_id": org_id,
+            "granularity": granularity,
+            "step": step,
+            "buckets": [format_rollup_row(row, columns) for row in rows]
+        }
+    )
+
 @app.get("/v1/metrics")
 async def get_metrics():
     """Prometheus metrics endpoint"""
     if not settings.metrics_enabled:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
     
-    # Basic metrics
-    metrics = {
-        "rfid_platform_gateway_requests_total": 0,
-        "rfid_platform_gateway_errors_total": 0,
-        "rfid_platform_gateway_response_time_seconds": 0.0
-    }
-    
     return Response(
-        content="\n".join([f"{name} {value}" for name, value in metrics.items()]),
-        media_type="text/plain"
+        content=generate_latest(REGISTRY),
+        media_type=CONTENT_TYPE_LATEST
     )
 
-async def update_reader_heartbeat(reader_id: str):
-    """Update reader last seen timestamp"""
+async def authenticate_device(request: Request) -> Tuple[str, str, str, Dict[str, Any]]:
+    """
+    Validate device auth headers and timestamp, then look up the reader
+    Returns (device_id, timestamp, signature, reader); signature checks are left to the caller
+    """
+    device_id = request.headers.get("X-Device-ID")
+    timestamp = request.headers.get("X-Timestamp")
+    signature = request.headers.get("X-Signature")
+    
+    if not all([device_id, timestamp, signature]):
+        logger.warning("Missing required headers", device_id=device_id)
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Missing required headers: X-Device-ID, X-Timestamp, X-Signature"
+        )
+    
+    # Validate timestamp (prevent replay attacks)
+    try:
+        request_time = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+        current_time = datetime.now(timezone.utc)
+        time_diff = abs((current_time - request_time).total_seconds())
+        
+        if time_diff > 300:  # 5 minutes tolerance
+            logger.warning("Request timestamp too old", time_diff=time_diff)
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Request timestamp too old"
+            )
+    except ValueError:
+        logger.warning("Invalid timestamp format", timestamp=timestamp)
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid timestamp format"
+        )
+    
+    # Get reader info from cache or database
+    reader = await get_reader(device_id)
+    if not reader:
+        logger.warning("Unknown device", device_id=device_id)
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Unknown device"
+        )
+    
+    return device_id, timestamp, signature, reader
+
+def authenticate_user(request: Request) -> str:
+    """
+    Verify the Supabase access token in the Authorization header
+    Returns the caller's org_id; the query API is disabled without SUPABASE_JWT_SECRET
+    """
+    if not settings.supabase_jwt_secret:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Query API is not configured"
+        )
+    
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Missing bearer token",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    
+    try:
+        claims = decode_supabase_jwt(token, settings.supabase_jwt_secret, settings.supabase_jwt_audience)
+    except ValueError as e:
+        logger.warning("Invalid access token", error=str(e))
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid access token",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    
+    org_id = get_claims_org_id(claims)
+    if not org_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access token has no org_id claim"
+        )
+    
+    return org_id
+
+async def enforce_rate_limit(org_id: str, device_id: str, cost: int = 1):
+    """Spend cost tokens (one per event) from the device and org buckets, or reject with 429"""
+    if not settings.rate_limiting_enabled:
+        return
+    
     try:
-        supabase.table("readers").update({
-            "last_seen_at": datetime.now(timezone.utc).isoformat()
-        }).eq("id", reader_id).execute()
+        allowed, retry_after = await ingest_limiter.acquire(redis_client, org_id, device_id, cost=cost)
     except Exception as e:
-        logger.error("Failed to update reader heartbeat", reader_id=reader_id, error=str(e))
+        # Fail open; ingest itself still depends on Redis
+        logger.error("Rate limit check failed", org_id=org_id, device_id=device_id, error=str(e))
+        return
+    
+    if not allowed:
+        logger.warning(
+            "Rate limit exceeded",
+            org_id=org_id,
+            device_id=device_id,
+            throttled=ingest_limiter.throttled[org_id]
+        )
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Rate limit exceeded",
+            headers={"Retry-After": str(retry_after)}
+        )
+
+async def get_reader(device_id: str) -> Optional[Dict[str, Any]]:
+    """Get the authentication record for a device, served from the reader cache"""
+    start = time.perf_counter()
+    hit, reader = reader_cache.get(device_id)
+    if hit:
+        READER_LOOKUP_CACHE.observe(time.perf_counter() - start)
+        return reader
+    
+    row = await db.fetchrow(
+        "SELECT id::text, org_id, api_key_hash FROM readers WHERE device_id = $1 LIMIT 1",
+        device_id
+    )
+    READER_LOOKUP_DB.observe(time.perf_counter() - start)
+    
+    reader = dict(row) if row else None
+    reader_cache.set(device_id, reader)
+    return reader
+
+async def watch_reader_changes():
+    """
+    Keep the reader cache coherent with the readers table
+    Polls the audit.*.readers events emitted by audit_trigger_function
+    """
+    # created_at is the writing transaction's start, so a change can commit with a
+    # timestamp behind ones already seen. Every poll re-reads one cache TTL back and
+    # skips event IDs it has applied; entries older than that have expired anyway.
+    started = datetime.now(timezone.utc)
+    lookback = timedelta(seconds=settings.reader_cache_ttl_seconds)
+    seen: Dict[Any, datetime] = {}
+    page_size = 500
+    
+    while True:
+        await asyncio.sleep(settings.reader_cache_poll_interval_seconds)
+        try:
+            floor = max(started, datetime.now(timezone.utc) - lookback)
+            seen = {event_id: created_at for event_id, created_at in seen.items() if created_at >= floor}
+            
+            # Served by the idx_events_reader_audit partial index
+            events = await db.fetch(
+                """
+                SELECT id, payload, created_at
+                FROM events
+                WHERE type LIKE 'audit.%.readers' AND created_at >= $1 AND NOT (id = ANY($2::uuid[]))
+                ORDER BY created_at
+                LIMIT $3
+                """,
+                floor,
+                list(seen),
+                page_size
+            )
+            
+            if len(events) >= page_size:
+                # Too many changes to apply one by one; start from a cold cache
+                reader_cache.clear()
+                logger.info("Reader cache cleared", changes=len(events))
+            else:
+                for event in events:
+                    reader_cache.apply_audit_event(event["payload"])
+            
+            for event in events:
+                seen[event["id"]] = event["created_at"]
+            if events:
+                logger.debug("Applied reader changes", changes=len(events), cache_size=len(reader_cache))
+        except Exception as e:
+            logger.error("Failed to poll reader changes", error=str(e))
+
+async def flush_reader_heartbeats():
+    """Write buffered last_seen_at values as one UPDATE per org"""
+    pending = heartbeat_buffer.drain()
+    
+    for org_id, readers in pending.items():
+        try:
+            await db.execute(
+                """
+                UPDATE readers
+                SET last_seen_at = GREATEST(readers.last_seen_at, seen.last_seen_at)
+                FROM unnest($2::uuid[], $3::timestamptz[]) AS seen(id, last_seen_at)
+                WHERE readers.org_id = $1 AND readers.id = seen.id
+                """,
+                org_id,
+                list(readers.keys()),
+                list(readers.values())
+            )
+        except Exception as e:
+            logger.error("Failed to flush reader heartbeats", org_id=org_id, readers=len(readers), error=str(e))
+            heartbeat_buffer.restore({org_id: readers})
+
+async def flush_reader_heartbeats_periodically():
+    """Flush buffered reader heartbeats every heartbeat_flush_interval_seconds"""
+    while True:
+        await asyncio.sleep(settings.heartbeat_flush_interval_seconds)
+        await flush_reader_heartbeats()
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,109 @@
+"""
+RFID Platform - API Gateway Metrics
+Prometheus instruments for the gateway; in-memory counters are read at scrape time
+"""
+
+from typing import Iterator
+
+from prometheus_client import Counter, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.registry import Collector
+
+LATENCY_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+)
+
+REQUEST_LATENCY = Histogram(
+    "rfid_platform_gateway_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+
+READER_LOOKUP_LATENCY = Histogram(
+    "rfid_platform_gateway_reader_lookup_duration_seconds",
+    "Device to reader lookup latency",
+    ["source"],
+    buckets=LATENCY_BUCKETS,
+)
+
+HMAC_FAILURES = Counter(
+    "rfid_platform_gateway_hmac_failures_total",
+    "Requests rejected for an invalid signature",
+    ["mode"],
+)
+
+XADD_LATENCY = Histogram(
+    "rfid_platform_gateway_xadd_duration_seconds",
+    "Redis stream publish latency, one pipeline per batch",
+    ["endpoint"],
+    buckets=LATENCY_BUCKETS,
+)
+
+EVENTS = Counter(
+    "rfid_platform_gateway_events_total", "Ingested events by outcome", ["status"]
+)
+
+# Bound once; labels() is a dict lookup under a lock on every call
+READER_LOOKUP_CACHE = READER_LOOKUP_LATENCY.labels("cache")
+READER_LOOKUP_DB = READER_LOOKUP_LATENCY.labels("db")
+XADD_SINGLE = XADD_LATENCY.labels("single")
+XADD_BATCH = XADD_LATENCY.labels("batch")
+EVENTS_ACCEPTED = EVENTS.labels("accepted")
+EVENTS_REJECTED = EVENTS.labels("rejected")
+
+
+class GatewayStateCollector(Collector):
+    """Exposes rate limiter, reader cache and heartbeat buffer state"""
+
+    def __init__(self, ingest_limiter, reader_cache, heartbeat_buffer):
+        self.ingest_limiter = ingest_limiter
+        self.reader_cache = reader_cache
+        self.heartbeat_buffer = heartbeat_buffer
+
+    def collect(self) -> Iterator:
+        throttled = CounterMetricFamily(
+            "rfid_platform_gateway_throttled",
+            "Ingest requests rejected by the token buckets",
+            labels=["org_id"],
+        )
+        for org_id, count in list(self.ingest_limiter.throttled.items()):
+            throttled.add_metric([org_id], count)
+        yield throttled
+
+        yield CounterMetricFamily(
+            "rfid_platform_gateway_rate_limit_local_hits",
+            "Ingest requests admitted from a local token lease without Redis",
+            value=self.ingest_limiter.local_hits,
+        )
+
+        cache = CounterMetricFamily(
+            "rfid_platform_gateway_reader_cache_lookups",
+            "Reader cache lookups by result",
+            labels=["result"],
+        )
+        cache.add_metric(["hit"], self.reader_cache.hits)
+        cache.add_metric(["miss"], self.reader_cache.misses)
+        yield cache
+
+        yield GaugeMetricFamily(
+            "rfid_platform_gateway_reader_cache_entries",
+            "Devices held in the reader cache",
+            value=len(self.reader_cache),
+        )
+        yield GaugeMetricFamily(
+            "rfid_platform_gateway_heartbeats_buffered",
+            "Reader heartbeats waiting to be flushed",
+            value=len(self.heartbeat_buffer),
+        )
@@ -0,0 +1,113 @@
+"""
+RFID Platform - API Gateway Reader Cache
+In-process TTL + LRU cache of reader records used for HMAC authentication
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+# Only the fields needed to authenticate a request are cached
+READER_CACHE_FIELDS = ("id", "org_id", "api_key_hash")
+
+
+def reader_cache_record(reader: Dict[str, Any]) -> Dict[str, Any]:
+    """Reduce a reader row to the fields kept in the cache"""
+    return {field: reader.get(field) for field in READER_CACHE_FIELDS}
+
+
+class ReaderCache:
+    """
+    TTL + LRU cache of reader records keyed by device_id
+    Unknown devices are cached as None with a shorter TTL
+    """
+
+    def __init__(
+        self,
+        max_size: int = 10000,
+        ttl_seconds: float = 60.0,
+        negative_ttl_seconds: float = 10.0,
+    ):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[float, Optional[Dict[str, Any]]]]" = (
+            OrderedDict()
+        )
+        self._device_by_reader: Dict[str, str] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, device_id: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """
+        Look up a device
+        Returns (hit, record); record is None for a cached unknown device
+        """
+        entry = self._entries.get(device_id)
+        if entry is None:
+            self.misses += 1
+            return False, None
+
+        expires_at, record = entry
+        if expires_at <= time.monotonic():
+            self._evict(device_id)
+            self.misses += 1
+            return False, None
+
+        self._entries.move_to_end(device_id)
+        self.hits += 1
+        return True, record
+
+    def set(self, device_id: str, reader: Optional[Dict[str, Any]]):
+        """Cache a reader record, or None for an unknown device"""
+        record = reader_cache_record(reader) if reader else None
+        ttl = self.ttl_seconds if record else self.negative_ttl_seconds
+
+        if record:
+            # A reader whose device_id changed must not stay reachable under the old one
+            previous_device = self._device_by_reader.get(record["id"])
+            if previous_device and previous_device != device_id:
+                self._evict(previous_device)
+            self._device_by_reader[record["id"]] = device_id
+
+        self._entries[device_id] = (time.monotonic() + ttl, record)
+        self._entries.move_to_end(device_id)
+
+        while len(self._entries) > self.max_size:
+            oldest = next(iter(self._entries))
+            self._evict(oldest)
+
+    def invalidate(self, device_id: str):
+        """Drop a device from the cache"""
+        self._evict(device_id)
+
+    def clear(self):
+        """Drop every cached device"""
+        self._entries.clear()
+        self._device_by_reader.clear()
+
+    def apply_audit_event(self, payload: Dict[str, Any]):
+        """
+        Apply an audit.<op>.readers event emitted by audit_trigger_function
+        Inserts and updates refresh the entry in place, deletes evict it
+        """
+        old = payload.get("old") or {}
+        new = payload.get("new") or {}
+
+        if old.get("device_id"):
+            self.invalidate(old["device_id"])
+            if old.get("id"):
+                self._device_by_reader.pop(old["id"], None)
+
+        if new.get("device_id") and new.get("id"):
+            self.set(new["device_id"], new)
+
+    def _evict(self, device_id: str):
+        entry = self._entries.pop(device_id, None)
+        if entry and entry[1]:
+            reader_id = entry[1]["id"]
+            if self._device_by_reader.get(reader_id) == device_id:
+                del self._device_by_reader[reader_id]
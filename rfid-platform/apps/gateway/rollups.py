@@ -0,0 +1,127 @@
+"""
+RFID Platform - API Gateway Read Rollups
+Answers time-bucketed read queries from the coarsest rollup table that can
+"""
+
+from datetime import datetime, timezone
+from typing import Any, List, Optional, Sequence, Tuple
+
+# Coarsest first: granularity -> (table, bucket width in seconds)
+ROLLUP_TABLES = {
+    "hour": ("read_rollups_1h", 3600),
+    "minute": ("read_rollups_1m", 60),
+}
+
+# Dimensions a query can group by -> rollup column
+GROUP_BY_COLUMNS = {
+    "reader": "reader_id",
+    "antenna": "antenna",
+    "location": "location_id",
+}
+
+MAX_BUCKETS = 10000  # output buckets per query, per group
+
+
+def _aligned(value: datetime, seconds: int) -> bool:
+    return int(value.timestamp()) % seconds == 0 and value.microsecond == 0
+
+
+def choose_rollup(start: datetime, end: datetime, step_seconds: int) -> str:
+    """
+    Coarsest granularity whose buckets tile the requested range and step exactly
+    Raises ValueError if no rollup can answer the query
+    """
+    if start.tzinfo is None or end.tzinfo is None:
+        raise ValueError("from and to must include a timezone")
+    if end <= start:
+        raise ValueError("to must be after from")
+    if step_seconds <= 0:
+        raise ValueError("step must be positive")
+    if (end - start).total_seconds() / step_seconds > MAX_BUCKETS:
+        raise ValueError(
+            f"Query spans more than {MAX_BUCKETS} buckets; use a larger step"
+        )
+
+    for granularity, (_, width) in ROLLUP_TABLES.items():
+        if (
+            step_seconds % width == 0
+            and _aligned(start, width)
+            and _aligned(end, width)
+        ):
+            return granularity
+
+    raise ValueError("from, to and step must be whole minutes")
+
+
+def parse_group_by(spec: Optional[str]) -> List[str]:
+    """Rollup columns for a comma separated group_by, e.g. "reader,antenna" """
+    columns = []
+    for name in filter(None, (part.strip() for part in (spec or "").split(","))):
+        if name not in GROUP_BY_COLUMNS:
+            raise ValueError(
+                f"group_by must be a subset of: {sorted(GROUP_BY_COLUMNS)}"
+            )
+        if GROUP_BY_COLUMNS[name] not in columns:
+            columns.append(GROUP_BY_COLUMNS[name])
+    return columns
+
+
+def build_rollup_query(
+    org_id: str,
+    granularity: str,
+    start: datetime,
+    end: datetime,
+    step_seconds: int,
+    group_by: Sequence[str] = (),
+    reader_id: Optional[str] = None,
+    antenna: Optional[int] = None,
+    location_id: Optional[str] = None,
+) -> Tuple[str, List[Any]]:
+    """
+    SQL and arguments re-bucketing a rollup table to step_seconds
+    Only whitelisted table and column names are interpolated; values are parameters
+    """
+    table, _ = ROLLUP_TABLES[granularity]
+    args: List[Any] = [org_id, start, end, step_seconds]
+    filters = ["org_id = $1", "bucket >= $2", "bucket < $3"]
+
+    for column, value, cast in (
+        ("reader_id", reader_id, "::uuid"),
+        ("antenna", antenna, ""),
+        ("location_id", location_id, "::uuid"),
+    ):
+        if value is not None:
+            args.append(value)
+            filters.append(f"{column} = ${len(args)}{cast}")
+
+    dimensions = "".join(f", {column}" for column in group_by)
+    query = f"""
+        SELECT
+            date_bin($4::int * INTERVAL '1 second', bucket, $2) AS bucket{dimensions},
+            SUM(reads) AS reads,
+            SUM(rssi_sum) / SUM(reads) AS avg_rssi,
+            MIN(rssi_min) AS min_rssi,
+            MAX(rssi_max) AS max_rssi
+        FROM {table}
+        WHERE {" AND ".join(filters)}
+        GROUP BY 1{dimensions}
+        ORDER BY 1{dimensions}
+    """
+    return query, args
+
+
+def format_rollup_row(row: Any, group_by: Sequence[str]) -> dict:
+    """JSON-ready bucket from a rollup query row"""
+    bucket = {"bucket": row["bucket"].astimezone(timezone.utc).isoformat()}
+    for column in group_by:
+        value = row[column]
+        bucket[column] = (
+            str(value) if column.endswith("_id") and value is not None else value
+        )
+    bucket.update(
+        reads=int(row["reads"]),
+        avg_rssi=round(float(row["avg_rssi"]), 2),
+        min_rssi=float(row["min_rssi"]),
+        max_rssi=float(row["max_rssi"]),
+    )
+    return bucket
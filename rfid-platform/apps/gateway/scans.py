@@ -0,0 +1,175 @@
+"""
+RFID Platform - Scan Wire Format
+Minimal protobuf codec for weft.Scan (proto/scans.proto), used by the API gateway and ingest worker
+Each app builds from its own Docker context, so this file is kept as an identical
+copy in apps/gateway and apps/ingest-worker; test_gateway.py fails if they drift
+"""
+
+import struct
+from typing import Any, Dict, Iterator, List, Tuple
+
+PROTOBUF_CONTENT_TYPES = (
+    "application/x-protobuf",
+    "application/protobuf",
+    "application/vnd.google.protobuf",
+)
+
+# Wire types
+VARINT = 0
+FIXED64 = 1
+LENGTH_DELIMITED = 2
+FIXED32 = 5
+
+# weft.Scan field numbers
+TENANT_ID = 1
+TAG_ID = 2
+TS_MS = 3
+SOURCE = 4
+ANTENNA = 5
+RSSI = 6
+READER_ID = 7
+
+_STRING_FIELDS = {
+    TENANT_ID: "tenant_id",
+    TAG_ID: "tag_id",
+    SOURCE: "source",
+    READER_ID: "reader_id",
+}
+_FLOAT = struct.Struct("<f")
+
+
+def _encode_varint(value: int) -> bytes:
+    value &= 0xFFFFFFFFFFFFFFFF
+    out = bytearray()
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def _decode_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    result = 0
+    shift = 0
+    while True:
+        if pos >= len(data):
+            raise ValueError("Truncated varint")
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+        if shift >= 64:
+            raise ValueError("Varint too long")
+
+
+def _key(field: int, wire_type: int) -> bytes:
+    return _encode_varint((field << 3) | wire_type)
+
+
+def encode_scan(scan: Dict[str, Any]) -> bytes:
+    """Encode a scan dict as a weft.Scan message; proto3 defaults are omitted"""
+    out = bytearray()
+
+    for field, name in ((TENANT_ID, "tenant_id"), (TAG_ID, "tag_id")):
+        value = scan.get(name)
+        if value:
+            raw = value.encode("utf-8")
+            out += _key(field, LENGTH_DELIMITED) + _encode_varint(len(raw)) + raw
+
+    if scan.get("ts_ms"):
+        out += _key(TS_MS, VARINT) + _encode_varint(int(scan["ts_ms"]))
+
+    if scan.get("source"):
+        raw = scan["source"].encode("utf-8")
+        out += _key(SOURCE, LENGTH_DELIMITED) + _encode_varint(len(raw)) + raw
+
+    if scan.get("antenna"):
+        out += _key(ANTENNA, VARINT) + _encode_varint(int(scan["antenna"]) & 0xFFFFFFFF)
+
+    if scan.get("rssi"):
+        out += _key(RSSI, FIXED32) + _FLOAT.pack(float(scan["rssi"]))
+
+    if scan.get("reader_id"):
+        raw = scan["reader_id"].encode("utf-8")
+        out += _key(READER_ID, LENGTH_DELIMITED) + _encode_varint(len(raw)) + raw
+
+    return bytes(out)
+
+
+def decode_scan(data: bytes) -> Dict[str, Any]:
+    """
+    Decode a weft.Scan message into a dict with every field present
+    Unknown fields are skipped; malformed input raises ValueError
+    """
+    scan: Dict[str, Any] = {
+        "tenant_id": "",
+        "tag_id": "",
+        "ts_ms": 0,
+        "source": "",
+        "antenna": 0,
+        "rssi": 0.0,
+        "reader_id": "",
+    }
+    pos = 0
+    end = len(data)
+
+    while pos < end:
+        key, pos = _decode_varint(data, pos)
+        field, wire_type = key >> 3, key & 0x07
+
+        if wire_type == VARINT:
+            value, pos = _decode_varint(data, pos)
+            if field == TS_MS:
+                scan["ts_ms"] = value - (1 << 64) if value >= 1 << 63 else value
+            elif field == ANTENNA:
+                scan["antenna"] = value & 0xFFFFFFFF
+        elif wire_type == LENGTH_DELIMITED:
+            length, pos = _decode_varint(data, pos)
+            if pos + length > end:
+                raise ValueError("Truncated field")
+            name = _STRING_FIELDS.get(field)
+            if name:
+                scan[name] = data[pos : pos + length].decode("utf-8")
+            pos += length
+        elif wire_type == FIXED32:
+            if pos + 4 > end:
+                raise ValueError("Truncated field")
+            if field == RSSI:
+                scan["rssi"] = _FLOAT.unpack_from(data, pos)[0]
+            pos += 4
+        elif wire_type == FIXED64:
+            if pos + 8 > end:
+                raise ValueError("Truncated field")
+            pos += 8
+        else:
+            raise ValueError(f"Unsupported wire type {wire_type}")
+
+    return scan
+
+
+def iter_delimited(body: bytes) -> Iterator[bytes]:
+    """Split a body of varint length-prefixed messages"""
+    pos = 0
+    end = len(body)
+    while pos < end:
+        length, pos = _decode_varint(body, pos)
+        if pos + length > end:
+            raise ValueError("Truncated message")
+        yield body[pos : pos + length]
+        pos += length
+
+
+def encode_scan_batch(scans: List[Dict[str, Any]]) -> bytes:
+    """Encode scans as a length-delimited batch"""
+    out = bytearray()
+    for scan in scans:
+        message = encode_scan(scan)
+        out += _encode_varint(len(message)) + message
+    return bytes(out)
+
+
+def decode_scan_batch(body: bytes) -> List[Dict[str, Any]]:
+    """Decode a length-delimited batch of scans"""
+    return [decode_scan(message) for message in iter_delimited(body)]
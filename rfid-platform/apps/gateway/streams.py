@@ -0,0 +1,44 @@
+"""
+RFID Platform - API Gateway Stream Registry
+Announces per-org RFID streams to the ingest workers without KEYS scans
+"""
+
+from typing import Set
+
+import redis.asyncio as redis
+
+# Set of every org:{org_id}:rfid stream key
+STREAM_REGISTRY_KEY = "rfid:streams"
+# Append-only log of newly registered streams, read incrementally by workers
+STREAM_INDEX_KEY = "rfid:streams:index"
+STREAM_INDEX_MAXLEN = 100000
+
+
+def org_stream_key(org_id: str) -> str:
+    """Redis stream key for an org's RFID reads"""
+    return f"org:{org_id}:rfid"
+
+
+class StreamRegistrar:
+    """
+    Registers org streams on first publish
+    Each gateway process only talks to Redis the first time it sees a stream
+    """
+
+    def __init__(self):
+        self._known: Set[str] = set()
+
+    async def register(self, redis_client: redis.Redis, stream_key: str):
+        if stream_key in self._known:
+            return
+
+        # SADD returns 1 only for the first gateway to register the stream
+        if await redis_client.sadd(STREAM_REGISTRY_KEY, stream_key):
+            await redis_client.xadd(
+                STREAM_INDEX_KEY,
+                {"stream": stream_key},
+                maxlen=STREAM_INDEX_MAXLEN,
+                approximate=True,
+            )
+
+        self._known.add(stream_key)
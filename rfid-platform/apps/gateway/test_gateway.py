@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+"""
+RFID Platform - API Gateway Test Script
+Tests rate limiting, the reader cache, batch parsing, scan validation and rollup selection without the full app
+"""
+
+import asyncio
+import json
+import sys
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+# Add the current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fakeredis import aioredis as fakeredis
+
+from rate_limit import TokenBucketLimiter, bucket_keys
+from reader_cache import ReaderCache
+from rollups import choose_rollup, parse_group_by
+from scans import decode_scan_batch, encode_scan_batch
+from utils import parse_event_batch, validate_rssi
+
+GATEWAY_DIR = os.path.dirname(os.path.abspath(__file__))
+WORKER_DIR = os.path.join(os.path.dirname(GATEWAY_DIR), "ingest-worker")
+
+# Modules copied into both app images; see each module's docstring
+SHARED_MODULES = ("db.py", "scans.py")
+
+
+def make_event(event_id: str) -> dict:
+    return {
+        "specversion": "1.0",
+        "type": "com.rfid.read",
+        "source": "reader-001",
+        "id": event_id,
+        "data": {"epc": "E2001234567890AB", "antenna": 1, "rssi": -45.0},
+    }
+
+
+def test_token_bucket_refill():
+    """Test that spent tokens are refused until the bucket refills"""
+    print("🧪 Testing token bucket refill...")
+
+    async def run():
+        client = fakeredis.FakeRedis()
+        limiter = TokenBucketLimiter(
+            device_rate=50, device_burst=5, org_rate=1000, org_burst=1000
+        )
+
+        for _ in range(5):
+            allowed, _ = await limiter.acquire(client, "org-a", "device-1")
+            assert allowed, "Burst should be admitted"
+
+        allowed, retry_after = await limiter.acquire(client, "org-a", "device-1")
+        print(f"  After burst: allowed={allowed}, retry_after={retry_after}s")
+        assert not allowed
+        assert retry_after >= 1
+        assert limiter.throttled["org-a"] == 1
+
+        # 50 tokens/s refills the bucket in 100 ms
+        await asyncio.sleep(0.15)
+        allowed, _ = await limiter.acquire(client, "org-a", "device-1")
+        assert allowed, "Tokens should be available again after refill"
+
+        assert await client.exists(*bucket_keys("org-a", "device-1")) == 2
+
+    asyncio.run(run())
+    print("✅ Token bucket refill tests passed!")
+
+
+def test_token_bucket_cost():
+    """Test that a request costs one token per event, across device and org buckets"""
+    print("🧪 Testing multi-token cost...")
+
+    async def run():
+        client = fakeredis.FakeRedis()
+        limiter = TokenBucketLimiter(
+            device_rate=0.01, device_burst=10, org_rate=0.01, org_burst=14
+        )
+
+        allowed, _ = await limiter.acquire(client, "org-a", "device-1", cost=4)
+        assert allowed
+        allowed, _ = await limiter.acquire(client, "org-a", "device-1", cost=7)
+        assert not allowed, "Only 6 device tokens remain"
+        allowed, _ = await limiter.acquire(client, "org-a", "device-1", cost=6)
+        assert allowed
+
+        # Another device has its own bucket but shares the org's 4 remaining tokens
+        allowed, _ = await limiter.acquire(client, "org-a", "device-2", cost=5)
+        assert not allowed, "The org bucket should cap every device in the org"
+        allowed, _ = await limiter.acquire(client, "org-a", "device-2", cost=4)
+        assert allowed
+
+        # A batch larger than the burst is admitted from a full bucket and leaves it in debt
+        allowed, _ = await limiter.acquire(client, "org-b", "device-3", cost=25)
+        assert allowed, "A full bucket should admit a batch larger than its burst"
+        allowed, retry_after = await limiter.acquire(client, "org-b", "device-3")
+        print(f"  After oversized batch: allowed={allowed}, retry_after={retry_after}s")
+        assert not allowed, "The bucket should be in debt"
+
+    asyncio.run(run())
+    print("✅ Multi-token cost tests passed!")
+
+
+def test_token_bucket_leases():
+    """Test that leased tokens are spent locally and never exceed the shared budget"""
+    print("🧪 Testing local token leases...")
+
+    async def run():
+        client = fakeredis.FakeRedis()
+        limiter = TokenBucketLimiter(
+            device_rate=0.01,
+            device_burst=5,
+            org_rate=0.01,
+            org_burst=100,
+            lease_size=4,
+            lease_ttl_seconds=10,
+        )
+        now = time.monotonic()
+
+        # One Redis call reserves 4 tokens: one spent, three leased
+        results = [
+            (await limiter.acquire(client, "org-a", "device-1", now=now))[0]
+            for _ in range(4)
+        ]
+        assert results == [True] * 4
+        assert limiter.local_hits == 3
+
+        # The lease is exhausted; Redis has one token left, then none
+        allowed, _ = await limiter.acquire(client, "org-a", "device-1", now=now)
+        assert allowed
+        allowed, _ = await limiter.acquire(client, "org-a", "device-1", now=now)
+        assert not allowed, "Leases must not admit more than the bucket holds"
+        assert limiter.local_hits == 3
+
+        # An expired lease is not spent
+        limiter = TokenBucketLimiter(
+            device_rate=0.01,
+            device_burst=5,
+            org_rate=0.01,
+            org_burst=100,
+            lease_size=4,
+            lease_ttl_seconds=1,
+        )
+        allowed, _ = await limiter.acquire(client, "org-a", "device-2", now=now)
+        assert allowed
+        allowed, _ = await limiter.acquire(client, "org-a", "device-2", now=now + 2)
+        assert allowed, "One token is still in Redis"
+        assert limiter.local_hits == 0, "Expired lease should be dropped, not spent"
+
+        # A cost larger than the remaining lease goes back to Redis
+        limiter = TokenBucketLimiter(
+            device_rate=0.01,
+            device_burst=10,
+            org_rate=0.01,
+            org_burst=100,
+            lease_size=4,
+            lease_ttl_seconds=10,
+        )
+        assert (await limiter.acquire(client, "org-a", "device-3", now=now))[0]
+        assert (await limiter.acquire(client, "org-a", "device-3", cost=5, now=now))[0]
+        assert limiter.local_hits == 0
+
+    asyncio.run(run())
+    print("✅ Local token lease tests passed!")
+
+
+def test_reader_cache():
+    """Test reader cache hits, TTLs, LRU eviction and audit events"""
+    print("🧪 Testing reader cache...")
+
+    reader = {"id": "r-1", "org_id": "org-a", "api_key_hash": "hash", "name": "Line 1"}
+    cache = ReaderCache(max_size=2, ttl_seconds=60, negative_ttl_seconds=0)
+
+    assert cache.get("device-1") == (False, None)
+    cache.set("device-1", reader)
+    hit, record = cache.get("device-1")
+    assert hit
+    assert record == {
+        "id": "r-1",
+        "org_id": "org-a",
+        "api_key_hash": "hash",
+    }, "Only auth fields are cached"
+
+    # Unknown devices are cached as None for the negative TTL
+    cache.set("unknown", None)
+    assert cache.get("unknown") == (False, None), "Negative entry should have expired"
+
+    # Least recently used entry is evicted
+    cache.set("device-2", {"id": "r-2", "org_id": "org-a", "api_key_hash": "h2"})
+    cache.get("device-1")
+    cache.set("device-3", {"id": "r-3", "org_id": "org-a", "api_key_hash": "h3"})
+    assert cache.get("device-2")[0] is False
+    assert cache.get("device-1")[0] is True
+
+    # An update that moves a reader to a new device_id drops the old one
+    cache.apply_audit_event(
+        {
+            "old": {"id": "r-1", "device_id": "device-1"},
+            "new": {
+                "id": "r-1",
+                "device_id": "device-9",
+                "org_id": "org-a",
+                "api_key_hash": "rotated",
+            },
+        }
+    )
+    assert cache.get("device-1")[0] is False
+    assert cache.get("device-9") == (
+        True,
+        {"id": "r-1", "org_id": "org-a", "api_key_hash": "rotated"},
+    )
+
+    # Deletes evict
+    cache.apply_audit_event(
+        {"old": {"id": "r-1", "device_id": "device-9"}, "new": None}
+    )
+    assert cache.get("device-9")[0] is False
+    print(f"  Hits: {cache.hits}, misses: {cache.misses}")
+
+    print("✅ Reader cache tests passed!")
+
+
+def test_event_batch_parsing():
+    """Test JSON and NDJSON batch parsing and per-event rejection"""
+    print("🧪 Testing batch parsing...")
+
+    events = [make_event("e-1"), make_event("e-2")]
+
+    items = parse_event_batch(
+        json.dumps(events).encode(), "application/cloudevents-batch+json"
+    )
+    assert [item for item, _ in items] == events
+    assert all(error is None for _, error in items)
+
+    ndjson = b"\n".join(json.dumps(event).encode() for event in events) + b"\n\n"
+    items = parse_event_batch(ndjson, "application/x-ndjson; charset=utf-8")
+    assert [item for item, _ in items] == events, "Blank lines are skipped"
+
+    # A bad NDJSON line is rejected on its own
+    items = parse_event_batch(
+        b'{"id": "e-1"}\n{not json\n[1, 2]\n', "application/x-ndjson"
+    )
+    print(f"  Mixed NDJSON: {[error for _, error in items]}")
+    assert items[0] == ({"id": "e-1"}, None)
+    assert items[1][0] is None and items[1][1].startswith("Invalid JSON")
+    assert items[2][1] == "Event must be a JSON object"
+
+    # JSON batches: non-object items are rejected individually, a bad body as a whole
+    items = parse_event_batch(b'[{"id": "e-1"}, "oops"]', "application/json")
+    assert items[1] == ("oops", "Event must be a JSON object")
+    for body in (b"{not json", b'{"id": "e-1"}'):
+        try:
+            parse_event_batch(body, "application/json")
+            assert False, f"Body should be rejected: {body!r}"
+        except ValueError as e:
+            print(f"  Rejected {body!r}: {e}")
+
+    print("✅ Batch parsing tests passed!")
+
+
+def test_scan_validation():
+    """Test that protobuf scans with a non-finite rssi are rejected"""
+    print("🧪 Testing scan validation...")
+
+    scan = {
+        "tag_id": "E2000012345678901234",
+        "ts_ms": 1735732800123,
+        "antenna": 1,
+        "rssi": -45.5,
+    }
+    bad = [
+        {**scan, "rssi": rssi} for rssi in (float("nan"), float("inf"), float("-inf"))
+    ]
+
+    scans = decode_scan_batch(encode_scan_batch([scan] + bad))
+    assert [validate_rssi(s["rssi"]) for s in scans] == [True, False, False, False]
+
+    # json.dumps writes NaN as a bare token that jsonb rejects
+    assert "NaN" in json.dumps({"rssi": scans[1]["rssi"]})
+
+    print("✅ Scan validation tests passed!")
+
+
+def test_rollup_selection():
+    """Test that queries use the coarsest rollup that tiles the range exactly"""
+    print("🧪 Testing rollup selection...")
+
+    start = datetime(2024, 1, 15, 10, 0, tzinfo=timezone.utc)
+    assert choose_rollup(start, start + timedelta(days=1), 3600) == "hour"
+    assert choose_rollup(start, start + timedelta(hours=2), 300) == "minute"
+    assert (
+        choose_rollup(start + timedelta(minutes=30), start + timedelta(hours=2), 3600)
+        == "minute"
+    )
+
+    for query in (
+        (start, start + timedelta(hours=1), 90),
+        (start + timedelta(seconds=30), start + timedelta(hours=1), 60),
+        (start, start, 60),
+        (
+            start.replace(tzinfo=None),
+            start.replace(tzinfo=None) + timedelta(hours=1),
+            60,
+        ),
+        (start, start + timedelta(days=30), 60),
+    ):
+        try:
+            choose_rollup(*query)
+            assert False, f"Query should be rejected: {query}"
+        except ValueError as e:
+            print(f"  Rejected: {e}")
+
+    assert parse_group_by("reader, antenna,reader") == ["reader_id", "antenna"]
+    assert parse_group_by(None) == []
+    try:
+        parse_group_by("epc")
+        assert False, "Unknown dimension should be rejected"
+    except ValueError:
+        pass
+
+    print("✅ Rollup selection tests passed!")
+
+
+def test_shared_modules_in_sync():
+    """Test that modules copied into both app images are identical"""
+    print("🧪 Testing shared module copies...")
+
+    for name in SHARED_MODULES:
+        with open(os.path.join(GATEWAY_DIR, name), "rb") as f:
+            gateway_copy = f.read()
+        with open(os.path.join(WORKER_DIR, name), "rb") as f:
+            worker_copy = f.read()
+        assert (
+            gateway_copy == worker_copy
+        ), f"apps/gateway/{name} and apps/ingest-worker/{name} have drifted"
+        print(f"  {name}: in sync")
+
+    print("✅ Shared module copy tests passed!")
+
+
+def main():
+    """Run all tests"""
+    print("🚀 Starting RFID API Gateway Tests")
+    print("=" * 50)
+
+    try:
+        test_token_bucket_refill()
+        print()
+
+        test_token_bucket_cost()
+        print()
+
+        test_token_bucket_leases()
+        print()
+
+        test_reader_cache()
+        print()
+
+        test_event_batch_parsing()
+        print()
+
+        test_scan_validation()
+        print()
+
+        test_rollup_selection()
+        print()
+
+        test_shared_modules_in_sync()
+        print()
+
+        print("🎉 All tests passed successfully!")
+        print("✅ API Gateway is functioning correctly")
+
+    except Exception as e:
+        print(f"❌ Test failed: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
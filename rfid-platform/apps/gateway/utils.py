@@ -1,28 +1,18 @@
 """
 RFID Platform - API Gateway Utilities
-Helper functions for HMAC validation, idempotency, and other utilities
+Helper functions for HMAC validation, access tokens, and other utilities
 """
 
 import hashlib
 import hmac
 import json
+import math
 from datetime import datetime, timezone
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional, Tuple
 
+from jose import JWTError, jwt
 
-def generate_idempotency_key(org_id: str, epc: str, reader_id: str, antenna: int, read_at: datetime) -> str:
-    """
-    Generate idempotency key for RFID reads
-    Uses SHA1 hash of org_id + epc + reader_id + antenna + timestamp (rounded to 1 second)
-    """
-    # Round timestamp to 1 second for deduplication
-    rounded_timestamp = int(read_at.timestamp())
-    
-    # Create hash input
-    hash_input = f"{org_id}{epc}{reader_id}{antenna}{rounded_timestamp}"
-    
-    # Generate SHA1 hash
-    return hashlib.sha1(hash_input.encode('utf-8')).hexdigest()
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
 
 
 def validate_hmac_signature(
@@ -81,6 +71,75 @@ def create_hmac_signature(
     return f"sha256={signature}"
 
 
+def create_body_mac(api_key_hash: str, timestamp: str) -> "hmac.HMAC":
+    """
+    Start an HMAC over the timestamp; feed it the raw request body with update()
+    """
+    return hmac.new(api_key_hash.encode('utf-8'), timestamp.encode('utf-8'), hashlib.sha256)
+
+
+def verify_body_mac(mac: "hmac.HMAC", signature: str) -> bool:
+    """
+    Compare a fed body HMAC against a "sha256=" signature header in constant time
+    """
+    if not signature.startswith("sha256="):
+        return False
+    return hmac.compare_digest(signature[7:], mac.hexdigest())
+
+
+def parse_event_batch(body: bytes, content_type: str) -> List[Tuple[Any, Optional[str]]]:
+    """
+    Parse a CloudEvents JSON batch or NDJSON body
+    Returns one (event, error) pair per event so bad lines can be rejected individually
+    """
+    media_type = content_type.split(";")[0].strip().lower()
+    
+    if media_type in NDJSON_CONTENT_TYPES:
+        items = []
+        for line in body.splitlines():
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError as e:
+                items.append((None, f"Invalid JSON: {e}"))
+                continue
+            items.append((item, None if isinstance(item, dict) else "Event must be a JSON object"))
+        return items
+    
+    # application/cloudevents-batch+json: a single JSON array of events
+    try:
+        batch = json.loads(body)
+    except ValueError as e:
+        raise ValueError(f"Invalid JSON batch: {e}")
+    
+    if not isinstance(batch, list):
+        raise ValueError("CloudEvents batch must be a JSON array")
+    
+    return [
+        (item, None if isinstance(item, dict) else "Event must be a JSON object")
+        for item in batch
+    ]
+
+
+def decode_supabase_jwt(token: str, secret: str, audience: str = "authenticated") -> Dict[str, Any]:
+    """
+    Verify a Supabase Auth access token, signed HS256 with the project JWT secret
+    Raises ValueError if the token is invalid, expired or for another audience
+    """
+    try:
+        return jwt.decode(token, secret, algorithms=["HS256"], audience=audience)
+    except JWTError as e:
+        raise ValueError(str(e))
+
+
+def get_claims_org_id(claims: Dict[str, Any]) -> Optional[str]:
+    """
+    Org of an access token, from the claim RLS reads through get_user_org_id()
+    """
+    return claims.get("org_id") or (claims.get("app_metadata") or {}).get("org_id")
+
+
 def validate_epc_format(epc: str) -> bool:
     """
     Validate EPC format
@@ -97,6 +156,14 @@ def validate_epc_format(epc: str) -> bool:
         return False
 
 
+def validate_rssi(rssi: float) -> bool:
+    """
+    Validate RSSI value
+    NaN and infinity cannot be stored as JSON or jsonb
+    """
+    return math.isfinite(rssi)
+
+
 def sanitize_device_id(device_id: str) -> str:
     """
     Sanitize device ID for security
@@ -0,0 +1,86 @@
+"""
+RFID Platform - Async Data Access
+Bounded asyncpg connection pool used by the API gateway and ingest worker
+Each app builds from its own Docker context, so this file is kept as an identical
+copy in apps/gateway and apps/ingest-worker; test_gateway.py fails if they drift
+"""
+
+import json
+from typing import Any, Iterable, List, Optional, Sequence
+
+import asyncpg
+
+
+async def _init_connection(conn: asyncpg.Connection):
+    """Encode and decode json/jsonb as Python objects"""
+    for type_name in ("json", "jsonb"):
+        await conn.set_type_codec(
+            type_name, encoder=json.dumps, decoder=json.loads, schema="pg_catalog"
+        )
+
+
+class Database:
+    """
+    Thin wrapper around an asyncpg pool
+    Statements are prepared once per connection and reused from its statement cache
+    """
+
+    def __init__(
+        self,
+        dsn: str,
+        min_size: int = 1,
+        max_size: int = 10,
+        command_timeout: float = 10.0,
+        statement_cache_size: int = 256,
+    ):
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.command_timeout = command_timeout
+        self.statement_cache_size = statement_cache_size
+        self.pool: Optional[asyncpg.Pool] = None
+
+    async def connect(self):
+        """Open the connection pool"""
+        self.pool = await asyncpg.create_pool(
+            self.dsn,
+            min_size=self.min_size,
+            max_size=self.max_size,
+            command_timeout=self.command_timeout,
+            # Set to 0 behind PgBouncer in transaction mode
+            statement_cache_size=self.statement_cache_size,
+            init=_init_connection,
+        )
+
+    async def close(self):
+        """Close the connection pool"""
+        if self.pool:
+            await self.pool.close()
+            self.pool = None
+
+    @property
+    def idle_connections(self) -> int:
+        """Connections currently available in the pool"""
+        return self.pool.get_idle_size() if self.pool else 0
+
+    def acquire(self):
+        """
+        Dedicated connection, for session state such as advisory locks or for
+        statements that cannot run in a transaction block
+        """
+        return self.pool.acquire()
+
+    async def fetch(self, query: str, *args: Any) -> List[asyncpg.Record]:
+        return await self.pool.fetch(query, *args)
+
+    async def fetchrow(self, query: str, *args: Any) -> Optional[asyncpg.Record]:
+        return await self.pool.fetchrow(query, *args)
+
+    async def fetchval(self, query: str, *args: Any) -> Any:
+        return await self.pool.fetchval(query, *args)
+
+    async def execute(self, query: str, *args: Any) -> str:
+        return await self.pool.execute(query, *args)
+
+    async def executemany(self, query: str, args: Iterable[Sequence[Any]]):
+        await self.pool.executemany(query, args)
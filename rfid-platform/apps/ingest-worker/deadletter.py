@@ -0,0 +1,58 @@
+"""
+RFID Platform - Ingest Worker Dead Letters
+Classifies failed stream messages and shapes their per-org dead-letter entries
+"""
+
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+# SQLSTATEs that recur on every retry: data exceptions (class 22) and
+# not-null, foreign key and check violations
+PERMANENT_SQLSTATE_CLASSES = ("22",)
+PERMANENT_SQLSTATES = frozenset({"23502", "23503", "23514"})
+
+
+class PermanentFailure(ValueError):
+    """A message that can never be processed as sent, e.g. a bad EPC or missing fields"""
+
+
+def is_permanent_sqlstate(sqlstate: Optional[str]) -> bool:
+    """Whether a per-read upsert error will fail again however often it is redelivered"""
+    if not sqlstate:
+        return False
+    return sqlstate[:2] in PERMANENT_SQLSTATE_CLASSES or sqlstate in PERMANENT_SQLSTATES
+
+
+def dead_letter_stream(org_id: str) -> str:
+    """Redis stream key for an org's dead-lettered RFID messages"""
+    return f"org:{org_id}:rfid:dlq"
+
+
+def should_dead_letter(permanent: bool, deliveries: int, max_deliveries: int) -> bool:
+    """
+    Permanent failures are quarantined at once; transient ones stay pending for
+    redelivery until they have been delivered max_deliveries times
+    """
+    return permanent or deliveries >= max_deliveries
+
+
+def dead_letter_entry(
+    source_stream: str,
+    message_id: str,
+    fields: Dict[str, str],
+    reason: str,
+    deliveries: int,
+    permanent: bool,
+    failed_at: Optional[datetime] = None,
+) -> Dict[str, str]:
+    """Original stream fields plus where the message came from and why it failed"""
+    failed_at = failed_at or datetime.now(timezone.utc)
+    return {
+        **fields,
+        "dlq_source_stream": source_stream,
+        "dlq_message_id": message_id,
+        "dlq_reason": reason,
+        "dlq_class": "permanent" if permanent else "transient",
+        "dlq_deliveries": str(deliveries),
+        "dlq_failed_at": failed_at.isoformat(),
+    }
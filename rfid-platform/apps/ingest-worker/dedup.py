@@ -0,0 +1,67 @@
+"""
+RFID Platform - Ingest Worker Dedup Window
+Drops repeated reads of the same tag before any hashing or database I/O
+"""
+
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Hashable, Optional, Tuple
+
+DedupKey = Tuple[str, str, str, int, int]
+
+
+class DedupWindow:
+    """
+    Bounded LRU of recently written reads
+    Keyed by (org_id, epc, reader_id, antenna, second); entries expire after
+    ttl_seconds and the oldest are evicted beyond max_entries
+    """
+
+    def __init__(self, ttl_seconds: float = 5.0, max_entries: int = 100000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.checked = 0
+        self.duplicates = 0
+        self._entries: "OrderedDict[Hashable, float]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def key(
+        org_id: str, epc: str, reader_id: str, antenna: int, read_at: datetime
+    ) -> DedupKey:
+        return (org_id, epc, reader_id, int(antenna), int(read_at.timestamp()))
+
+    def seen(self, key: Hashable, now: Optional[float] = None) -> bool:
+        """Check whether a read was written within the window; counts duplicates"""
+        now = now if now is not None else time.monotonic()
+        self.checked += 1
+
+        expires_at = self._entries.get(key)
+        if expires_at is None:
+            return False
+        if expires_at <= now:
+            del self._entries[key]
+            return False
+
+        self.duplicates += 1
+        return True
+
+    def record_duplicate(self):
+        """Count a duplicate detected outside the window, e.g. within one batch"""
+        self.duplicates += 1
+
+    def add(self, key: Hashable, now: Optional[float] = None):
+        """Remember a read that was written"""
+        now = now if now is not None else time.monotonic()
+        self._entries[key] = now + self.ttl_seconds
+        self._entries.move_to_end(key)
+
+        # Expired entries sit at the front since the TTL is fixed
+        while self._entries:
+            oldest_key, oldest_expiry = next(iter(self._entries.items()))
+            if len(self._entries) <= self.max_entries and oldest_expiry > now:
+                break
+            del self._entries[oldest_key]
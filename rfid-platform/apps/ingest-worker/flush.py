@@ -0,0 +1,114 @@
+"""
+RFID Platform - Ingest Worker Flush Policy
+Adaptive micro-batching: flush on batch full OR max-wait timer, deferred under database backpressure
+"""
+
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+class FlushController:
+    """
+    Decides when buffered stream messages become a batch, and how big batches are
+    The batch size grows additively while upserts finish well inside the latency target
+    and batches fill up (a backlog), and shrinks multiplicatively once they exceed it.
+    """
+
+    def __init__(
+        self,
+        min_batch_size: int = 16,
+        max_batch_size: int = 1000,
+        initial_batch_size: int = 128,
+        max_wait_ms: float = 50.0,
+        target_latency_ms: float = 100.0,
+        smoothing: float = 0.2,
+    ):
+        self.min_batch_size = min_batch_size
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.target_latency_ms = target_latency_ms
+        self.smoothing = smoothing
+        self.batch_size = max(min_batch_size, min(max_batch_size, initial_batch_size))
+        # Smoothed upsert latency
+        self.latency_ms: Optional[float] = None
+
+    def record(self, batch_len: int, latency_seconds: float):
+        """Adjust the batch size from one completed upsert"""
+        latency_ms = latency_seconds * 1000
+        if self.latency_ms is None:
+            self.latency_ms = latency_ms
+        else:
+            self.latency_ms += self.smoothing * (latency_ms - self.latency_ms)
+
+        if self.latency_ms > self.target_latency_ms:
+            self.batch_size = max(self.min_batch_size, int(self.batch_size * 0.7))
+        elif (
+            batch_len >= self.batch_size
+            and self.latency_ms < self.target_latency_ms / 2
+        ):
+            step = max(1, self.batch_size // 8)
+            self.batch_size = min(self.max_batch_size, self.batch_size + step)
+
+    def should_flush(
+        self,
+        buffered: int,
+        first_buffered_at: float,
+        backpressure: bool = False,
+        now: Optional[float] = None,
+    ) -> bool:
+        """
+        Whether a stream's buffer should be dispatched now
+        Under backpressure a buffer keeps growing towards max_batch_size instead,
+        so the next upsert carries more rows per round trip
+        """
+        if buffered >= self.max_batch_size:
+            return True
+        if backpressure:
+            return False
+        if buffered >= self.batch_size:
+            return True
+
+        now = now if now is not None else time.monotonic()
+        return (now - first_buffered_at) * 1000 >= self.max_wait_ms
+
+    def can_read(self, buffered: int) -> bool:
+        """Whether another read of batch_size messages fits in a stream's buffer"""
+        return buffered + self.batch_size <= self.max_batch_size
+
+
+class StreamBuffers:
+    """Messages read but not yet dispatched, per stream, in delivery order"""
+
+    def __init__(self):
+        self._messages: Dict[str, List[Tuple[str, Dict]]] = {}
+        self._first_at: Dict[str, float] = {}
+
+    def __len__(self) -> int:
+        return sum(len(messages) for messages in self._messages.values())
+
+    def add(
+        self,
+        stream_key: str,
+        messages: List[Tuple[str, Dict]],
+        now: Optional[float] = None,
+    ):
+        if not messages:
+            return
+        if stream_key not in self._messages:
+            self._messages[stream_key] = []
+            self._first_at[stream_key] = now if now is not None else time.monotonic()
+        self._messages[stream_key].extend(messages)
+
+    def size(self, stream_key: str) -> int:
+        return len(self._messages.get(stream_key, ()))
+
+    def items(self) -> List[Tuple[str, int, float]]:
+        """(stream_key, buffered, first_buffered_at) for every non-empty buffer"""
+        return [
+            (key, len(messages), self._first_at[key])
+            for key, messages in self._messages.items()
+        ]
+
+    def take(self, stream_key: str) -> List[Tuple[str, Dict]]:
+        self._first_at.pop(stream_key, None)
+        return self._messages.pop(stream_key, [])
@@ -0,0 +1,43 @@
+"""
+RFID Platform - Idempotency Keys
+The one key derivation for RFID reads stored by the ingest worker
+"""
+
+import uuid
+from datetime import datetime, timezone
+
+import xxhash
+
+# ASCII unit separator between key fields; never part of an org ID, EPC or reader UUID
+KEY_SEPARATOR = "\x1f"
+DEFAULT_WINDOW_SECONDS = 1
+
+
+def read_window(
+    read_at: datetime, window_seconds: int = DEFAULT_WINDOW_SECONDS
+) -> datetime:
+    """
+    Stored read time: the start of the dedup window the read falls in
+    reads_parent is unique on (idem_key, read_at), so retransmissions must agree on both
+    """
+    seconds = int(read_at.timestamp())
+    return datetime.fromtimestamp(seconds - seconds % window_seconds, tz=timezone.utc)
+
+
+def idempotency_key(
+    org_id: str,
+    epc: str,
+    reader_id: str,
+    antenna: int,
+    read_at: datetime,
+    window_seconds: int = DEFAULT_WINDOW_SECONDS,
+) -> str:
+    """
+    128-bit xxh3 hash of the read's identity and dedup window, formatted as a UUID
+    Reads of the same tag on the same antenna within one window share a key
+    """
+    window = int(read_window(read_at, window_seconds).timestamp())
+    hash_input = KEY_SEPARATOR.join(
+        (org_id, epc, str(reader_id), str(int(antenna)), str(window))
+    )
+    return str(uuid.UUID(bytes=xxhash.xxh3_128_digest(hash_input.encode("utf-8"))))
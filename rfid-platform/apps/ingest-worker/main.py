@@ -1,27 +1,57 @@
 """
 RFID Platform - Ingest Worker
-Processes RFID reads from Redis Streams and writes to Supabase with deduplication
+Processes RFID reads from Redis Streams and writes to Supabase Postgres with deduplication
 """
 
 import asyncio
 import json
+import signal
 import time
+import uuid
 from datetime import datetime, timezone
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 import redis.asyncio as redis
 import structlog
 from opentelemetry import trace
 from opentelemetry.exporter.jaeger.thrift import JaegerExporter
+from opentelemetry.instrumentation.asyncpg import AsyncPGInstrumentor
 from opentelemetry.instrumentation.redis import RedisInstrumentor
 from opentelemetry.sdk.trace import TracerProvider
 from opentelemetry.sdk.trace.export import BatchSpanProcessor
-from supabase import create_client, Client
-from tenacity import retry, stop_after_attempt, wait_exponential
+from prometheus_client import REGISTRY, start_http_server
 
 from .config import Settings
+from .db import Database
+from .deadletter import (
+    PermanentFailure,
+    dead_letter_entry,
+    dead_letter_stream,
+    is_permanent_sqlstate,
+    should_dead_letter
+)
+from .dedup import DedupWindow
+from .flush import FlushController, StreamBuffers
+from .idempotency import idempotency_key, read_window
+from .metrics import (
+    BATCH_MESSAGES,
+    STREAM_TRIMMED,
+    READS_DEAD_LETTERED,
+    READS_DUPLICATE,
+    READS_FAILED,
+    READS_INVALID,
+    READS_WRITTEN,
+    UPSERT_LATENCY,
+    WorkerStateCollector,
+)
 from .models import CloudEvent, RFIDRead
-from .utils import generate_idempotency_key, validate_epc_format
+from .partitions import PartitionManager
+from .retention import RetentionPolicy, parse_retention_overrides
+from .scans import decode_scan
+from .scheduler import StreamScheduler
+from .stream_registry import StreamRegistry
+from .summaries import SUMMARY_EVENT_TYPE, SummaryAggregator, summary_channel
+from .utils import validate_epc_format, validate_rssi
 
 # Configure structured logging
 structlog.configure(
@@ -49,15 +79,68 @@ settings = Settings()
 
 # Initialize services
 redis_client: Optional[redis.Redis] = None
-supabase: Optional[Client] = None
+db = Database(
+    settings.database_url,
+    min_size=settings.db_pool_min_size,
+    max_size=settings.db_pool_max_size,
+    command_timeout=settings.db_command_timeout,
+    statement_cache_size=settings.db_statement_cache_size
+)
 tracer: Optional[trace.Tracer] = None
+stream_registry: Optional[StreamRegistry] = None
+scheduler: Optional[StreamScheduler] = None
+
+# Recently written reads, checked before hashing or database I/O
+dedup_window = DedupWindow(
+    ttl_seconds=settings.dedup_window_seconds,
+    max_entries=settings.dedup_max_entries
+)
+
+# Per-org realtime summaries, flushed once per window
+summary_aggregator = SummaryAggregator(
+    window_seconds=settings.summary_window_seconds,
+    max_per_second=settings.summary_max_per_second,
+    max_epcs=settings.summary_max_epcs
+)
+
+# Adaptive micro-batching; messages wait in per-stream buffers until flushed
+flush_controller = FlushController(
+    min_batch_size=settings.flush_min_batch_size,
+    max_batch_size=settings.flush_max_batch_size,
+    initial_batch_size=settings.flush_initial_batch_size,
+    max_wait_ms=settings.flush_max_wait_ms,
+    target_latency_ms=settings.flush_target_latency_ms
+)
+stream_buffers = StreamBuffers()
+
+# Unacknowledged entries per stream, refreshed by the reclaim loop
+pending_entries: Dict[str, int] = {}
+
+# Acknowledged entries are trimmed once older than the org's retention
+retention_policy = RetentionPolicy(
+    default_seconds=settings.stream_retention_seconds,
+    overrides=parse_retention_overrides(settings.stream_retention_overrides)
+)
+# Stream memory per stream, refreshed by the trim loop
+stream_memory: Dict[str, int] = {}
+
+# reads_parent partitions: created ahead, BRIN when cold, expired per org retention
+partition_manager = PartitionManager(
+    days_ahead=settings.partition_days_ahead,
+    retention_days=settings.partition_retention_days,
+    brin_after_days=settings.partition_brin_after_days,
+    retention_overrides=parse_retention_overrides(settings.partition_retention_overrides),
+    statement_timeout_seconds=settings.partition_statement_timeout_seconds
+)
 
 # Worker configuration
 CONSUMER_GROUP = "ingest-workers"
 CONSUMER_NAME = f"worker-{settings.worker_id}"
-BATCH_SIZE = 100
-PENDING_ENTRIES_LIMIT = 1000
-IDLE_TIME = 1000  # milliseconds
+PENDING_PAGE_SIZE = 100  # entries per XAUTOCLAIM call
+PENDING_MAX_PAGES = 10  # XAUTOCLAIM pages per stream per reclaim pass
+PENDING_MIN_IDLE_TIME = 60000  # milliseconds before an entry can be claimed
+IDLE_TIME = 1000  # milliseconds, XREADGROUP block with nothing buffered or in flight
+BUSY_POLL_TIME = 50  # milliseconds, XREADGROUP block while batches are in flight
 
 
 def setup_telemetry():
@@ -79,327 +162,569 @@ def setup_telemetry():
     span_processor = BatchSpanProcessor(jaeger_exporter)
     trace.get_tracer_provider().add_span_processor(span_processor)
     
-    # Instrument Redis
+    # Instrument Redis and asyncpg
     RedisInstrumentor().instrument()
+    AsyncPGInstrumentor().instrument()
 
 
 async def initialize_services():
-    """Initialize Redis and Supabase connections"""
-    global redis_client, supabase
+    """Initialize Redis connection and database pool"""
+    global redis_client, stream_registry, scheduler
     
     # Initialize Redis
-    redis_client = redis.from_url(settings.redis_url, decode_responses=True)
+    # surrogateescape lets binary weft.Scan fields round-trip through decoded responses
+    redis_client = redis.from_url(settings.redis_url, decode_responses=True, encoding_errors="surrogateescape")
     await redis_client.ping()
     logger.info("Connected to Redis", url=settings.redis_url)
     
-    # Initialize Supabase
-    supabase = create_client(settings.supabase_url, settings.supabase_service_key)
-    logger.info("Connected to Supabase", url=settings.supabase_url)
+    stream_registry = StreamRegistry(
+        redis_client,
+        CONSUMER_GROUP,
+        refresh_interval=settings.stream_refresh_interval_seconds,
+        resync_interval=settings.stream_resync_interval_seconds,
+        shard_index=settings.worker_shard_index,
+        shard_count=settings.worker_shard_count
+    )
+    
+    scheduler = StreamScheduler(
+        process_stream_batch,
+        max_concurrency=settings.max_concurrent_batches,
+        per_org_concurrency=settings.per_org_concurrent_batches,
+        preserve_order=settings.preserve_stream_order
+    )
+    
+    # Expose Prometheus metrics
+    if settings.metrics_enabled:
+        REGISTRY.register(
+            WorkerStateCollector(scheduler, dedup_window, pending_entries, flush_controller, stream_memory)
+        )
+        start_http_server(settings.metrics_port)
+        logger.info("Serving metrics", port=settings.metrics_port)
+    
+    # Initialize database pool
+    await db.connect()
+    logger.info("Connected to database", pool_max_size=settings.db_pool_max_size)
 
 
-async def create_consumer_groups():
-    """Create consumer groups for all org streams"""
+def parse_rfid_read(event: CloudEvent, org_id: str) -> Dict[str, Any]:
+    """
+    Validate a single RFID read event and build its row for the bulk upsert
+    Raises PermanentFailure if the event is invalid
+    """
+    # Validate event data
+    if not event.data:
+        raise PermanentFailure("Event data is empty")
+    
+    # Extract RFID read data
+    rfid_data = event.data
+    epc = rfid_data.get("epc")
+    reader_id = rfid_data.get("reader_id")
+    antenna = rfid_data.get("antenna")
+    rssi = rfid_data.get("rssi")
+    read_at = rfid_data.get("reader_ts")
+    
+    # Validate required fields
+    if not all([epc, reader_id, antenna, rssi, read_at]):
+        raise PermanentFailure("Missing required RFID data")
+    
+    # Validate EPC format
+    if not validate_epc_format(epc):
+        raise PermanentFailure(f"Invalid EPC format: {epc}")
+    
+    # reader_id is a UUID column; a bad one would fail the upsert on every delivery
     try:
-        # Get all org streams
-        keys = await redis_client.keys("org:*:rfid")
-        
-        for key in keys:
-            try:
-                # Create consumer group if it doesn't exist
-                await redis_client.xgroup_create(
-                    key, CONSUMER_GROUP, id="0", mkstream=True
-                )
-                logger.info("Created consumer group", stream=key, group=CONSUMER_GROUP)
-            except redis.ResponseError as e:
-                if "BUSYGROUP" in str(e):
-                    # Group already exists
-                    logger.debug("Consumer group already exists", stream=key, group=CONSUMER_GROUP)
-                else:
-                    logger.error("Failed to create consumer group", stream=key, error=str(e))
-    except Exception as e:
-        logger.error("Error creating consumer groups", error=str(e))
+        uuid.UUID(str(reader_id))
+    except ValueError:
+        raise PermanentFailure(f"Invalid reader_id: {reader_id}")
+    
+    # Parse timestamp
+    try:
+        if isinstance(read_at, str):
+            read_at_dt = datetime.fromisoformat(read_at.replace('Z', '+00:00'))
+        else:
+            read_at_dt = read_at
+    except (ValueError, TypeError):
+        raise PermanentFailure(f"Invalid timestamp format: {read_at}")
+    
+    return {
+        "org_id": org_id,
+        "epc": epc,
+        "reader_id": reader_id,
+        "antenna": antenna,
+        "rssi": float(rssi),
+        "read_at": read_window(read_at_dt, settings.idempotency_window_seconds)
+    }
 
 
-@retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
-async def process_rfid_read(event: CloudEvent, org_id: str) -> bool:
+def parse_scan(payload: str, org_id: str) -> Dict[str, Any]:
     """
-    Process a single RFID read event
-    Returns True if successfully processed, False otherwise
+    Build the bulk upsert row for a binary weft.Scan stream entry, without pydantic
+    Raises PermanentFailure if the scan is invalid
     """
-    if not tracer:
-        return await _process_rfid_read_internal(event, org_id)
+    try:
+        scan = decode_scan(payload.encode("utf-8", "surrogateescape"))
+    except ValueError as e:
+        raise PermanentFailure(f"Invalid scan: {e}")
     
-    with tracer.start_as_current_span("process_rfid_read") as span:
-        span.set_attribute("org_id", org_id)
-        span.set_attribute("event.type", event.type)
-        span.set_attribute("event.id", event.id)
-        
-        try:
-            result = await _process_rfid_read_internal(event, org_id)
-            span.set_attribute("success", result)
-            return result
-        except Exception as e:
-            span.record_exception(e)
-            logger.error("Error processing RFID read", error=str(e), exc_info=True)
-            raise
+    if not (scan["tag_id"] and scan["reader_id"] and scan["antenna"] and scan["ts_ms"] > 0):
+        raise PermanentFailure("Missing required scan data")
+    
+    if not validate_epc_format(scan["tag_id"]):
+        raise PermanentFailure(f"Invalid EPC format: {scan['tag_id']}")
+    
+    if not validate_rssi(scan["rssi"]):
+        raise PermanentFailure(f"Invalid rssi: {scan['rssi']}")
+    
+    return {
+        "org_id": org_id,
+        "epc": scan["tag_id"],
+        "reader_id": scan["reader_id"],
+        "antenna": scan["antenna"],
+        "rssi": round(scan["rssi"], 2),
+        "read_at": read_window(
+            datetime.fromtimestamp(scan["ts_ms"] / 1000, tz=timezone.utc),
+            settings.idempotency_window_seconds
+        )
+    }
 
 
-async def _process_rfid_read_internal(event: CloudEvent, org_id: str) -> bool:
-    """Internal RFID read processing logic"""
+def parse_message(fields: Dict[str, str], org_id: str) -> Dict[str, Any]:
+    """
+    Build the bulk upsert row for a stream entry in either wire format
+    Raises PermanentFailure for anything that would fail again on redelivery
+    """
+    if "scan" in fields:
+        return parse_scan(fields["scan"], org_id)
+    
+    if "event" not in fields:
+        raise PermanentFailure("Stream entry has no event or scan field")
+    
     try:
-        # Validate event data
-        if not event.data:
-            logger.warning("Event data is empty", event_id=event.id)
-            return False
-        
-        # Extract RFID read data
-        rfid_data = event.data
-        epc = rfid_data.get("epc")
-        reader_id = rfid_data.get("reader_id")
-        antenna = rfid_data.get("antenna")
-        rssi = rfid_data.get("rssi")
-        read_at = rfid_data.get("reader_ts")
-        
-        # Validate required fields
-        if not all([epc, reader_id, antenna, rssi, read_at]):
-            logger.warning("Missing required RFID data", event_id=event.id, data=rfid_data)
-            return False
-        
-        # Validate EPC format
-        if not validate_epc_format(epc):
-            logger.warning("Invalid EPC format", epc=epc, event_id=event.id)
-            return False
-        
-        # Parse timestamp
-        try:
-            if isinstance(read_at, str):
-                read_at_dt = datetime.fromisoformat(read_at.replace('Z', '+00:00'))
-            else:
-                read_at_dt = read_at
-        except (ValueError, TypeError):
-            logger.warning("Invalid timestamp format", read_at=read_at, event_id=event.id)
-            return False
-        
-        # Generate idempotency key
-        idem_key = generate_idempotency_key(org_id, epc, reader_id, antenna, read_at_dt)
-        
-        # Upsert RFID read with deduplication
-        await upsert_rfid_read(
-            org_id=org_id,
-            epc=epc,
-            reader_id=reader_id,
-            antenna=antenna,
-            rssi=float(rssi),
-            read_at=read_at_dt,
-            idem_key=idem_key
-        )
+        event = CloudEvent(**json.loads(fields["event"]))
+    except (TypeError, ValueError) as e:
+        raise PermanentFailure(f"Invalid CloudEvent: {e}")
+    
+    return parse_rfid_read(event, org_id)
+
+
+async def upsert_rfid_reads(rows: List[Dict[str, Any]]) -> Dict[str, Optional[Tuple[str, bool]]]:
+    """
+    Upsert a batch of RFID reads with deduplication in a single round trip
+    Returns a mapping of idem_key to None on success or (error, permanent) for a failed read
+    Not retried inline; transiently failed reads stay pending and are redelivered by the reclaim pass
+    """
+    try:
+        # Use the database function for atomic set-based upsert
+        with UPSERT_LATENCY.time():
+            results = await db.fetchval(
+                "SELECT upsert_rfid_reads($1::jsonb)",
+                [{**row, "read_at": row["read_at"].isoformat()} for row in rows]
+            ) or []
         
-        # Publish summary event for real-time updates
-        await publish_summary_event(org_id, epc, reader_id, rssi, read_at_dt)
+        outcomes: Dict[str, Optional[Tuple[str, bool]]] = {}
+        for item in results:
+            if item.get("ok"):
+                outcomes[item["idem_key"]] = None
+                continue
+            sqlstate = item.get("sqlstate")
+            error = item.get("error") or "Upsert failed"
+            if sqlstate:
+                error = f"{error} (SQLSTATE {sqlstate})"
+            outcomes[item["idem_key"]] = (error, is_permanent_sqlstate(sqlstate))
+            logger.warning("RFID read upsert failed", idem_key=item["idem_key"], error=error)
         
-        logger.info(
-            "RFID read processed",
-            org_id=org_id,
-            epc=epc,
-            reader_id=reader_id,
-            antenna=antenna,
-            rssi=rssi,
-            idem_key=idem_key
+        logger.debug(
+            "RFID reads upserted",
+            count=len(rows),
+            succeeded=sum(1 for outcome in outcomes.values() if outcome is None)
         )
-        
-        return True
+        return outcomes
         
     except Exception as e:
-        logger.error("Error processing RFID read", error=str(e), exc_info=True)
-        return False
+        logger.error("Error upserting RFID reads", error=str(e), count=len(rows))
+        raise
 
 
-async def upsert_rfid_read(
-    org_id: str,
-    epc: str,
-    reader_id: str,
-    antenna: int,
-    rssi: float,
-    read_at: datetime,
-    idem_key: str
-):
-    """Upsert RFID read with deduplication"""
+async def publish_summaries(summaries: List[Tuple[str, Dict[str, Any]]]):
+    """Publish aggregated read summaries for real-time updates"""
+    if not summaries:
+        return
+    
     try:
-        # Use Supabase RPC function for atomic upsert
-        result = supabase.rpc(
-            "upsert_rfid_read",
-            {
-                "p_org_id": org_id,
-                "p_epc": epc,
-                "p_reader_id": reader_id,
-                "p_antenna": antenna,
-                "p_rssi": rssi,
-                "p_read_at": read_at.isoformat(),
-                "p_idem_key": idem_key
-            }
-        ).execute()
-        
-        if result.data:
-            logger.debug("RFID read upserted", idem_key=idem_key, result=result.data)
+        if settings.summary_sink == "pubsub":
+            # Redis pub/sub keeps realtime fan-out off the database entirely
+            async with redis_client.pipeline(transaction=False) as pipe:
+                for org_id, summary in summaries:
+                    pipe.publish(summary_channel(org_id), json.dumps(summary))
+                await pipe.execute()
         else:
-            logger.warning("RFID read upsert failed", idem_key=idem_key)
-            
+            # One events row per org for Supabase Realtime, written in a single INSERT
+            await db.execute(
+                """
+                INSERT INTO events (org_id, type, payload)
+                SELECT payload->>'org_id', $1, payload
+                FROM jsonb_array_elements($2::jsonb) AS payload
+                """,
+                SUMMARY_EVENT_TYPE,
+                [summary for _, summary in summaries]
+            )
+        
+        logger.debug("Summary events published", orgs=len(summaries), sink=settings.summary_sink)
+        
     except Exception as e:
-        logger.error("Error upserting RFID read", error=str(e), idem_key=idem_key)
-        raise
+        logger.error("Error publishing summary events", error=str(e), orgs=len(summaries))
 
 
-async def publish_summary_event(
+async def flush_summaries_periodically():
+    """Emit the summaries whose window has elapsed"""
+    while True:
+        await asyncio.sleep(min(settings.summary_window_seconds, 1.0) / 2)
+        await publish_summaries(summary_aggregator.due())
+
+
+async def dead_letter_messages(
+    stream_key: str,
     org_id: str,
-    epc: str,
-    reader_id: str,
-    rssi: float,
-    read_at: datetime
-):
-    """Publish summary event for real-time updates"""
-    try:
-        # Create summary event
-        summary_event = {
-            "type": "rfid.read.summary",
-            "org_id": org_id,
-            "epc": epc,
-            "reader_id": reader_id,
-            "rssi": rssi,
-            "read_at": read_at.isoformat(),
-            "timestamp": datetime.now(timezone.utc).isoformat()
-        }
-        
-        # Insert into events table for Supabase Realtime
-        supabase.table("events").insert({
-            "org_id": org_id,
-            "type": "rfid.read.summary",
-            "payload": summary_event
-        }).execute()
-        
-        logger.debug("Summary event published", org_id=org_id, epc=epc)
+    failures: List[Tuple[str, Dict[str, str], str, bool]]
+) -> Tuple[int, List[str]]:
+    """
+    Move failed messages to the org's dead-letter stream once they qualify
+    failures holds (message_id, fields, reason, permanent). Delivery counts come from
+    the consumer group's pending entries list. Returns the dead-lettered count and the IDs left pending
+    """
+    # Delivery counts for every failed entry in one round trip
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for message_id, _, _, _ in failures:
+            pipe.xpending_range(stream_key, CONSUMER_GROUP, min=message_id, max=message_id, count=1)
+        pending = await pipe.execute()
+    
+    deliveries = {
+        message_id: entries[0]["times_delivered"] if entries else 1
+        for (message_id, _, _, _), entries in zip(failures, pending)
+    }
+    
+    quarantined = [
+        (message_id, fields, reason, permanent)
+        for message_id, fields, reason, permanent in failures
+        if should_dead_letter(permanent, deliveries[message_id], settings.max_deliveries)
+    ]
+    quarantined_ids = [message_id for message_id, _, _, _ in quarantined]
+    left_pending = [message_id for message_id, _, _, _ in failures if message_id not in quarantined_ids]
+    
+    if quarantined:
+        dlq_key = dead_letter_stream(org_id)
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for message_id, fields, reason, permanent in quarantined:
+                pipe.xadd(
+                    dlq_key,
+                    dead_letter_entry(stream_key, message_id, fields, reason, deliveries[message_id], permanent),
+                    maxlen=settings.dlq_maxlen,
+                    approximate=True
+                )
+            # Acknowledge only after the dead letters are written
+            pipe.xack(stream_key, CONSUMER_GROUP, *quarantined_ids)
+            await pipe.execute()
         
-    except Exception as e:
-        logger.error("Error publishing summary event", error=str(e), org_id=org_id, epc=epc)
+        logger.warning(
+            "Messages dead-lettered",
+            stream=stream_key,
+            dlq=dlq_key,
+            count=len(quarantined),
+            permanent=sum(1 for entry in quarantined if entry[3]),
+            reason=quarantined[0][2]
+        )
+    
+    return len(quarantined), left_pending
 
 
 async def process_stream_batch(stream_key: str, messages: List[Dict]) -> int:
     """
-    Process a batch of messages from a stream
-    Returns number of successfully processed messages
+    Process a batch of messages from a stream with a single bulk upsert
+    Invalid messages are dead-lettered at once; failed writes stay pending for redelivery
+    until MAX_DELIVERIES. Returns number of acknowledged messages
     """
-    processed_count = 0
+    # Extract org_id from stream key
+    org_id = stream_key.split(":")[1]
+    BATCH_MESSAGES.observe(len(messages))
+    
+    # Parse and validate every message, dropping duplicates before any I/O
+    parsed = []  # (message_id, fields, dedup_key) of reads to write
+    rows: Dict[Tuple, Dict[str, Any]] = {}  # reads repeated within the batch are written once
+    duplicates = []  # message IDs of reads already written within the dedup window
+    failures = []  # (message_id, fields, reason, permanent)
     
     for message_id, fields in messages:
         try:
-            # Parse CloudEvent
-            event_data = json.loads(fields["event"])
-            event = CloudEvent(**event_data)
-            
-            # Extract org_id from stream key
-            org_id = stream_key.split(":")[1]
-            
-            # Process the event
-            success = await process_rfid_read(event, org_id)
-            
-            if success:
-                processed_count += 1
-                # Acknowledge the message
-                await redis_client.xack(stream_key, CONSUMER_GROUP, message_id)
+            row = parse_message(fields, org_id)
+        except (ValueError, TypeError, KeyError) as e:
+            # PermanentFailure or a malformed value; redelivery would fail the same way
+            failures.append((message_id, fields, str(e), True))
+            READS_INVALID.inc()
+            continue
+        
+        dedup_key = DedupWindow.key(org_id, row["epc"], row["reader_id"], row["antenna"], row["read_at"])
+        if dedup_window.seen(dedup_key):
+            duplicates.append(message_id)
+            continue
+        
+        if dedup_key in rows:
+            dedup_window.record_duplicate()
+        else:
+            row["idem_key"] = idempotency_key(
+                org_id, row["epc"], row["reader_id"], row["antenna"], row["read_at"],
+                settings.idempotency_window_seconds
+            )
+            rows[dedup_key] = row
+        
+        parsed.append((message_id, fields, dedup_key))
+    
+    written: Dict[Tuple, Dict[str, Any]] = {}
+    
+    if rows:
+        upsert_started = time.perf_counter()
+        try:
+            if tracer:
+                with tracer.start_as_current_span("upsert_rfid_reads") as span:
+                    span.set_attribute("org_id", org_id)
+                    span.set_attribute("batch_size", len(rows))
+                    outcomes = await upsert_rfid_reads(list(rows.values()))
             else:
-                logger.warning("Failed to process message", message_id=message_id, stream=stream_key)
-                
+                outcomes = await upsert_rfid_reads(list(rows.values()))
         except Exception as e:
-            logger.error("Error processing message", message_id=message_id, error=str(e), exc_info=True)
+            # Transient, e.g. the database is unavailable; redelivered by the reclaim pass
+            logger.error("Bulk upsert failed", stream=stream_key, count=len(rows), error=str(e), exc_info=True)
+            outcomes = {row["idem_key"]: (f"Bulk upsert failed: {e}", False) for row in rows.values()}
+        
+        # Feed the observed latency back into the batch size
+        flush_controller.record(len(rows), time.perf_counter() - upsert_started)
+        
+        written = {
+            key: row for key, row in rows.items()
+            if row["idem_key"] in outcomes and outcomes[row["idem_key"]] is None
+        }
+        
+        for key in written:
+            dedup_window.add(key)
+        
+        # Fold into the org's realtime summary window; dedup-dropped repeats are not counted
+        summary_aggregator.add(org_id, list(written.values()))
+        
+        for message_id, fields, key in parsed:
+            if key not in written:
+                # Data errors and unknown readers are dead-lettered on first sight
+                reason, permanent = outcomes.get(rows[key]["idem_key"]) or ("Read missing from upsert result", False)
+                failures.append((message_id, fields, reason, permanent))
+    
+    # Acknowledge only the messages whose reads were written or already known, in one XACK
+    acked = [message_id for message_id, _, key in parsed if key in written] + duplicates
+    if acked:
+        await redis_client.xack(stream_key, CONSUMER_GROUP, *acked)
+    
+    dead_lettered, left_pending = (0, [])
+    if failures:
+        dead_lettered, left_pending = await dead_letter_messages(stream_key, org_id, failures)
+        for message_id in left_pending:
+            logger.warning("Failed to process message, left pending", message_id=message_id, stream=stream_key)
+    
+    READS_WRITTEN.inc(len(acked) - len(duplicates))
+    READS_DUPLICATE.inc(len(duplicates))
+    READS_FAILED.inc(len(left_pending))
+    READS_DEAD_LETTERED.inc(dead_lettered)
+    
+    logger.info(
+        "RFID reads processed",
+        org_id=org_id,
+        processed=len(acked) - len(duplicates),
+        duplicates=len(duplicates),
+        dead_lettered=dead_lettered,
+        pending=len(left_pending),
+        total=len(messages)
+    )
     
-    return processed_count
+    return len(acked) + dead_lettered
+
+
+def flush_stream_buffers(force: bool = False) -> Optional[float]:
+    """
+    Dispatch buffered batches that are full or past the max-wait timer
+    Database backpressure (no idle pool connections) lets buffers grow into larger batches.
+    Returns milliseconds until the next buffer's timer expires, if one can be flushed then.
+    """
+    busy = scheduler.busy_streams()
+    backpressure = db.idle_connections == 0
+    now = time.monotonic()
+    next_due_ms = None
+    
+    for stream_key, buffered, first_buffered_at in stream_buffers.items():
+        if force:
+            scheduler.submit(stream_key, stream_buffers.take(stream_key))
+            continue
+        if scheduler.in_flight >= scheduler.max_concurrency:
+            return None
+        # A stream's next batch waits for the previous one to keep per-stream order
+        if stream_key in busy:
+            continue
+        if flush_controller.should_flush(buffered, first_buffered_at, backpressure, now=now):
+            scheduler.submit(stream_key, stream_buffers.take(stream_key))
+        elif not backpressure:
+            due_ms = flush_controller.max_wait_ms - (now - first_buffered_at) * 1000
+            next_due_ms = due_ms if next_due_ms is None else min(next_due_ms, due_ms)
+    
+    return next_due_ms
 
 
 async def consume_streams():
     """Main consumer loop"""
     logger.info("Starting stream consumer", consumer_name=CONSUMER_NAME)
     
-    # Create consumer groups
-    await create_consumer_groups()
+    # Discover registered streams and create their consumer groups
+    await stream_registry.bootstrap()
     
     while True:
         try:
-            # Get all org streams
-            stream_keys = await redis_client.keys("org:*:rfid")
+            # Pick up streams registered since the last iteration
+            await stream_registry.refresh()
+            
+            next_due_ms = flush_stream_buffers()
+            
+            # Streams are read ahead into their buffers, even while a batch is in flight
+            stream_keys = [
+                key for key in stream_registry.stream_keys()
+                if flush_controller.can_read(stream_buffers.size(key))
+            ]
             
             if not stream_keys:
-                await asyncio.sleep(1)
+                await scheduler.wait_any(timeout=flush_controller.max_wait_ms / 1000)
                 continue
             
-            # Read from all streams
-            streams = {key: ">" for key in stream_keys}
-            messages = await redis_client.xreadgroup(
-                CONSUMER_GROUP,
-                CONSUMER_NAME,
-                streams,
-                count=BATCH_SIZE,
-                block=IDLE_TIME
-            )
-            
-            total_processed = 0
+            # Block no longer than the next buffered batch may still wait
+            if next_due_ms is not None:
+                block = max(1, int(next_due_ms))
+            elif scheduler.in_flight or len(stream_buffers):
+                block = BUSY_POLL_TIME
+            else:
+                block = IDLE_TIME
             
-            for stream_key, stream_messages in messages:
-                processed = await process_stream_batch(stream_key, stream_messages)
-                total_processed += processed
-                
-                logger.debug(
-                    "Processed stream batch",
-                    stream=stream_key,
-                    processed=processed,
-                    total=len(stream_messages)
+            streams = {key: ">" for key in stream_keys}
+            try:
+                messages = await redis_client.xreadgroup(
+                    CONSUMER_GROUP,
+                    CONSUMER_NAME,
+                    streams,
+                    count=flush_controller.batch_size,
+                    block=block
                 )
+            except redis.ResponseError as e:
+                if "NOGROUP" not in str(e):
+                    raise
+                # A stream was deleted and recreated without its group
+                logger.warning("Consumer group missing, recreating", error=str(e))
+                await stream_registry.ensure_groups(stream_keys)
+                continue
             
-            if total_processed > 0:
-                logger.info("Processed messages", count=total_processed)
-            
-            # Check for pending entries and process them
-            await process_pending_entries(stream_keys)
+            for stream_key, stream_messages in messages:
+                stream_buffers.add(stream_key, stream_messages)
             
         except Exception as e:
             logger.error("Error in consumer loop", error=str(e), exc_info=True)
             await asyncio.sleep(5)  # Back off on error
 
 
-async def process_pending_entries(stream_keys: List[str]):
-    """Process pending entries that weren't acknowledged"""
-    for stream_key in stream_keys:
-        try:
-            # Get pending entries
-            pending = await redis_client.xpending_range(
-                stream_key,
-                CONSUMER_GROUP,
-                min="-",
-                max="+",
-                count=PENDING_ENTRIES_LIMIT
-            )
-            
-            if pending:
-                logger.info("Processing pending entries", stream=stream_key, count=len(pending))
+async def reclaim_pending_entries():
+    """
+    Periodically claim entries left pending by crashed or stalled consumers
+    Runs on its own timer with XAUTOCLAIM cursor paging, outside the read loop
+    """
+    cursors: Dict[str, str] = {}
+    
+    while True:
+        await asyncio.sleep(settings.pending_reclaim_interval_seconds)
+        
+        for stream_key in stream_registry.stream_keys():
+            try:
+                start_id = cursors.get(stream_key, "0-0")
                 
-                # Claim and process pending entries
-                for entry in pending:
-                    message_id = entry["message_id"]
-                    
-                    # Claim the message
-                    claimed = await redis_client.xclaim(
+                for _ in range(PENDING_MAX_PAGES):
+                    # Claims up to PENDING_PAGE_SIZE idle entries in one round trip
+                    response = await redis_client.xautoclaim(
                         stream_key,
                         CONSUMER_GROUP,
                         CONSUMER_NAME,
-                        min_idle_time=60000,  # 1 minute
-                        message_ids=[message_id]
+                        min_idle_time=PENDING_MIN_IDLE_TIME,
+                        start_id=start_id,
+                        count=PENDING_PAGE_SIZE
                     )
+                    start_id = response[0]
+                    # Entries trimmed from the stream come back without data
+                    claimed = [(message_id, fields) for message_id, fields in response[1] if fields]
                     
                     if claimed:
-                        processed = await process_stream_batch(stream_key, claimed)
-                        if processed > 0:
-                            logger.info("Processed claimed message", message_id=message_id)
-                        
+                        logger.info("Processing claimed entries", stream=stream_key, count=len(claimed))
+                        await scheduler.run(stream_key, claimed)
+                    
+                    if start_id == "0-0":
+                        break
+                
+                cursors[stream_key] = start_id
+                
+                # Unacknowledged backlog for the pending-entries gauge
+                summary = await redis_client.xpending(stream_key, CONSUMER_GROUP)
+                pending_entries[stream_key] = summary["pending"]
+                
+            except Exception as e:
+                logger.error("Error reclaiming pending entries", stream=stream_key, error=str(e))
+
+
+async def trim_stream(stream_key: str):
+    """
+    Trim a stream to the lowest ID any consumer group still needs, bounded by retention
+    MINID trimming never drops an entry that is pending or not yet delivered to a group
+    """
+    org_id = stream_key.split(":")[1]
+    
+    groups = await redis_client.xinfo_groups(stream_key)
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for group in groups:
+            pipe.xpending(stream_key, group["name"])
+        pending = await pipe.execute()
+    
+    minid = retention_policy.trim_minid(org_id, [
+        (group["last-delivered-id"], summary["min"] if summary["pending"] else None)
+        for group, summary in zip(groups, pending)
+    ])
+    
+    if minid:
+        # Approximate trimming only removes whole radix tree nodes, which is much cheaper
+        trimmed = await redis_client.xtrim(stream_key, minid=minid, approximate=True)
+        STREAM_TRIMMED.inc(trimmed)
+        if trimmed:
+            logger.debug("Stream trimmed", stream=stream_key, minid=minid, trimmed=trimmed)
+    
+    stream_memory[stream_key] = await redis_client.memory_usage(stream_key) or 0
+
+
+async def trim_streams_periodically():
+    """Trim acknowledged entries from the streams this worker consumes, on its own timer"""
+    while True:
+        await asyncio.sleep(settings.stream_trim_interval_seconds)
+        
+        for stream_key in stream_registry.stream_keys():
+            try:
+                await trim_stream(stream_key)
+            except Exception as e:
+                logger.error("Error trimming stream", stream=stream_key, error=str(e))
+
+
+async def maintain_partitions_periodically():
+    """Run the partition manager on its own timer; a no-op while another worker holds its lock"""
+    while True:
+        try:
+            async with db.acquire() as conn:
+                await partition_manager.run(conn)
         except Exception as e:
-            logger.error("Error processing pending entries", stream=stream_key, error=str(e))
+            logger.error("Error maintaining partitions", error=str(e), exc_info=True)
+        
+        await asyncio.sleep(settings.partition_maintenance_interval_seconds)
 
 
 async def main():
@@ -412,16 +737,45 @@ async def main():
     # Initialize services
     await initialize_services()
     
-    # Start consuming
+    # Reclaim stalled pending entries in the background
+    reclaim_task = asyncio.create_task(reclaim_pending_entries())
+    
+    # Publish realtime summaries in the background
+    summary_task = asyncio.create_task(flush_summaries_periodically())
+    
+    # Trim acknowledged stream entries in the background
+    trim_task = asyncio.create_task(trim_streams_periodically())
+    
+    # Keep reads_parent partitions ahead of ingest in the background
+    partition_task = None
+    if settings.partition_maintenance_enabled:
+        partition_task = asyncio.create_task(maintain_partitions_periodically())
+    
+    # Start consuming; SIGTERM from the supervisor or orchestrator drains gracefully
+    consumer_task = asyncio.create_task(consume_streams())
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, consumer_task.cancel)
+    
     try:
-        await consume_streams()
-    except KeyboardInterrupt:
+        await consumer_task
+    except (KeyboardInterrupt, asyncio.CancelledError):
         logger.info("Worker shutdown requested")
     except Exception as e:
         logger.error("Worker error", error=str(e), exc_info=True)
     finally:
+        reclaim_task.cancel()
+        summary_task.cancel()
+        trim_task.cancel()
+        if partition_task:
+            partition_task.cancel()
+        if scheduler:
+            # Finish in-flight batches, then whatever is still buffered
+            await scheduler.drain()
+            flush_stream_buffers(force=True)
+            await scheduler.drain()
+        await publish_summaries(summary_aggregator.drain())
         if redis_client:
             await redis_client.close()
+        await db.close()
         logger.info("Worker shutdown complete")
 
 
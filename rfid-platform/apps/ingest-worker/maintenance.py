@@ -0,0 +1,51 @@
+"""
+RFID Platform - Ingest Worker Maintenance
+Runs one partition maintenance pass and exits, for cron jobs and deploy hooks
+"""
+
+import asyncio
+import sys
+
+import structlog
+
+from .config import Settings
+from .db import Database
+from .partitions import PartitionManager
+from .retention import parse_retention_overrides
+
+logger = structlog.get_logger()
+
+settings = Settings()
+
+
+async def main() -> int:
+    """Maintenance entry point; exits non-zero if the pass failed or could not take the lock"""
+    db = Database(settings.database_url, min_size=1, max_size=1)
+    manager = PartitionManager(
+        days_ahead=settings.partition_days_ahead,
+        retention_days=settings.partition_retention_days,
+        brin_after_days=settings.partition_brin_after_days,
+        retention_overrides=parse_retention_overrides(
+            settings.partition_retention_overrides
+        ),
+        statement_timeout_seconds=settings.partition_statement_timeout_seconds,
+    )
+
+    await db.connect()
+    try:
+        async with db.acquire() as conn:
+            plan = await manager.run(conn)
+    except Exception as e:
+        logger.error("Partition maintenance failed", error=str(e), exc_info=True)
+        return 1
+    finally:
+        await db.close()
+
+    if plan is None:
+        logger.warning("Partition maintenance skipped, another worker holds the lock")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
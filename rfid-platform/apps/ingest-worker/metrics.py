@@ -0,0 +1,117 @@
+"""
+RFID Platform - Ingest Worker Metrics
+Prometheus instruments for the worker; gauges over in-memory state are read at scrape time
+"""
+
+from typing import Dict, Iterator, Optional
+
+from prometheus_client import Counter, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.registry import Collector
+
+BATCH_MESSAGES = Histogram(
+    "rfid_platform_worker_batch_size",
+    "Messages per stream batch",
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000),
+)
+
+UPSERT_LATENCY = Histogram(
+    "rfid_platform_worker_upsert_duration_seconds",
+    "Bulk upsert round trip latency",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+
+STREAM_TRIMMED = Counter(
+    "rfid_platform_worker_stream_trimmed_entries_total",
+    "Acknowledged stream entries removed by the trim loop",
+)
+
+READS = Counter(
+    "rfid_platform_worker_reads_total", "Stream messages by outcome", ["outcome"]
+)
+
+# Bound once; labels() is a dict lookup under a lock on every call
+READS_WRITTEN = READS.labels("written")
+READS_DUPLICATE = READS.labels("duplicate")
+READS_FAILED = READS.labels("failed")
+READS_INVALID = READS.labels("invalid")
+READS_DEAD_LETTERED = READS.labels("dead_lettered")
+
+
+class WorkerStateCollector(Collector):
+    """
+    Exposes scheduler, dedup and pending-entry state without touching the hot path
+    pending_entries is the stream -> XPENDING count map refreshed by the reclaim loop,
+    stream_memory the stream -> MEMORY USAGE map refreshed by the trim loop
+    """
+
+    def __init__(
+        self,
+        scheduler,
+        dedup_window,
+        pending_entries: Dict[str, int],
+        flush_controller=None,
+        stream_memory: Optional[Dict[str, int]] = None,
+    ):
+        self.scheduler = scheduler
+        self.dedup_window = dedup_window
+        self.pending_entries = pending_entries
+        self.flush_controller = flush_controller
+        self.stream_memory = stream_memory if stream_memory is not None else {}
+
+    def collect(self) -> Iterator:
+        lag = GaugeMetricFamily(
+            "rfid_platform_worker_stream_lag_seconds",
+            "Age of the oldest message in the latest batch started per org",
+            labels=["org_id"],
+        )
+        for org_id, lag_ms in list(self.scheduler.org_lag_ms.items()):
+            lag.add_metric([org_id], lag_ms / 1000)
+        yield lag
+
+        yield GaugeMetricFamily(
+            "rfid_platform_worker_batches_in_flight",
+            "Stream batches currently being processed",
+            value=self.scheduler.in_flight,
+        )
+
+        if self.flush_controller is not None:
+            yield GaugeMetricFamily(
+                "rfid_platform_worker_batch_size_target",
+                "Current adaptive batch size",
+                value=self.flush_controller.batch_size,
+            )
+
+        pending = GaugeMetricFamily(
+            "rfid_platform_worker_pending_entries",
+            "Entries delivered to the consumer group but not yet acknowledged",
+            labels=["stream"],
+        )
+        for stream_key, count in list(self.pending_entries.items()):
+            pending.add_metric([stream_key], count)
+        yield pending
+
+        memory = GaugeMetricFamily(
+            "rfid_platform_worker_stream_memory_bytes",
+            "Redis memory used by each stream, sampled by the trim loop",
+            labels=["stream"],
+        )
+        for stream_key, size in list(self.stream_memory.items()):
+            memory.add_metric([stream_key], size)
+        yield memory
+
+        yield CounterMetricFamily(
+            "rfid_platform_worker_dedup_checked",
+            "Reads checked against the local dedup window",
+            value=self.dedup_window.checked,
+        )
+        yield CounterMetricFamily(
+            "rfid_platform_worker_dedup_duplicates",
+            "Reads dropped as duplicates before any database I/O",
+            value=self.dedup_window.duplicates,
+        )
+        yield GaugeMetricFamily(
+            "rfid_platform_worker_dedup_entries",
+            "Entries held in the local dedup window",
+            value=len(self.dedup_window),
+        )
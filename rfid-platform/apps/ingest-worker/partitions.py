@@ -0,0 +1,201 @@
+"""
+RFID Platform - Ingest Worker Partition Manager
+Keeps reads_parent partitioned ahead of time, cold partitions on BRIN and expired data gone
+"""
+
+import re
+from datetime import date, datetime, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import structlog
+
+logger = structlog.get_logger()
+
+# Session advisory lock; one manager runs at a time across all workers
+PARTITION_LOCK_KEY = 0x72666964  # "rfid"
+PARTITION_NAME_PATTERN = re.compile(r"^reads_\d{4}_\d{2}_\d{2}$")
+# B-tree indexes replaced by BRIN (read_at) once a partition is cold
+HOT_ONLY_INDEX_SUFFIXES = ("_org_read_at_idx", "_reader_read_at_idx")
+BRIN_INDEX_SUFFIX = "_read_at_brin"
+PURGE_BATCH_SIZE = 10000
+
+# (partitions to drop, partitions to convert to BRIN, partition -> orgs whose reads expired)
+PartitionPlan = Tuple[List[str], List[str], Dict[str, List[str]]]
+
+
+def plan_partitions(
+    partitions: Sequence[Tuple[str, date, bool]],
+    org_ids: Sequence[str],
+    today: date,
+    retention_days: int,
+    brin_after_days: int,
+    retention_overrides: Optional[Dict[str, float]] = None,
+) -> PartitionPlan:
+    """
+    Decide maintenance for (name, day, has_brin) partitions
+    A partition is dropped once every org's retention has passed it; orgs with a
+    shorter retention have their reads deleted from it before that.
+    """
+    overrides = retention_overrides or {}
+    horizon = max([retention_days, *overrides.values()])
+
+    drop, brin = [], []
+    purge: Dict[str, List[str]] = {}
+
+    for name, day, has_brin in partitions:
+        age = (today - day).days
+        if age > horizon:
+            drop.append(name)
+            continue
+
+        if not has_brin and age > brin_after_days:
+            brin.append(name)
+
+        expired = [
+            org_id for org_id in org_ids if age > overrides.get(org_id, retention_days)
+        ]
+        if expired:
+            purge[name] = expired
+
+    return drop, brin, purge
+
+
+def _quote(partition_name: str, suffix: str = "") -> str:
+    """
+    Quoted partition (or partition index) name for DDL
+    Names are interpolated, so only the generated reads_YYYY_MM_DD form is accepted
+    """
+    if not PARTITION_NAME_PATTERN.match(partition_name):
+        raise ValueError(f"Unexpected partition name: {partition_name}")
+    return f'"{partition_name}{suffix}"'
+
+
+class PartitionManager:
+    """
+    One maintenance pass over reads_parent, on a dedicated connection
+    Expired partitions are detached CONCURRENTLY, so ingest never waits on an
+    ACCESS EXCLUSIVE lock, and BRIN indexes are built CONCURRENTLY.
+    """
+
+    def __init__(
+        self,
+        days_ahead: int = 14,
+        retention_days: int = 90,
+        brin_after_days: int = 7,
+        retention_overrides: Optional[Dict[str, float]] = None,
+        statement_timeout_seconds: float = 3600.0,
+    ):
+        self.days_ahead = days_ahead
+        self.retention_days = retention_days
+        self.brin_after_days = brin_after_days
+        self.retention_overrides = retention_overrides or {}
+        self.statement_timeout_seconds = statement_timeout_seconds
+
+    async def run(self, conn, today: Optional[date] = None) -> Optional[PartitionPlan]:
+        """Run one pass; returns None if another worker holds the maintenance lock"""
+        if not await conn.fetchval(
+            "SELECT pg_try_advisory_lock($1)", PARTITION_LOCK_KEY
+        ):
+            logger.debug("Partition maintenance running elsewhere")
+            return None
+
+        try:
+            created = await conn.fetchval(
+                "SELECT ensure_reads_partitions($1)", self.days_ahead
+            )
+
+            rows = await conn.fetch(
+                "SELECT partition_name, range_start, has_brin, detach_pending FROM reads_partitions()"
+            )
+            for row in rows:
+                if row["detach_pending"]:
+                    # An earlier concurrent detach was interrupted
+                    name = _quote(row["partition_name"])
+                    await self._execute(
+                        conn,
+                        f"ALTER TABLE reads_parent DETACH PARTITION {name} FINALIZE",
+                    )
+                    await self._execute(conn, f"DROP TABLE IF EXISTS {name}")
+
+            org_ids = [row["id"] for row in await conn.fetch("SELECT id FROM orgs")]
+            today = today or datetime.now(timezone.utc).date()
+            drop, brin, purge = plan_partitions(
+                [
+                    (
+                        row["partition_name"],
+                        row["range_start"].astimezone(timezone.utc).date(),
+                        row["has_brin"],
+                    )
+                    for row in rows
+                    if not row["detach_pending"]
+                ],
+                org_ids,
+                today,
+                self.retention_days,
+                self.brin_after_days,
+                self.retention_overrides,
+            )
+
+            for name in drop:
+                await self._execute(
+                    conn,
+                    f"ALTER TABLE reads_parent DETACH PARTITION {_quote(name)} CONCURRENTLY",
+                )
+                await self._execute(conn, f"DROP TABLE {_quote(name)}")
+
+            for name in brin:
+                await self._execute(
+                    conn,
+                    f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {_quote(name, BRIN_INDEX_SUFFIX)} "
+                    f"ON {_quote(name)} USING brin (read_at)",
+                )
+                for suffix in HOT_ONLY_INDEX_SUFFIXES:
+                    await self._execute(
+                        conn,
+                        f"DROP INDEX CONCURRENTLY IF EXISTS {_quote(name, suffix)}",
+                    )
+
+            purged = 0
+            for name, expired_org_ids in purge.items():
+                purged += await self._purge(conn, name, expired_org_ids)
+
+            # Rollup buckets past what their readers query
+            await conn.execute("SELECT prune_read_rollups()")
+            await conn.execute("SELECT prune_asset_reads_hourly()")
+
+            logger.info(
+                "Partition maintenance complete",
+                created=created,
+                dropped=len(drop),
+                converted_to_brin=len(brin),
+                purged_reads=purged,
+            )
+            return drop, brin, purge
+
+        finally:
+            await conn.execute("SELECT pg_advisory_unlock($1)", PARTITION_LOCK_KEY)
+
+    async def _execute(self, conn, statement: str):
+        logger.info("Partition maintenance", statement=statement)
+        await conn.execute(statement, timeout=self.statement_timeout_seconds)
+
+    async def _purge(self, conn, partition_name: str, org_ids: List[str]) -> int:
+        """Delete expired orgs' reads from one partition in short batches"""
+        table = _quote(partition_name)
+        deleted = 0
+        while True:
+            status = await conn.execute(
+                f"""
+                DELETE FROM {table}
+                WHERE ctid = ANY(ARRAY(
+                    SELECT ctid FROM {table} WHERE org_id = ANY($1::text[]) LIMIT $2
+                ))
+                """,
+                org_ids,
+                PURGE_BATCH_SIZE,
+                timeout=self.statement_timeout_seconds,
+            )
+            count = int(status.split()[-1])
+            deleted += count
+            if count < PURGE_BATCH_SIZE:
+                return deleted
@@ -0,0 +1,75 @@
+"""
+RFID Platform - Ingest Worker Stream Retention
+Decides how far an org stream can be trimmed: never past an unacknowledged entry
+"""
+
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+def parse_stream_id(stream_id: str) -> Tuple[int, int]:
+    """Stream ID "ms-seq" as a sortable tuple"""
+    ms, _, seq = stream_id.partition("-")
+    return int(ms), int(seq or 0)
+
+
+def parse_retention_overrides(spec: str) -> Dict[str, float]:
+    """Per-org retention from "org_a=3600,org_b=86400"; raises ValueError if malformed"""
+    overrides = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        org_id, separator, seconds = item.partition("=")
+        if not separator or not org_id.strip():
+            raise ValueError(f"Invalid retention override: {item}")
+        overrides[org_id.strip()] = float(seconds)
+    return overrides
+
+
+def acknowledged_floor(groups: List[Tuple[str, Optional[str]]]) -> Optional[str]:
+    """
+    Lowest stream ID that some consumer group still needs
+    groups holds (last_delivered_id, oldest_pending_id or None) per group. Everything
+    below the result has been delivered to and acknowledged by every group.
+    """
+    if not groups:
+        # Nothing has consumed the stream yet
+        return None
+    return min(
+        (oldest_pending or last_delivered for last_delivered, oldest_pending in groups),
+        key=parse_stream_id,
+    )
+
+
+class RetentionPolicy:
+    """
+    Acknowledged entries are kept for a retention period, for replay and debugging,
+    then trimmed with XTRIM MINID. Orgs can override the default period.
+    """
+
+    def __init__(
+        self, default_seconds: float, overrides: Optional[Dict[str, float]] = None
+    ):
+        self.default_seconds = default_seconds
+        self.overrides = overrides or {}
+
+    def retention_for(self, org_id: str) -> float:
+        return self.overrides.get(org_id, self.default_seconds)
+
+    def trim_minid(
+        self,
+        org_id: str,
+        groups: List[Tuple[str, Optional[str]]],
+        now: Optional[float] = None,
+    ) -> Optional[str]:
+        """MINID to trim an org stream to, or None when nothing may be trimmed"""
+        floor = acknowledged_floor(groups)
+        if floor is None:
+            return None
+
+        now = now if now is not None else time.time()
+        cutoff_ms = max(0, int((now - self.retention_for(org_id)) * 1000))
+        cutoff = (cutoff_ms, 0)
+
+        minid = min(parse_stream_id(floor), cutoff)
+        if minid == (0, 0):
+            return None
+        return f"{minid[0]}-{minid[1]}"
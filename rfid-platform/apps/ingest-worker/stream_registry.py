@@ -0,0 +1,175 @@
+"""
+RFID Platform - Ingest Worker Stream Registry
+Discovers per-org RFID streams from the registry maintained by the gateway
+"""
+
+import hashlib
+import time
+from typing import List, Set
+
+import redis.asyncio as redis
+import structlog
+
+logger = structlog.get_logger()
+
+# Must match apps/gateway/streams.py
+STREAM_REGISTRY_KEY = "rfid:streams"
+STREAM_INDEX_KEY = "rfid:streams:index"
+ORG_STREAM_PATTERN = "org:*:rfid"
+
+
+def stream_shard(stream_key: str, shard_count: int) -> int:
+    """
+    Shard that owns a stream, by rendezvous (highest random weight) hashing
+    Changing shard_count only moves the streams of the added or removed shards
+    """
+    if shard_count <= 1:
+        return 0
+    return max(
+        range(shard_count),
+        key=lambda shard: hashlib.blake2b(
+            f"{shard}:{stream_key}".encode("utf-8"), digest_size=8
+        ).digest(),
+    )
+
+
+class StreamRegistry:
+    """
+    Tracks the org streams this worker consumes
+    New streams arrive incrementally through the index stream; the registry set
+    is re-read periodically as a safety net. Consumer groups are created lazily.
+    With shard_count > 1 only the streams hashed to shard_index are consumed.
+    """
+
+    def __init__(
+        self,
+        redis_client: redis.Redis,
+        group: str,
+        refresh_interval: float = 1.0,
+        resync_interval: float = 60.0,
+        shard_index: int = 0,
+        shard_count: int = 1,
+    ):
+        self.redis = redis_client
+        self.group = group
+        self.refresh_interval = refresh_interval
+        self.resync_interval = resync_interval
+        self.shard_index = shard_index
+        self.shard_count = shard_count
+        self.streams: Set[str] = set()
+        self._index_cursor = "0-0"
+        self._last_refresh = 0.0
+        self._last_resync = 0.0
+
+    def __len__(self) -> int:
+        return len(self.streams)
+
+    def stream_keys(self) -> List[str]:
+        return sorted(self.streams)
+
+    def owns(self, stream_key: str) -> bool:
+        """Whether this worker's shard consumes a stream"""
+        return stream_shard(stream_key, self.shard_count) == self.shard_index
+
+    async def bootstrap(self):
+        """Load every registered stream; seeds the registry from a SCAN the first time"""
+        # Remember where the index ends so nothing registered meanwhile is missed
+        last = await self.redis.xrevrange(STREAM_INDEX_KEY, count=1)
+        if last:
+            self._index_cursor = last[0][0]
+
+        if not await self.redis.scard(STREAM_REGISTRY_KEY):
+            # Streams created before the registry existed; SCAN is incremental, unlike KEYS
+            seeded = [
+                key
+                async for key in self.redis.scan_iter(
+                    match=ORG_STREAM_PATTERN, _type="stream"
+                )
+            ]
+            if seeded:
+                await self.redis.sadd(STREAM_REGISTRY_KEY, *seeded)
+                logger.info("Seeded stream registry", streams=len(seeded))
+
+        await self._resync()
+
+    async def refresh(self) -> List[str]:
+        """
+        Pick up streams registered since the last call
+        Returns the newly discovered stream keys
+        """
+        now = time.monotonic()
+        if now - self._last_refresh < self.refresh_interval:
+            return []
+        self._last_refresh = now
+
+        if now - self._last_resync >= self.resync_interval:
+            return await self._resync()
+
+        discovered = []
+        while True:
+            entries = await self.redis.xread(
+                {STREAM_INDEX_KEY: self._index_cursor}, count=1000
+            )
+            if not entries:
+                break
+
+            for message_id, fields in entries[0][1]:
+                self._index_cursor = message_id
+                stream_key = fields.get("stream")
+                if (
+                    stream_key
+                    and stream_key not in self.streams
+                    and self.owns(stream_key)
+                ):
+                    discovered.append(stream_key)
+
+            if len(entries[0][1]) < 1000:
+                break
+
+        await self._add(discovered)
+        return discovered
+
+    async def ensure_groups(self, stream_keys: List[str]):
+        """Create the consumer group on each stream if it does not exist yet"""
+        for stream_key in stream_keys:
+            try:
+                await self.redis.xgroup_create(
+                    stream_key, self.group, id="0", mkstream=True
+                )
+                logger.info(
+                    "Created consumer group", stream=stream_key, group=self.group
+                )
+            except redis.ResponseError as e:
+                if "BUSYGROUP" in str(e):
+                    # Group already exists
+                    logger.debug(
+                        "Consumer group already exists",
+                        stream=stream_key,
+                        group=self.group,
+                    )
+                else:
+                    logger.error(
+                        "Failed to create consumer group",
+                        stream=stream_key,
+                        error=str(e),
+                    )
+
+    async def _resync(self) -> List[str]:
+        self._last_resync = time.monotonic()
+        registered = {
+            key async for key in self.redis.sscan_iter(STREAM_REGISTRY_KEY, count=1000)
+        }
+        discovered = [
+            key for key in registered if key not in self.streams and self.owns(key)
+        ]
+        await self._add(discovered)
+        return discovered
+
+    async def _add(self, stream_keys: List[str]):
+        if not stream_keys:
+            return
+        await self.ensure_groups(stream_keys)
+        self.streams.update(stream_keys)
+        logger.info(
+            "Discovered streams", streams=len(stream_keys), total=len(self.streams)
+        )
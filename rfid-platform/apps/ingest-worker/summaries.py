@@ -0,0 +1,116 @@
+"""
+RFID Platform - Ingest Worker Summary Aggregation
+Collapses processed reads into one realtime summary per org per window
+"""
+
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+SUMMARY_EVENT_TYPE = "rfid.read.summary"
+
+
+def summary_channel(org_id: str) -> str:
+    """Redis pub/sub channel for an org's read summaries"""
+    return f"org:{org_id}:rfid:summary"
+
+
+class SummaryAggregator:
+    """
+    Per-org window of read statistics keyed by EPC
+    An org's summary is emitted once its window has elapsed, and never more
+    often than max_per_second allows; reads keep accumulating meanwhile.
+    Counts are of reads as stored: repeats that the dedup window drops, within
+    a batch or across batches, collapse into one read like they do in reads_parent.
+    """
+
+    def __init__(
+        self,
+        window_seconds: float = 1.0,
+        max_per_second: float = 1.0,
+        max_epcs: int = 500,
+    ):
+        self.window_seconds = window_seconds
+        self.min_interval = 1.0 / max_per_second if max_per_second > 0 else 0.0
+        self.max_epcs = max_epcs
+        self._pending: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._window_started: Dict[str, Tuple[float, datetime]] = {}
+        self._last_emitted: Dict[str, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def add(self, org_id: str, rows: List[Dict[str, Any]], now: Optional[float] = None):
+        """Fold written reads into the org's current window"""
+        if not rows:
+            return
+
+        now = now if now is not None else time.monotonic()
+        epcs = self._pending.setdefault(org_id, {})
+        self._window_started.setdefault(org_id, (now, datetime.now(timezone.utc)))
+
+        for row in rows:
+            stats = epcs.get(row["epc"])
+            if stats is None:
+                epcs[row["epc"]] = {
+                    "epc": row["epc"],
+                    "reads": 1,
+                    "max_rssi": row["rssi"],
+                    "last_seen_at": row["read_at"],
+                    "reader_id": row["reader_id"],
+                }
+                continue
+
+            stats["reads"] += 1
+            stats["max_rssi"] = max(stats["max_rssi"], row["rssi"])
+            if row["read_at"] >= stats["last_seen_at"]:
+                stats["last_seen_at"] = row["read_at"]
+                stats["reader_id"] = row["reader_id"]
+
+    def due(self, now: Optional[float] = None) -> List[Tuple[str, Dict[str, Any]]]:
+        """Take the summaries whose window has elapsed and whose rate cap allows emitting"""
+        now = now if now is not None else time.monotonic()
+        ready = []
+
+        # An emission time only matters while it can still hold an org back
+        for org_id, emitted in list(self._last_emitted.items()):
+            if now - emitted >= self.min_interval:
+                del self._last_emitted[org_id]
+
+        for org_id in list(self._pending):
+            started, _ = self._window_started[org_id]
+            if now - started < self.window_seconds:
+                continue
+            if now - self._last_emitted.get(org_id, float("-inf")) < self.min_interval:
+                continue
+
+            ready.append((org_id, self._take(org_id)))
+            self._last_emitted[org_id] = now
+
+        return ready
+
+    def drain(self) -> List[Tuple[str, Dict[str, Any]]]:
+        """Take every pending summary regardless of windows, e.g. on shutdown"""
+        return [(org_id, self._take(org_id)) for org_id in list(self._pending)]
+
+    def _take(self, org_id: str) -> Dict[str, Any]:
+        epcs = self._pending.pop(org_id)
+        _, window_start = self._window_started.pop(org_id)
+
+        # Most recently seen tags first; the tail is dropped past max_epcs
+        stats = sorted(
+            epcs.values(), key=lambda item: item["last_seen_at"], reverse=True
+        )
+
+        return {
+            "type": SUMMARY_EVENT_TYPE,
+            "org_id": org_id,
+            "window_start": window_start.isoformat(),
+            "window_end": datetime.now(timezone.utc).isoformat(),
+            "reads": sum(item["reads"] for item in stats),
+            "epc_count": len(stats),
+            "epcs": [
+                {**item, "last_seen_at": item["last_seen_at"].isoformat()}
+                for item in stats[: self.max_epcs]
+            ],
+        }
@@ -0,0 +1,122 @@
+"""
+RFID Platform - Ingest Worker Supervisor
+Runs one worker process per core, restarts crashed workers and drains them on shutdown
+"""
+
+import asyncio
+import os
+import signal
+import sys
+import time
+from typing import Dict
+
+import structlog
+
+from .config import Settings
+
+logger = structlog.get_logger()
+
+settings = Settings()
+
+# Workers run as modules of the same package, so their relative imports resolve
+WORKER_MODULE = f"{__package__}.main"
+HEALTHY_RUN_SECONDS = 60  # a worker that ran this long restarts without backoff
+
+
+def worker_env(index: int, count: int) -> Dict[str, str]:
+    """Environment for one worker process: unique consumer name, shard and metrics port"""
+    env = dict(os.environ)
+    env["WORKER_ID"] = f"{settings.worker_id}-{index}"
+    env["WORKER_SHARD_INDEX"] = str(index if settings.shard_streams else 0)
+    env["WORKER_SHARD_COUNT"] = str(count if settings.shard_streams else 1)
+    env["METRICS_PORT"] = str(settings.metrics_port + index)
+    return env
+
+
+async def supervise_worker(index: int, count: int, stopping: asyncio.Event):
+    """Keep one worker process running until shutdown, restarting it with exponential backoff"""
+    backoff = 1.0
+
+    while not stopping.is_set():
+        started = time.monotonic()
+        process = await asyncio.create_subprocess_exec(
+            sys.executable,
+            "-m",
+            WORKER_MODULE,
+            env=worker_env(index, count),
+            # Terminal signals go to the supervisor only; it decides how workers stop
+            start_new_session=True,
+        )
+        logger.info("Worker started", index=index, pid=process.pid)
+
+        exited = asyncio.create_task(process.wait())
+        stop_requested = asyncio.create_task(stopping.wait())
+        await asyncio.wait(
+            {exited, stop_requested}, return_when=asyncio.FIRST_COMPLETED
+        )
+
+        if not exited.done():
+            # Let the worker finish in-flight batches before forcing it down
+            process.send_signal(signal.SIGTERM)
+            try:
+                await asyncio.wait_for(
+                    exited, timeout=settings.worker_shutdown_timeout_seconds
+                )
+            except asyncio.TimeoutError:
+                logger.warning(
+                    "Worker did not drain in time, killing",
+                    index=index,
+                    pid=process.pid,
+                )
+                process.kill()
+                await exited
+            logger.info(
+                "Worker stopped",
+                index=index,
+                pid=process.pid,
+                returncode=process.returncode,
+            )
+            return
+
+        stop_requested.cancel()
+        if stopping.is_set():
+            return
+
+        if time.monotonic() - started >= HEALTHY_RUN_SECONDS:
+            backoff = 1.0
+
+        logger.error(
+            "Worker exited, restarting",
+            index=index,
+            returncode=process.returncode,
+            backoff=backoff,
+        )
+        try:
+            await asyncio.wait_for(stopping.wait(), timeout=backoff)
+        except asyncio.TimeoutError:
+            pass
+        backoff = min(backoff * 2, settings.worker_restart_max_backoff_seconds)
+
+
+async def main():
+    """Supervisor entry point"""
+    count = settings.worker_processes or os.cpu_count() or 1
+    logger.info(
+        "Starting ingest worker supervisor",
+        processes=count,
+        shard_streams=settings.shard_streams,
+    )
+
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, stopping.set)
+
+    await asyncio.gather(
+        *(supervise_worker(index, count, stopping) for index in range(count))
+    )
+    logger.info("Supervisor shutdown complete")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
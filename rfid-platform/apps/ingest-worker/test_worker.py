@@ -8,15 +8,32 @@ import asyncio
 import json
 import sys
 import os
-from datetime import datetime, timezone
+import uuid
+from datetime import date, datetime, timedelta, timezone
 from typing import Dict, Any
 
 # Add the current directory to Python path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from models import CloudEvent, RFIDRead
-from utils import generate_idempotency_key, validate_epc_format
+from idempotency import idempotency_key, read_window
+from utils import validate_epc_format, validate_rssi
 from config import Settings
+from deadletter import (
+    PermanentFailure,
+    dead_letter_entry,
+    dead_letter_stream,
+    is_permanent_sqlstate,
+    should_dead_letter
+)
+from dedup import DedupWindow
+from flush import FlushController
+from stream_registry import stream_shard
+from metrics import WorkerStateCollector
+from partitions import plan_partitions
+from retention import RetentionPolicy, acknowledged_floor, parse_retention_overrides
+from scans import decode_scan, decode_scan_batch, encode_scan, encode_scan_batch
+from summaries import SummaryAggregator
 
 def test_epc_validation():
     """Test EPC format validation"""
@@ -60,11 +77,11 @@ def test_idempotency_key_generation():
     epc = "E2000012345678901234"
     reader_id = "reader-001"
     antenna = 1
-    read_at = datetime.now(timezone.utc)
+    read_at = datetime(2024, 1, 15, 10, 30, 0, 250000, tzinfo=timezone.utc)
     
     # Generate key
-    key1 = generate_idempotency_key(org_id, epc, reader_id, antenna, read_at)
-    key2 = generate_idempotency_key(org_id, epc, reader_id, antenna, read_at)
+    key1 = idempotency_key(org_id, epc, reader_id, antenna, read_at)
+    key2 = idempotency_key(org_id, epc, reader_id, antenna, read_at)
     
     print(f"  Key 1: {key1}")
     print(f"  Key 2: {key2}")
@@ -72,13 +89,30 @@ def test_idempotency_key_generation():
     # Keys should be identical for same inputs
     assert key1 == key2, "Idempotency keys should be identical for same inputs"
     
+    # Retransmissions within the same second share the key and the stored read_at
+    read_at_retry = read_at.replace(microsecond=900000)
+    assert idempotency_key(org_id, epc, reader_id, antenna, read_at_retry) == key1
+    assert read_window(read_at_retry) == read_window(read_at) == read_at.replace(microsecond=0)
+    
     # Test with different timestamp
-    read_at2 = datetime.now(timezone.utc)
-    key3 = generate_idempotency_key(org_id, epc, reader_id, antenna, read_at2)
+    read_at2 = read_at + timedelta(seconds=1)
+    key3 = idempotency_key(org_id, epc, reader_id, antenna, read_at2)
     
     print(f"  Key 3 (different time): {key3}")
     assert key1 != key3, "Idempotency keys should be different for different timestamps"
     
+    # Fields are separated, so shifting characters between them changes the key
+    assert idempotency_key("org1", "23E2000012345678", reader_id, antenna, read_at) != \
+        idempotency_key("org12", "3E2000012345678", reader_id, antenna, read_at)
+    
+    # 128-bit keys stored as uuid
+    assert str(uuid.UUID(key1)) == key1
+    
+    # A wider window folds reads together and stores them at the window start
+    assert idempotency_key(org_id, epc, reader_id, antenna, read_at, 5) == \
+        idempotency_key(org_id, epc, reader_id, antenna, read_at + timedelta(seconds=4), 5)
+    assert read_window(read_at + timedelta(seconds=4), 5) == datetime(2024, 1, 15, 10, 30, 0, tzinfo=timezone.utc)
+    
     print("✅ Idempotency key generation tests passed!")
 
 def test_cloud_event_creation():
@@ -196,7 +230,7 @@ def test_data_processing_simulation():
     # Process each read
     for i, read in enumerate(reads):
         # Generate idempotency key
-        idem_key = generate_idempotency_key(
+        idem_key = idempotency_key(
             read.org_id, read.epc, read.reader_id, read.antenna, read.read_at
         )
         
@@ -206,7 +240,7 @@ def test_data_processing_simulation():
         print(f"  Read {i+1}: EPC={read.epc}, Valid={epc_valid}, Key={idem_key[:8]}...")
         
         assert epc_valid, f"EPC {read.epc} should be valid"
-        assert len(idem_key) == 40, "Idempotency key should be 40 characters (SHA1)"
+        assert len(idem_key) == 36, "Idempotency key should be a 128-bit UUID"
     
     # Calculate statistics
     unique_epcs = len(set(read.epc for read in reads))
@@ -221,6 +255,326 @@ def test_data_processing_simulation():
     
     print("✅ Data processing simulation tests passed!")
 
+def test_dedup_window():
+    """Test the local dedup window"""
+    print("🧪 Testing dedup window...")
+    
+    window = DedupWindow(ttl_seconds=5.0, max_entries=2)
+    read_at = datetime(2025, 1, 1, 12, 0, 0, 250000, tzinfo=timezone.utc)
+    
+    key = DedupWindow.key("test-org", "E2000012345678901234", "reader-001", 1, read_at)
+    same_second = DedupWindow.key("test-org", "E2000012345678901234", "reader-001", 1, read_at.replace(microsecond=900000))
+    other_antenna = DedupWindow.key("test-org", "E2000012345678901234", "reader-001", 2, read_at)
+    
+    print(f"  Key: {key}")
+    assert key == same_second, "Reads within the same second should share a dedup key"
+    assert key != other_antenna, "Reads on different antennas should not share a dedup key"
+    
+    # Unknown until written
+    assert not window.seen(key, now=100.0)
+    window.add(key, now=100.0)
+    assert window.seen(same_second, now=101.0), "Repeat read within the window should be a duplicate"
+    assert not window.seen(key, now=106.0), "Entries should expire after the TTL"
+    
+    # Oldest entries are evicted beyond max_entries
+    keys = [DedupWindow.key("test-org", f"E200001234567890{i:04d}", "reader-001", 1, read_at) for i in range(3)]
+    for k in keys:
+        window.add(k, now=200.0)
+    assert len(window) == 2
+    assert not window.seen(keys[0], now=200.0)
+    assert window.seen(keys[2], now=200.0)
+    
+    print(f"  Checked: {window.checked}, Duplicates: {window.duplicates}")
+    assert window.duplicates == 2
+    
+    print("✅ Dedup window tests passed!")
+
+def test_summary_aggregator():
+    """Test per-org summary windows"""
+    print("🧪 Testing summary aggregator...")
+    
+    aggregator = SummaryAggregator(window_seconds=1.0, max_per_second=0.5, max_epcs=1)
+    read_at = datetime(2025, 1, 1, 12, 0, 0, tzinfo=timezone.utc)
+    rows = [
+        {"epc": "E2000012345678901234", "reader_id": "reader-001", "rssi": -60.0, "read_at": read_at},
+        {"epc": "E2000012345678901234", "reader_id": "reader-002", "rssi": -45.0, "read_at": read_at.replace(second=1)},
+        {"epc": "E2000012345678905678", "reader_id": "reader-001", "rssi": -70.0, "read_at": read_at}
+    ]
+    
+    aggregator.add("test-org", rows, now=100.0)
+    assert aggregator.due(now=100.5) == [], "Summary should wait for the window to elapse"
+    
+    due = aggregator.due(now=101.0)
+    assert len(due) == 1
+    org_id, summary = due[0]
+    print(f"  Summary: {summary['reads']} reads, {summary['epc_count']} EPCs")
+    assert org_id == "test-org"
+    assert summary["reads"] == 3
+    assert summary["epc_count"] == 2
+    assert len(summary["epcs"]) == 1, "EPC list should be capped at max_epcs"
+    assert summary["epcs"][0]["reads"] == 2
+    assert summary["epcs"][0]["max_rssi"] == -45.0
+    assert summary["epcs"][0]["reader_id"] == "reader-002"
+    
+    # Rate cap holds back the next window
+    aggregator.add("test-org", rows[:1], now=101.5)
+    assert aggregator.due(now=102.5) == [], "Summary should respect max_per_second"
+    assert len(aggregator.due(now=103.0)) == 1
+    
+    # Emission times are forgotten once they no longer hold an org back
+    assert aggregator.due(now=104.9) == [] and "test-org" in aggregator._last_emitted
+    aggregator.due(now=105.0)
+    assert aggregator._last_emitted == {}, "Idle orgs should not be tracked forever"
+    
+    # Shutdown drains regardless of windows
+    aggregator.add("other-org", rows, now=200.0)
+    assert [org for org, _ in aggregator.drain()] == ["other-org"]
+    assert len(aggregator) == 0
+    
+    print("✅ Summary aggregator tests passed!")
+
+def test_scan_wire_format():
+    """Test the weft.Scan protobuf codec"""
+    print("🧪 Testing scan wire format...")
+    
+    scan = {
+        "tag_id": "E2000012345678901234",
+        "ts_ms": 1735732800123,
+        "source": "rfid",
+        "antenna": 2,
+        "rssi": -45.5,
+        "reader_id": "reader-001"
+    }
+    
+    message = encode_scan(scan)
+    event = CloudEvent(
+        type="rfid.read",
+        source="reader-001",
+        id="evt-001",
+        data={"epc": scan["tag_id"], "reader_id": "reader-001", "antenna": 2, "rssi": -45.5, "reader_ts": "2025-01-01T12:00:00.123Z"}
+    )
+    print(f"  Protobuf: {len(message)} bytes, CloudEvent JSON: {len(event.json())} bytes")
+    assert len(message) < len(event.json()) / 3
+    
+    decoded = decode_scan(message)
+    assert decoded == {**scan, "tenant_id": ""}, "Scan should round-trip"
+    
+    # Binary stream fields survive a decode_responses client via surrogateescape
+    as_str = message.decode("utf-8", "surrogateescape")
+    assert as_str.encode("utf-8", "surrogateescape") == message
+    
+    batch = decode_scan_batch(encode_scan_batch([scan, {"tag_id": "E2000012345678905678"}]))
+    assert len(batch) == 2
+    assert batch[1]["tag_id"] == "E2000012345678905678" and batch[1]["antenna"] == 0
+    
+    try:
+        decode_scan_batch(encode_scan_batch([scan])[:-3])
+        assert False, "Truncated batch should be rejected"
+    except ValueError:
+        pass
+    
+    # Non-finite floats decode fine but would poison the jsonb upsert
+    for rssi in (float("nan"), float("inf"), float("-inf")):
+        decoded = decode_scan(encode_scan({**scan, "rssi": rssi}))
+        assert not validate_rssi(decoded["rssi"]), f"rssi {rssi} should be rejected"
+    assert validate_rssi(-45.5)
+    
+    print("✅ Scan wire format tests passed!")
+
+def test_worker_state_metrics():
+    """Test scrape-time worker metrics"""
+    print("🧪 Testing worker state metrics...")
+    
+    class SchedulerState:
+        in_flight = 2
+        org_lag_ms = {"test-org": 1500.0}
+    
+    window = DedupWindow()
+    read_at = datetime(2025, 1, 1, 12, 0, 0, tzinfo=timezone.utc)
+    key = DedupWindow.key("test-org", "E2000012345678901234", "reader-001", 1, read_at)
+    window.add(key, now=100.0)
+    window.seen(key, now=101.0)
+    
+    collector = WorkerStateCollector(SchedulerState(), window, {"org:test-org:rfid": 7})
+    samples = {
+        (sample.name, tuple(sample.labels.values())): sample.value
+        for family in collector.collect()
+        for sample in family.samples
+    }
+    
+    print(f"  Samples: {len(samples)}")
+    assert samples[("rfid_platform_worker_stream_lag_seconds", ("test-org",))] == 1.5
+    assert samples[("rfid_platform_worker_batches_in_flight", ())] == 2
+    assert samples[("rfid_platform_worker_pending_entries", ("org:test-org:rfid",))] == 7
+    assert samples[("rfid_platform_worker_dedup_duplicates_total", ())] == 1
+    
+    print("✅ Worker state metrics tests passed!")
+
+def test_flush_controller():
+    """Test the adaptive micro-batching policy"""
+    print("🧪 Testing flush controller...")
+    
+    controller = FlushController(
+        min_batch_size=16,
+        max_batch_size=512,
+        initial_batch_size=128,
+        max_wait_ms=50,
+        target_latency_ms=100
+    )
+    
+    # Flush on batch full OR 50 ms timer
+    assert controller.should_flush(128, first_buffered_at=10.0, now=10.0)
+    assert not controller.should_flush(5, first_buffered_at=10.0, now=10.02)
+    assert controller.should_flush(5, first_buffered_at=10.0, now=10.05)
+    
+    # Backpressure holds buffers back until they reach the maximum
+    assert not controller.should_flush(128, first_buffered_at=10.0, backpressure=True, now=11.0)
+    assert controller.should_flush(512, first_buffered_at=10.0, backpressure=True, now=11.0)
+    
+    # Full batches with fast upserts grow the batch size
+    for _ in range(5):
+        controller.record(controller.batch_size, 0.01)
+    grown = controller.batch_size
+    print(f"  Grown batch size: {grown}")
+    assert 128 < grown <= 512
+    
+    # Partial batches do not grow it
+    controller.record(10, 0.01)
+    assert controller.batch_size == grown
+    
+    # Slow upserts shrink it, down to the minimum
+    for _ in range(50):
+        controller.record(controller.batch_size, 0.5)
+    print(f"  Shrunk batch size: {controller.batch_size}")
+    assert controller.batch_size == 16
+    
+    assert controller.can_read(0)
+    assert not controller.can_read(500)
+    
+    print("✅ Flush controller tests passed!")
+
+def test_stream_sharding():
+    """Test rendezvous hashing of org streams across worker processes"""
+    print("🧪 Testing stream sharding...")
+    
+    stream_keys = [f"org:org-{i:03d}:rfid" for i in range(400)]
+    
+    four = {key: stream_shard(key, 4) for key in stream_keys}
+    counts = [list(four.values()).count(shard) for shard in range(4)]
+    print(f"  Streams per shard: {counts}")
+    assert all(60 <= count <= 140 for count in counts), "Streams should spread across shards"
+    assert all(stream_shard(key, 1) == 0 for key in stream_keys)
+    
+    # Adding a shard only moves streams onto the new shard
+    five = {key: stream_shard(key, 5) for key in stream_keys}
+    moved = [key for key in stream_keys if four[key] != five[key]]
+    print(f"  Moved when adding a shard: {len(moved)}")
+    assert all(five[key] == 4 for key in moved)
+    assert len(moved) < len(stream_keys) / 2
+    
+    print("✅ Stream sharding tests passed!")
+
+def test_dead_letter_policy():
+    """Test permanent/transient failure classification and dead-letter entries"""
+    print("🧪 Testing dead-letter policy...")
+    
+    # Permanent failures are quarantined on first delivery
+    assert should_dead_letter(True, 1, 5)
+    # Transient failures stay pending until the delivery limit
+    assert not should_dead_letter(False, 1, 5)
+    assert not should_dead_letter(False, 4, 5)
+    assert should_dead_letter(False, 5, 5)
+    assert issubclass(PermanentFailure, ValueError)
+    
+    # Upsert errors that recur on every retry are permanent
+    assert is_permanent_sqlstate("22P02"), "Invalid text representation (bad UUID)"
+    assert is_permanent_sqlstate("22003"), "Numeric value out of range"
+    assert is_permanent_sqlstate("23503"), "Foreign key violation (unknown reader)"
+    assert not is_permanent_sqlstate("40001"), "Serialization failures are retryable"
+    assert not is_permanent_sqlstate("57014"), "Statement timeouts are retryable"
+    assert not is_permanent_sqlstate(None)
+    
+    assert dead_letter_stream("test-org") == "org:test-org:rfid:dlq"
+    
+    failed_at = datetime(2024, 1, 15, 10, 30, tzinfo=timezone.utc)
+    entry = dead_letter_entry(
+        "org:test-org:rfid", "1705314600000-0", {"event": "{}"},
+        "Invalid EPC format: XYZ", 1, True, failed_at=failed_at
+    )
+    print(f"  Dead-letter entry: {entry}")
+    assert entry["event"] == "{}", "Original fields should be kept for replay"
+    assert entry["dlq_source_stream"] == "org:test-org:rfid"
+    assert entry["dlq_message_id"] == "1705314600000-0"
+    assert entry["dlq_class"] == "permanent"
+    assert entry["dlq_deliveries"] == "1"
+    assert entry["dlq_failed_at"] == failed_at.isoformat()
+    assert dead_letter_entry("s", "1-0", {}, "timeout", 5, False)["dlq_class"] == "transient"
+    
+    print("✅ Dead-letter policy tests passed!")
+
+def test_stream_retention():
+    """Test that trimming never passes an entry a consumer group still needs"""
+    print("🧪 Testing stream retention...")
+    
+    assert parse_retention_overrides("") == {}
+    assert parse_retention_overrides("org-a=86400, org-b=0") == {"org-a": 86400.0, "org-b": 0.0}
+    try:
+        parse_retention_overrides("org-a")
+        assert False, "Malformed overrides should be rejected"
+    except ValueError:
+        pass
+    
+    # The oldest pending entry bounds a group; otherwise its last delivered entry does
+    assert acknowledged_floor([]) is None
+    assert acknowledged_floor([("1000-5", None)]) == "1000-5"
+    assert acknowledged_floor([("1000-5", "900-0"), ("2000-0", None)]) == "900-0"
+    assert acknowledged_floor([("999-10", None), ("1000-2", None)]) == "999-10"
+    
+    now = 10000.0  # seconds
+    policy = RetentionPolicy(default_seconds=60, overrides={"archive": 3600, "live": 0})
+    groups = [("9990000-0", None)]
+    
+    # Retention holds acknowledged entries back
+    assert policy.trim_minid("org", groups, now=now) == "9940000-0"
+    assert policy.retention_for("archive") == 3600
+    assert policy.trim_minid("archive", groups, now=now) == "6400000-0"
+    # Without retention the acknowledged floor is the limit
+    assert policy.trim_minid("live", groups, now=now) == "9990000-0"
+    assert policy.trim_minid("live", [("9990000-0", "9000000-3")], now=now) == "9000000-3"
+    # Unconsumed streams are left alone
+    assert policy.trim_minid("live", [], now=now) is None
+    assert policy.trim_minid("archive", groups, now=100.0) is None
+    
+    print("✅ Stream retention tests passed!")
+
+def test_partition_plan():
+    """Test partition expiry, BRIN conversion and per-org retention"""
+    print("🧪 Testing partition plan...")
+    
+    today = date(2024, 6, 1)
+    partitions = [
+        (f"reads_{(today - timedelta(days=age)):%Y_%m_%d}", today - timedelta(days=age), age in (10, 40))
+        for age in (0, 3, 8, 10, 40, 91, 200)
+    ]
+    names = {age: name for age, (name, _, _) in zip((0, 3, 8, 10, 40, 91, 200), partitions)}
+    
+    drop, brin, purge = plan_partitions(partitions, ["org-a", "org-b"], today, 90, 7)
+    print(f"  Drop: {drop}, BRIN: {brin}")
+    assert drop == [names[91], names[200]]
+    assert brin == [names[8]], "Only cold partitions without BRIN are converted"
+    assert purge == {}
+    
+    # A longer override keeps partitions; shorter retention deletes that org's reads
+    drop, brin, purge = plan_partitions(
+        partitions, ["org-a", "org-b", "org-c"], today, 90, 7, {"org-a": 365, "org-b": 30}
+    )
+    assert drop == []
+    assert purge[names[40]] == ["org-b"]
+    assert purge[names[91]] == ["org-b", "org-c"]
+    assert names[10] not in purge
+    
+    print("✅ Partition plan tests passed!")
+
 def main():
     """Run all tests"""
     print("🚀 Starting RFID Ingest Worker Tests")
@@ -245,6 +599,33 @@ def main():
         test_data_processing_simulation()
         print()
         
+        test_dedup_window()
+        print()
+        
+        test_summary_aggregator()
+        print()
+        
+        test_scan_wire_format()
+        print()
+        
+        test_worker_state_metrics()
+        print()
+        
+        test_flush_controller()
+        print()
+        
+        test_stream_sharding()
+        print()
+        
+        test_dead_letter_policy()
+        print()
+        
+        test_stream_retention()
+        print()
+        
+        test_partition_plan()
+        print()
+        
         print("🎉 All tests passed successfully!")
         print("✅ Ingest Worker is functioning correctly")
         
@@ -15,8 +15,11 @@ from typing import Dict, Any, List
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from models import CloudEvent, RFIDRead
-from utils import generate_idempotency_key, validate_epc_format
+from idempotency import idempotency_key
+from utils import validate_epc_format
 from config import Settings
+from scheduler import StreamScheduler
+from partitions import PartitionManager
 
 class MockRedis:
     """Mock Redis client for testing"""
@@ -60,6 +63,24 @@ class MockRedis:
         """Get keys matching pattern"""
         return [key for key in self.streams.keys() if key.startswith("org:")]
 
+class MockConnection:
+    """Mock asyncpg connection recording the statements it runs"""
+    
+    def __init__(self):
+        self.statements = []
+    
+    async def fetchval(self, query: str, *args):
+        self.statements.append(query)
+        return True if "pg_try_advisory_lock" in query else 0
+    
+    async def fetch(self, query: str, *args) -> List:
+        self.statements.append(query)
+        return []
+    
+    async def execute(self, query: str, *args, **kwargs) -> str:
+        self.statements.append(query)
+        return "SELECT 1"
+
 class MockSupabase:
     """Mock Supabase client for testing"""
     
@@ -173,7 +194,7 @@ async def test_worker_processing():
                     
                     # Generate idempotency key
                     read_at = datetime.fromisoformat(rfid_data["read_at"].replace('Z', '+00:00'))
-                    idem_key = generate_idempotency_key(
+                    idem_key = idempotency_key(
                         rfid_data["org_id"],
                         epc,
                         rfid_data["reader_id"],
@@ -243,7 +264,7 @@ async def test_deduplication():
     keys = []
     for read_data in duplicate_reads:
         read_at = datetime.fromisoformat(read_data["read_at"].replace('Z', '+00:00'))
-        key = generate_idempotency_key(
+        key = idempotency_key(
             read_data["org_id"],
             read_data["epc"],
             read_data["reader_id"],
@@ -326,7 +347,7 @@ async def test_performance_simulation():
     
     for read in test_reads:
         # Generate idempotency key
-        idem_key = generate_idempotency_key(
+        idem_key = idempotency_key(
             read.org_id, read.epc, read.reader_id, read.antenna, read.read_at
         )
         
@@ -349,6 +370,52 @@ async def test_performance_simulation():
     
     print("✅ Performance simulation tests passed!")
 
+async def test_concurrent_stream_scheduling():
+    """Test that a slow stream does not hold up the others"""
+    print("🧪 Testing concurrent stream scheduling...")
+    
+    completed = []
+    
+    async def handle_batch(stream_key: str, messages: List) -> int:
+        await asyncio.sleep(0.2 if stream_key == "org:slow:rfid" else 0.01)
+        completed.append(stream_key)
+        return len(messages)
+    
+    scheduler = StreamScheduler(handle_batch, max_concurrency=4, per_org_concurrency=1)
+    now_id = f"{int(datetime.now().timestamp() * 1000)}-0"
+    
+    scheduler.submit("org:slow:rfid", [(now_id, {})])
+    scheduler.submit("org:fast:rfid", [(now_id, {})])
+    
+    # Both streams are in flight and must not be read again yet
+    assert scheduler.busy_streams() == {"org:slow:rfid", "org:fast:rfid"}
+    
+    await scheduler.wait_any(timeout=1)
+    print(f"  First completed: {completed[0]}")
+    assert completed == ["org:fast:rfid"], "Fast stream should finish while the slow one is running"
+    assert scheduler.busy_streams() == {"org:slow:rfid"}
+    
+    await scheduler.drain()
+    assert completed == ["org:fast:rfid", "org:slow:rfid"]
+    assert set(scheduler.org_lag_ms) == {"slow", "fast"}
+    print(f"  Per-org lag: {scheduler.org_lag_ms}")
+    
+    print("✅ Concurrent stream scheduling tests passed!")
+
+async def test_maintenance_prunes_rollups():
+    """Test that each maintenance pass prunes the asset and read rollups"""
+    print("🧪 Testing rollup pruning in partition maintenance...")
+    
+    conn = MockConnection()
+    plan = await PartitionManager().run(conn)
+    
+    assert plan == ([], [], {})
+    for statement in ("SELECT prune_asset_reads_hourly()", "SELECT prune_read_rollups()"):
+        assert statement in conn.statements, f"Maintenance should run {statement}"
+    assert conn.statements[-1] == "SELECT pg_advisory_unlock($1)", "Lock should be released"
+    
+    print("✅ Rollup pruning tests passed!")
+
 async def main():
     """Run all integration tests"""
     print("🚀 Starting RFID Ingest Worker Integration Tests")
@@ -367,6 +434,12 @@ async def main():
         await test_performance_simulation()
         print()
         
+        await test_concurrent_stream_scheduling()
+        print()
+        
+        await test_maintenance_prunes_rollups()
+        print()
+        
         print("🎉 All integration tests passed successfully!")
         print("✅ Ingest Worker is ready for production!")
         
@@ -2,19 +2,10 @@
 RFID Platform - Ingest Worker Utilities
 """
 
-import hashlib
-from datetime import datetime
+import math
 from typing import Any, Dict
 
 
-def generate_idempotency_key(org_id: str, epc: str, reader_id: str, antenna: int, read_at: datetime) -> str:
-    """Generate idempotency key for RFID reads"""
-    # Use microsecond precision for better uniqueness
-    timestamp_str = read_at.isoformat()
-    hash_input = f"{org_id}:{epc}:{reader_id}:{antenna}:{timestamp_str}"
-    return hashlib.sha1(hash_input.encode('utf-8')).hexdigest()
-
-
 def validate_epc_format(epc: str) -> bool:
     """Validate EPC format"""
     if not epc or len(epc) < 8:
@@ -25,3 +16,8 @@ def validate_epc_format(epc: str) -> bool:
         return True
     except ValueError:
         return False
+
+
+def validate_rssi(rssi: float) -> bool:
+    """Validate RSSI value; NaN and infinity cannot be stored as jsonb"""
+    return math.isfinite(rssi)
@@ -87,7 +87,7 @@ CREATE TABLE assets (
 
 -- Parent table for RFID reads (partitioned by date)
 CREATE TABLE reads_parent (
-    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    id UUID NOT NULL DEFAULT uuid_generate_v4(),
     org_id TEXT NOT NULL REFERENCES orgs(id) ON DELETE CASCADE,
     epc TEXT NOT NULL,
     reader_id UUID NOT NULL REFERENCES readers(id) ON DELETE CASCADE,
@@ -96,7 +96,10 @@ CREATE TABLE reads_parent (
     read_at TIMESTAMPTZ NOT NULL,
     idem_key TEXT NOT NULL, -- Idempotency key for deduplication
     created_at TIMESTAMPTZ DEFAULT NOW(),
-    UNIQUE(idem_key)
+    -- Unique keys on a partitioned table must include the partition key; each
+    -- partition enforces its own, so an insert only probes one partition's index
+    PRIMARY KEY (id, read_at),
+    UNIQUE(idem_key, read_at)
 ) PARTITION BY RANGE (read_at);
 
 -- Events table for real-time notifications
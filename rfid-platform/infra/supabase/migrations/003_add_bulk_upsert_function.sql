@@ -0,0 +1,75 @@
+-- Bulk variant of upsert_rfid_read used by the ingest worker's batch write path
+-- p_reads is a JSON array of objects with the same fields as upsert_rfid_read
+-- Returns one {idem_key, ok, error} result per distinct idem_key
+CREATE OR REPLACE FUNCTION upsert_rfid_reads(p_reads JSONB)
+RETURNS JSONB AS $$
+DECLARE
+    result JSONB;
+    read_row JSONB;
+BEGIN
+    -- Fast path: a single set-based upsert for the whole batch
+    BEGIN
+        WITH incoming AS (
+            -- ON CONFLICT cannot touch the same row twice in one statement
+            SELECT DISTINCT ON (r.idem_key) r.*
+            FROM jsonb_to_recordset(p_reads) AS r(
+                org_id TEXT,
+                epc TEXT,
+                reader_id UUID,
+                antenna INTEGER,
+                rssi DECIMAL(5,2),
+                read_at TIMESTAMPTZ,
+                idem_key TEXT
+            )
+            ORDER BY r.idem_key, r.read_at DESC
+        ), upserted AS (
+            INSERT INTO reads_parent (
+                org_id, epc, reader_id, antenna, rssi, read_at, idem_key
+            )
+            SELECT org_id, epc, reader_id, antenna, rssi, read_at, idem_key
+            FROM incoming
+            ON CONFLICT (idem_key) DO UPDATE SET
+                rssi = EXCLUDED.rssi,
+                read_at = EXCLUDED.read_at
+            RETURNING reads_parent.idem_key
+        )
+        SELECT COALESCE(
+            jsonb_agg(jsonb_build_object('idem_key', upserted.idem_key, 'ok', true)),
+            '[]'::jsonb
+        )
+        INTO result
+        FROM upserted;
+
+        RETURN result;
+    EXCEPTION WHEN OTHERS THEN
+        -- A bad row (e.g. unknown reader_id) aborts the whole statement;
+        -- fall back to row-by-row so the rest of the batch still lands
+        result := '[]'::jsonb;
+    END;
+
+    FOR read_row IN SELECT * FROM jsonb_array_elements(p_reads) LOOP
+        BEGIN
+            PERFORM upsert_rfid_read(
+                read_row->>'org_id',
+                read_row->>'epc',
+                (read_row->>'reader_id')::UUID,
+                (read_row->>'antenna')::INTEGER,
+                (read_row->>'rssi')::DECIMAL(5,2),
+                (read_row->>'read_at')::TIMESTAMPTZ,
+                read_row->>'idem_key'
+            );
+            result := result || jsonb_build_array(
+                jsonb_build_object('idem_key', read_row->>'idem_key', 'ok', true)
+            );
+        EXCEPTION WHEN OTHERS THEN
+            result := result || jsonb_build_array(
+                jsonb_build_object('idem_key', read_row->>'idem_key', 'ok', false, 'error', SQLERRM)
+            );
+        END;
+    END LOOP;
+
+    RETURN result;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+GRANT EXECUTE ON FUNCTION upsert_rfid_reads(JSONB) TO service_role;
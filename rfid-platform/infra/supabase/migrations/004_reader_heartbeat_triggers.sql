@@ -0,0 +1,20 @@
+-- Heartbeat-only updates (last_seen_at) no longer bump updated_at or write an
+-- audit row into events; every other change to readers is still audited
+
+DROP TRIGGER IF EXISTS update_readers_updated_at ON readers;
+CREATE TRIGGER update_readers_updated_at BEFORE UPDATE ON readers
+    FOR EACH ROW
+    WHEN ((to_jsonb(OLD) - 'last_seen_at' - 'updated_at') IS DISTINCT FROM (to_jsonb(NEW) - 'last_seen_at' - 'updated_at'))
+    EXECUTE FUNCTION update_updated_at_column();
+
+DROP TRIGGER IF EXISTS audit_readers_trigger ON readers;
+CREATE TRIGGER audit_readers_trigger
+    AFTER INSERT OR DELETE ON readers
+    FOR EACH ROW EXECUTE FUNCTION audit_trigger_function();
+
+DROP TRIGGER IF EXISTS audit_readers_update_trigger ON readers;
+CREATE TRIGGER audit_readers_update_trigger
+    AFTER UPDATE ON readers
+    FOR EACH ROW
+    WHEN ((to_jsonb(OLD) - 'last_seen_at' - 'updated_at') IS DISTINCT FROM (to_jsonb(NEW) - 'last_seen_at' - 'updated_at'))
+    EXECUTE FUNCTION audit_trigger_function();
@@ -0,0 +1,275 @@
+-- Incrementally maintained asset rollups behind asset_summary
+-- The old view aggregated 24 hours of reads_parent on every query; the rollups are
+-- updated by the ingest worker's upsert functions, for newly inserted reads only,
+-- so asset_summary reads at most 25 hourly rows per asset and reader
+
+-- Per-asset last sighting (all time)
+CREATE TABLE asset_last_seen (
+    org_id TEXT NOT NULL REFERENCES orgs(id) ON DELETE CASCADE,
+    epc TEXT NOT NULL,
+    last_seen_at TIMESTAMPTZ NOT NULL,
+    last_reader_id UUID NOT NULL,
+    last_antenna INTEGER NOT NULL,
+    PRIMARY KEY (org_id, epc)
+);
+
+-- Reads per asset, reader and hour; summed for counters, distinct reader_id for readers_seen
+CREATE TABLE asset_reads_hourly (
+    org_id TEXT NOT NULL REFERENCES orgs(id) ON DELETE CASCADE,
+    epc TEXT NOT NULL,
+    bucket TIMESTAMPTZ NOT NULL, -- date_trunc('hour', read_at)
+    reader_id UUID NOT NULL,
+    reads BIGINT NOT NULL,
+    PRIMARY KEY (org_id, epc, bucket, reader_id)
+);
+
+CREATE INDEX idx_asset_reads_hourly_bucket ON asset_reads_hourly(bucket);
+
+ALTER TABLE asset_last_seen ENABLE ROW LEVEL SECURITY;
+ALTER TABLE asset_reads_hourly ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Users can view org asset last seen" ON asset_last_seen
+    FOR SELECT USING (org_id = get_user_org_id());
+
+CREATE POLICY "Users can view org asset hourly reads" ON asset_reads_hourly
+    FOR SELECT USING (org_id = get_user_org_id());
+
+GRANT SELECT ON asset_last_seen, asset_reads_hourly TO authenticated;
+GRANT ALL ON asset_last_seen, asset_reads_hourly TO service_role;
+
+-- Fold newly inserted reads into the rollups
+-- p_reads is a JSON array of {org_id, epc, reader_id, antenna, read_at}; pass only
+-- rows that were inserted, never ones updated by ON CONFLICT, or redelivered reads
+-- would be counted twice. Rows are locked in key order so concurrent workers
+-- touching the same assets cannot deadlock.
+CREATE OR REPLACE FUNCTION rollup_asset_reads(p_reads JSONB)
+RETURNS void AS $$
+BEGIN
+    WITH incoming AS (
+        SELECT r.*
+        FROM jsonb_to_recordset(p_reads) AS r(
+            org_id TEXT,
+            epc TEXT,
+            reader_id UUID,
+            antenna INTEGER,
+            read_at TIMESTAMPTZ
+        )
+    )
+    INSERT INTO asset_reads_hourly (org_id, epc, bucket, reader_id, reads)
+    SELECT org_id, epc, date_trunc('hour', read_at), reader_id, COUNT(*)
+    FROM incoming
+    GROUP BY org_id, epc, date_trunc('hour', read_at), reader_id
+    ORDER BY org_id, epc, date_trunc('hour', read_at), reader_id
+    ON CONFLICT (org_id, epc, bucket, reader_id) DO UPDATE SET
+        reads = asset_reads_hourly.reads + EXCLUDED.reads;
+
+    WITH incoming AS (
+        SELECT DISTINCT ON (r.org_id, r.epc) r.*
+        FROM jsonb_to_recordset(p_reads) AS r(
+            org_id TEXT,
+            epc TEXT,
+            reader_id UUID,
+            antenna INTEGER,
+            read_at TIMESTAMPTZ
+        )
+        ORDER BY r.org_id, r.epc, r.read_at DESC
+    )
+    INSERT INTO asset_last_seen (org_id, epc, last_seen_at, last_reader_id, last_antenna)
+    SELECT org_id, epc, read_at, reader_id, antenna
+    FROM incoming
+    ON CONFLICT (org_id, epc) DO UPDATE SET
+        last_seen_at = EXCLUDED.last_seen_at,
+        last_reader_id = EXCLUDED.last_reader_id,
+        last_antenna = EXCLUDED.last_antenna
+    -- Late or replayed reads never move last_seen_at backwards
+    WHERE EXCLUDED.last_seen_at > asset_last_seen.last_seen_at;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Drop hourly buckets older than asset_summary needs; run by every partition
+-- maintenance pass (ingest worker PartitionManager and python -m ingest_worker.maintenance)
+CREATE OR REPLACE FUNCTION prune_asset_reads_hourly(p_keep INTERVAL DEFAULT INTERVAL '2 days')
+RETURNS BIGINT AS $$
+DECLARE
+    deleted BIGINT;
+BEGIN
+    DELETE FROM asset_reads_hourly WHERE bucket < date_trunc('hour', NOW() - p_keep);
+    GET DIAGNOSTICS deleted = ROW_COUNT;
+    RETURN deleted;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Single-read upsert, now also maintaining the rollups when the read is new
+CREATE OR REPLACE FUNCTION upsert_rfid_read(
+    p_org_id TEXT,
+    p_epc TEXT,
+    p_reader_id UUID,
+    p_antenna INTEGER,
+    p_rssi DECIMAL(5,2),
+    p_read_at TIMESTAMPTZ,
+    p_idem_key TEXT
+) RETURNS JSONB AS $$
+DECLARE
+    result JSONB;
+    inserted BOOLEAN;
+BEGIN
+    -- Insert or update the read record; xmax = 0 only for a freshly inserted row
+    INSERT INTO reads_parent (
+        org_id, epc, reader_id, antenna, rssi, read_at, idem_key
+    ) VALUES (
+        p_org_id, p_epc, p_reader_id, p_antenna, p_rssi, p_read_at, p_idem_key
+    )
+    ON CONFLICT (idem_key) DO UPDATE SET
+        rssi = EXCLUDED.rssi,
+        read_at = EXCLUDED.read_at
+    RETURNING to_jsonb(reads_parent.*), (reads_parent.xmax = 0) INTO result, inserted;
+
+    IF inserted THEN
+        PERFORM rollup_asset_reads(jsonb_build_array(jsonb_build_object(
+            'org_id', p_org_id,
+            'epc', p_epc,
+            'reader_id', p_reader_id,
+            'antenna', p_antenna,
+            'read_at', p_read_at
+        )));
+    END IF;
+
+    RETURN result;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Bulk upsert, now also maintaining the rollups for the inserted rows of the batch
+CREATE OR REPLACE FUNCTION upsert_rfid_reads(p_reads JSONB)
+RETURNS JSONB AS $$
+DECLARE
+    result JSONB;
+    inserted_reads JSONB;
+    read_row JSONB;
+BEGIN
+    -- Fast path: a single set-based upsert for the whole batch
+    BEGIN
+        WITH incoming AS (
+            -- ON CONFLICT cannot touch the same row twice in one statement
+            SELECT DISTINCT ON (r.idem_key) r.*
+            FROM jsonb_to_recordset(p_reads) AS r(
+                org_id TEXT,
+                epc TEXT,
+                reader_id UUID,
+                antenna INTEGER,
+                rssi DECIMAL(5,2),
+                read_at TIMESTAMPTZ,
+                idem_key TEXT
+            )
+            ORDER BY r.idem_key, r.read_at DESC
+        ), upserted AS (
+            INSERT INTO reads_parent (
+                org_id, epc, reader_id, antenna, rssi, read_at, idem_key
+            )
+            SELECT org_id, epc, reader_id, antenna, rssi, read_at, idem_key
+            FROM incoming
+            ON CONFLICT (idem_key) DO UPDATE SET
+                rssi = EXCLUDED.rssi,
+                read_at = EXCLUDED.read_at
+            RETURNING reads_parent.org_id, reads_parent.epc, reads_parent.reader_id,
+                reads_parent.antenna, reads_parent.read_at, reads_parent.idem_key,
+                (reads_parent.xmax = 0) AS inserted
+        )
+        SELECT
+            COALESCE(
+                jsonb_agg(jsonb_build_object('idem_key', upserted.idem_key, 'ok', true)),
+                '[]'::jsonb
+            ),
+            COALESCE(
+                jsonb_agg(jsonb_build_object(
+                    'org_id', upserted.org_id,
+                    'epc', upserted.epc,
+                    'reader_id', upserted.reader_id,
+                    'antenna', upserted.antenna,
+                    'read_at', upserted.read_at
+                )) FILTER (WHERE upserted.inserted),
+                '[]'::jsonb
+            )
+        INTO result, inserted_reads
+        FROM upserted;
+
+        -- Inside the same subtransaction: a failure here falls back like a bad row
+        PERFORM rollup_asset_reads(inserted_reads);
+
+        RETURN result;
+    EXCEPTION WHEN OTHERS THEN
+        -- A bad row (e.g. unknown reader_id) aborts the whole statement;
+        -- fall back to row-by-row so the rest of the batch still lands
+        result := '[]'::jsonb;
+    END;
+
+    FOR read_row IN SELECT * FROM jsonb_array_elements(p_reads) LOOP
+        BEGIN
+            PERFORM upsert_rfid_read(
+                read_row->>'org_id',
+                read_row->>'epc',
+                (read_row->>'reader_id')::UUID,
+                (read_row->>'antenna')::INTEGER,
+                (read_row->>'rssi')::DECIMAL(5,2),
+                (read_row->>'read_at')::TIMESTAMPTZ,
+                read_row->>'idem_key'
+            );
+            result := result || jsonb_build_array(
+                jsonb_build_object('idem_key', read_row->>'idem_key', 'ok', true)
+            );
+        EXCEPTION WHEN OTHERS THEN
+            result := result || jsonb_build_array(
+                jsonb_build_object('idem_key', read_row->>'idem_key', 'ok', false, 'error', SQLERRM)
+            );
+        END;
+    END LOOP;
+
+    RETURN result;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+GRANT EXECUTE ON FUNCTION upsert_rfid_reads(JSONB) TO service_role;
+GRANT EXECUTE ON FUNCTION rollup_asset_reads(JSONB) TO service_role;
+GRANT EXECUTE ON FUNCTION prune_asset_reads_hourly(INTERVAL) TO service_role;
+
+-- Seed the rollups from reads already stored, so the new view starts complete
+INSERT INTO asset_reads_hourly (org_id, epc, bucket, reader_id, reads)
+SELECT org_id, epc, date_trunc('hour', read_at), reader_id, COUNT(*)
+FROM reads_parent
+WHERE read_at >= date_trunc('hour', NOW() - INTERVAL '2 days')
+GROUP BY org_id, epc, date_trunc('hour', read_at), reader_id;
+
+INSERT INTO asset_last_seen (org_id, epc, last_seen_at, last_reader_id, last_antenna)
+SELECT DISTINCT ON (org_id, epc) org_id, epc, read_at, reader_id, antenna
+FROM reads_parent
+ORDER BY org_id, epc, read_at DESC;
+
+-- Same columns as before, served from the rollups in constant time per asset.
+-- Counters cover the last 24 hours at hour granularity (up to 25 buckets);
+-- last_seen_at is now all time, and assets with no recent reads are listed with zero counts.
+-- security_invoker applies the rollup tables' RLS to the caller.
+DROP VIEW IF EXISTS asset_summary;
+CREATE VIEW asset_summary WITH (security_invoker = true) AS
+SELECT
+    a.org_id,
+    a.id as asset_id,
+    a.epc,
+    a.sku,
+    a.name,
+    a.kind,
+    a.status,
+    COALESCE(h.total_reads, 0) as total_reads,
+    s.last_seen_at,
+    COALESCE(h.readers_seen, 0) as readers_seen
+FROM assets a
+LEFT JOIN asset_last_seen s ON s.org_id = a.org_id AND s.epc = a.epc
+LEFT JOIN LATERAL (
+    SELECT
+        SUM(ar.reads) as total_reads,
+        COUNT(DISTINCT ar.reader_id) as readers_seen
+    FROM asset_reads_hourly ar
+    WHERE ar.org_id = a.org_id
+      AND ar.epc = a.epc
+      AND ar.bucket >= date_trunc('hour', NOW() - INTERVAL '24 hours')
+) h ON true;
+
+GRANT SELECT ON asset_summary TO authenticated;
@@ -0,0 +1,293 @@
+-- Minute and hour read rollups per org, reader, antenna and location
+-- Maintained by the ingest worker's upsert functions alongside the asset rollups,
+-- for newly inserted reads only; analytics read these instead of reads_YYYY_MM_DD.
+-- Migration 012 adds location_id to the key, so a reader that moves mid-bucket
+-- gets one row per location.
+
+CREATE TABLE read_rollups_1m (
+    org_id TEXT NOT NULL REFERENCES orgs(id) ON DELETE CASCADE,
+    reader_id UUID NOT NULL,
+    antenna INTEGER NOT NULL,
+    bucket TIMESTAMPTZ NOT NULL, -- date_trunc('minute', read_at)
+    location_id UUID,
+    reads BIGINT NOT NULL,
+    rssi_sum DECIMAL(14,2) NOT NULL, -- avg_rssi = rssi_sum / reads, exact across buckets
+    rssi_min DECIMAL(5,2) NOT NULL,
+    rssi_max DECIMAL(5,2) NOT NULL,
+    PRIMARY KEY (org_id, reader_id, antenna, bucket)
+);
+
+-- Same shape; bucket is date_trunc('hour', read_at)
+CREATE TABLE read_rollups_1h (
+    LIKE read_rollups_1m INCLUDING ALL
+);
+
+CREATE INDEX idx_read_rollups_1m_org_bucket ON read_rollups_1m(org_id, bucket);
+CREATE INDEX idx_read_rollups_1m_org_location_bucket ON read_rollups_1m(org_id, location_id, bucket);
+CREATE INDEX idx_read_rollups_1h_org_bucket ON read_rollups_1h(org_id, bucket);
+CREATE INDEX idx_read_rollups_1h_org_location_bucket ON read_rollups_1h(org_id, location_id, bucket);
+
+-- LIKE does not copy foreign keys
+ALTER TABLE read_rollups_1h ADD FOREIGN KEY (org_id) REFERENCES orgs(id) ON DELETE CASCADE;
+
+ALTER TABLE read_rollups_1m ENABLE ROW LEVEL SECURITY;
+ALTER TABLE read_rollups_1h ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Users can view org minute rollups" ON read_rollups_1m
+    FOR SELECT USING (org_id = get_user_org_id());
+
+CREATE POLICY "Users can view org hour rollups" ON read_rollups_1h
+    FOR SELECT USING (org_id = get_user_org_id());
+
+GRANT SELECT ON read_rollups_1m, read_rollups_1h TO authenticated;
+GRANT ALL ON read_rollups_1m, read_rollups_1h TO service_role;
+
+-- Fold newly inserted reads into both granularities
+-- p_reads is a JSON array of {org_id, epc, reader_id, antenna, rssi, read_at}
+CREATE OR REPLACE FUNCTION rollup_read_buckets(p_reads JSONB)
+RETURNS void AS $$
+BEGIN
+    WITH incoming AS (
+        SELECT r.*, rd.location_id
+        FROM jsonb_to_recordset(p_reads) AS r(
+            org_id TEXT,
+            reader_id UUID,
+            antenna INTEGER,
+            rssi DECIMAL(5,2),
+            read_at TIMESTAMPTZ
+        )
+        LEFT JOIN readers rd ON rd.id = r.reader_id
+    )
+    INSERT INTO read_rollups_1m (
+        org_id, reader_id, antenna, bucket, location_id, reads, rssi_sum, rssi_min, rssi_max
+    )
+    SELECT org_id, reader_id, antenna, date_trunc('minute', read_at), MAX(location_id::text)::uuid,
+        COUNT(*), SUM(rssi), MIN(rssi), MAX(rssi)
+    FROM incoming
+    GROUP BY org_id, reader_id, antenna, date_trunc('minute', read_at)
+    -- Lock in key order so concurrent workers cannot deadlock
+    ORDER BY org_id, reader_id, antenna, date_trunc('minute', read_at)
+    ON CONFLICT (org_id, reader_id, antenna, bucket) DO UPDATE SET
+        location_id = EXCLUDED.location_id,
+        reads = read_rollups_1m.reads + EXCLUDED.reads,
+        rssi_sum = read_rollups_1m.rssi_sum + EXCLUDED.rssi_sum,
+        rssi_min = LEAST(read_rollups_1m.rssi_min, EXCLUDED.rssi_min),
+        rssi_max = GREATEST(read_rollups_1m.rssi_max, EXCLUDED.rssi_max);
+
+    WITH incoming AS (
+        SELECT r.*, rd.location_id
+        FROM jsonb_to_recordset(p_reads) AS r(
+            org_id TEXT,
+            reader_id UUID,
+            antenna INTEGER,
+            rssi DECIMAL(5,2),
+            read_at TIMESTAMPTZ
+        )
+        LEFT JOIN readers rd ON rd.id = r.reader_id
+    )
+    INSERT INTO read_rollups_1h (
+        org_id, reader_id, antenna, bucket, location_id, reads, rssi_sum, rssi_min, rssi_max
+    )
+    SELECT org_id, reader_id, antenna, date_trunc('hour', read_at), MAX(location_id::text)::uuid,
+        COUNT(*), SUM(rssi), MIN(rssi), MAX(rssi)
+    FROM incoming
+    GROUP BY org_id, reader_id, antenna, date_trunc('hour', read_at)
+    ORDER BY org_id, reader_id, antenna, date_trunc('hour', read_at)
+    ON CONFLICT (org_id, reader_id, antenna, bucket) DO UPDATE SET
+        location_id = EXCLUDED.location_id,
+        reads = read_rollups_1h.reads + EXCLUDED.reads,
+        rssi_sum = read_rollups_1h.rssi_sum + EXCLUDED.rssi_sum,
+        rssi_min = LEAST(read_rollups_1h.rssi_min, EXCLUDED.rssi_min),
+        rssi_max = GREATEST(read_rollups_1h.rssi_max, EXCLUDED.rssi_max);
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Every rollup fed by newly inserted reads; the upsert functions call only this
+CREATE OR REPLACE FUNCTION rollup_inserted_reads(p_reads JSONB)
+RETURNS void AS $$
+BEGIN
+    IF jsonb_array_length(p_reads) = 0 THEN
+        RETURN;
+    END IF;
+
+    PERFORM rollup_asset_reads(p_reads);
+    PERFORM rollup_read_buckets(p_reads);
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Minute buckets serve recent, fine-grained queries; hour buckets everything else
+CREATE OR REPLACE FUNCTION prune_read_rollups(
+    p_keep_minutes INTERVAL DEFAULT INTERVAL '7 days',
+    p_keep_hours INTERVAL DEFAULT INTERVAL '400 days'
+)
+RETURNS BIGINT AS $$
+DECLARE
+    deleted BIGINT;
+    total BIGINT := 0;
+BEGIN
+    DELETE FROM read_rollups_1m WHERE bucket < date_trunc('minute', NOW() - p_keep_minutes);
+    GET DIAGNOSTICS deleted = ROW_COUNT;
+    total := total + deleted;
+
+    DELETE FROM read_rollups_1h WHERE bucket < date_trunc('hour', NOW() - p_keep_hours);
+    GET DIAGNOSTICS deleted = ROW_COUNT;
+    total := total + deleted;
+
+    RETURN total;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Single-read upsert feeding every rollup when the read is new
+CREATE OR REPLACE FUNCTION upsert_rfid_read(
+    p_org_id TEXT,
+    p_epc TEXT,
+    p_reader_id UUID,
+    p_antenna INTEGER,
+    p_rssi DECIMAL(5,2),
+    p_read_at TIMESTAMPTZ,
+    p_idem_key TEXT
+) RETURNS JSONB AS $$
+DECLARE
+    result JSONB;
+    inserted BOOLEAN;
+BEGIN
+    -- Insert or update the read record; xmax = 0 only for a freshly inserted row
+    INSERT INTO reads_parent (
+        org_id, epc, reader_id, antenna, rssi, read_at, idem_key
+    ) VALUES (
+        p_org_id, p_epc, p_reader_id, p_antenna, p_rssi, p_read_at, p_idem_key
+    )
+    ON CONFLICT (idem_key) DO UPDATE SET
+        rssi = EXCLUDED.rssi,
+        read_at = EXCLUDED.read_at
+    RETURNING to_jsonb(reads_parent.*), (reads_parent.xmax = 0) INTO result, inserted;
+
+    IF inserted THEN
+        PERFORM rollup_inserted_reads(jsonb_build_array(jsonb_build_object(
+            'org_id', p_org_id,
+            'epc', p_epc,
+            'reader_id', p_reader_id,
+            'antenna', p_antenna,
+            'rssi', p_rssi,
+            'read_at', p_read_at
+        )));
+    END IF;
+
+    RETURN result;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Bulk upsert feeding every rollup from the inserted rows of the batch
+CREATE OR REPLACE FUNCTION upsert_rfid_reads(p_reads JSONB)
+RETURNS JSONB AS $$
+DECLARE
+    result JSONB;
+    inserted_reads JSONB;
+    read_row JSONB;
+BEGIN
+    -- Fast path: a single set-based upsert for the whole batch
+    BEGIN
+        WITH incoming AS (
+            -- ON CONFLICT cannot touch the same row twice in one statement
+            SELECT DISTINCT ON (r.idem_key) r.*
+            FROM jsonb_to_recordset(p_reads) AS r(
+                org_id TEXT,
+                epc TEXT,
+                reader_id UUID,
+                antenna INTEGER,
+                rssi DECIMAL(5,2),
+                read_at TIMESTAMPTZ,
+                idem_key TEXT
+            )
+            ORDER BY r.idem_key, r.read_at DESC
+        ), upserted AS (
+            INSERT INTO reads_parent (
+                org_id, epc, reader_id, antenna, rssi, read_at, idem_key
+            )
+            SELECT org_id, epc, reader_id, antenna, rssi, read_at, idem_key
+            FROM incoming
+            ON CONFLICT (idem_key) DO UPDATE SET
+                rssi = EXCLUDED.rssi,
+                read_at = EXCLUDED.read_at
+            RETURNING reads_parent.org_id, reads_parent.epc, reads_parent.reader_id,
+                reads_parent.antenna, reads_parent.rssi, reads_parent.read_at,
+                reads_parent.idem_key, (reads_parent.xmax = 0) AS inserted
+        )
+        SELECT
+            COALESCE(
+                jsonb_agg(jsonb_build_object('idem_key', upserted.idem_key, 'ok', true)),
+                '[]'::jsonb
+            ),
+            COALESCE(
+                jsonb_agg(jsonb_build_object(
+                    'org_id', upserted.org_id,
+                    'epc', upserted.epc,
+                    'reader_id', upserted.reader_id,
+                    'antenna', upserted.antenna,
+                    'rssi', upserted.rssi,
+                    'read_at', upserted.read_at
+                )) FILTER (WHERE upserted.inserted),
+                '[]'::jsonb
+            )
+        INTO result, inserted_reads
+        FROM upserted;
+
+        -- Inside the same subtransaction: a failure here falls back like a bad row
+        PERFORM rollup_inserted_reads(inserted_reads);
+
+        RETURN result;
+    EXCEPTION WHEN OTHERS THEN
+        -- A bad row (e.g. unknown reader_id) aborts the whole statement;
+        -- fall back to row-by-row so the rest of the batch still lands
+        result := '[]'::jsonb;
+    END;
+
+    FOR read_row IN SELECT * FROM jsonb_array_elements(p_reads) LOOP
+        BEGIN
+            PERFORM upsert_rfid_read(
+                read_row->>'org_id',
+                read_row->>'epc',
+                (read_row->>'reader_id')::UUID,
+                (read_row->>'antenna')::INTEGER,
+                (read_row->>'rssi')::DECIMAL(5,2),
+                (read_row->>'read_at')::TIMESTAMPTZ,
+                read_row->>'idem_key'
+            );
+            result := result || jsonb_build_array(
+                jsonb_build_object('idem_key', read_row->>'idem_key', 'ok', true)
+            );
+        EXCEPTION WHEN OTHERS THEN
+            result := result || jsonb_build_array(
+                jsonb_build_object('idem_key', read_row->>'idem_key', 'ok', false, 'error', SQLERRM)
+            );
+        END;
+    END LOOP;
+
+    RETURN result;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+GRANT EXECUTE ON FUNCTION upsert_rfid_reads(JSONB) TO service_role;
+GRANT EXECUTE ON FUNCTION rollup_read_buckets(JSONB) TO service_role;
+GRANT EXECUTE ON FUNCTION rollup_inserted_reads(JSONB) TO service_role;
+GRANT EXECUTE ON FUNCTION prune_read_rollups(INTERVAL, INTERVAL) TO service_role;
+
+-- Seed both rollups from the reads already stored
+INSERT INTO read_rollups_1m (
+    org_id, reader_id, antenna, bucket, location_id, reads, rssi_sum, rssi_min, rssi_max
+)
+SELECT r.org_id, r.reader_id, r.antenna, date_trunc('minute', r.read_at), MAX(rd.location_id::text)::uuid,
+    COUNT(*), SUM(r.rssi), MIN(r.rssi), MAX(r.rssi)
+FROM reads_parent r
+LEFT JOIN readers rd ON rd.id = r.reader_id
+WHERE r.read_at >= date_trunc('minute', NOW() - INTERVAL '7 days')
+GROUP BY r.org_id, r.reader_id, r.antenna, date_trunc('minute', r.read_at);
+
+INSERT INTO read_rollups_1h (
+    org_id, reader_id, antenna, bucket, location_id, reads, rssi_sum, rssi_min, rssi_max
+)
+SELECT r.org_id, r.reader_id, r.antenna, date_trunc('hour', r.read_at), MAX(rd.location_id::text)::uuid,
+    COUNT(*), SUM(r.rssi), MIN(r.rssi), MAX(r.rssi)
+FROM reads_parent r
+LEFT JOIN readers rd ON rd.id = r.reader_id
+GROUP BY r.org_id, r.reader_id, r.antenna, date_trunc('hour', r.read_at);
@@ -0,0 +1,110 @@
+-- reads_parent partition lifecycle
+-- Partitions are created ahead by ensure_reads_partitions; expiry, per-org retention
+-- and BRIN conversion of cold partitions run from the ingest worker's partition
+-- manager, because DETACH ... CONCURRENTLY and CREATE INDEX CONCURRENTLY cannot
+-- run inside a function.
+
+-- New partitions carry two B-tree indexes instead of three; per-reader time
+-- series are served by read_rollups_1m/1h. Cold partitions swap the
+-- (org_id, read_at) B-tree for BRIN (read_at).
+CREATE OR REPLACE FUNCTION create_reads_partition(date)
+RETURNS void AS $$
+DECLARE
+    partition_name TEXT;
+    start_date TIMESTAMPTZ;
+    end_date TIMESTAMPTZ;
+BEGIN
+    partition_name := 'reads_' || to_char($1, 'YYYY_MM_DD');
+    start_date := $1::date;
+    end_date := ($1 + interval '1 day')::date;
+
+    EXECUTE format('CREATE TABLE IF NOT EXISTS %I PARTITION OF reads_parent
+                    FOR VALUES FROM (%L) TO (%L) WITH (fillfactor = 90)',
+                   partition_name, start_date, end_date);
+
+    -- Create indexes on partition
+    EXECUTE format('CREATE INDEX IF NOT EXISTS %I ON %I (org_id, epc)',
+                   partition_name || '_org_epc_idx', partition_name);
+    EXECUTE format('CREATE INDEX IF NOT EXISTS %I ON %I (org_id, read_at DESC)',
+                   partition_name || '_org_read_at_idx', partition_name);
+END;
+$$ LANGUAGE plpgsql;
+
+-- Create any missing partitions from today through p_days_ahead days out
+-- Returns the number of partitions created
+CREATE OR REPLACE FUNCTION ensure_reads_partitions(p_days_ahead INTEGER DEFAULT 14)
+RETURNS INTEGER AS $$
+DECLARE
+    day DATE;
+    created INTEGER := 0;
+BEGIN
+    FOR day IN
+        SELECT generate_series(CURRENT_DATE, CURRENT_DATE + p_days_ahead, interval '1 day')::date
+    LOOP
+        IF to_regclass('reads_' || to_char(day, 'YYYY_MM_DD')) IS NULL THEN
+            PERFORM create_reads_partition(day);
+            created := created + 1;
+        END IF;
+    END LOOP;
+
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Attached partitions with their bounds, read from the catalog rather than parsed
+-- from table names
+CREATE OR REPLACE FUNCTION reads_partitions()
+RETURNS TABLE (
+    partition_name TEXT,
+    range_start TIMESTAMPTZ,
+    range_end TIMESTAMPTZ,
+    has_brin BOOLEAN,
+    detach_pending BOOLEAN
+) AS $$
+    SELECT
+        c.relname::text,
+        bounds[1]::timestamptz,
+        bounds[2]::timestamptz,
+        EXISTS (
+            SELECT 1
+            FROM pg_index i
+            JOIN pg_class ic ON ic.oid = i.indexrelid
+            JOIN pg_am am ON am.oid = ic.relam
+            WHERE i.indrelid = c.oid AND am.amname = 'brin'
+        ),
+        inh.inhdetachpending
+    FROM pg_inherits inh
+    JOIN pg_class c ON c.oid = inh.inhrelid
+    CROSS JOIN LATERAL regexp_match(
+        pg_get_expr(c.relpartbound, c.oid),
+        'FROM \(''([^'']+)''\) TO \(''([^'']+)''\)'
+    ) AS bounds
+    WHERE inh.inhparent = 'reads_parent'::regclass
+    ORDER BY 2;
+$$ LANGUAGE sql STABLE;
+
+-- Kept for existing schedules: creates partitions ahead only. Expired partitions
+-- are detached concurrently and dropped by the partition manager.
+CREATE OR REPLACE FUNCTION rotate_reads_partitions()
+RETURNS void AS $$
+BEGIN
+    PERFORM ensure_reads_partitions(14);
+END;
+$$ LANGUAGE plpgsql;
+
+-- Hot partitions created by 001 lose their (reader_id, read_at) index
+DO $$
+DECLARE
+    partition_name TEXT;
+BEGIN
+    FOR partition_name IN
+        SELECT p.partition_name FROM reads_partitions() p WHERE p.range_start >= CURRENT_DATE
+    LOOP
+        EXECUTE format('DROP INDEX IF EXISTS %I', partition_name || '_reader_read_at_idx');
+    END LOOP;
+END $$;
+
+SELECT ensure_reads_partitions(14);
+
+GRANT EXECUTE ON FUNCTION ensure_reads_partitions(INTEGER) TO service_role;
+GRANT EXECUTE ON FUNCTION reads_partitions() TO service_role;
@@ -0,0 +1,98 @@
+-- Per-read upsert errors carry their SQLSTATE, so the ingest worker can tell
+-- errors that recur on every delivery (bad values, unknown reader_id) from
+-- transient ones and dead-letter them at once instead of retrying them.
+
+-- Bulk upsert conflicting on the per-partition (idem_key, read_at) key
+CREATE OR REPLACE FUNCTION upsert_rfid_reads(p_reads JSONB)
+RETURNS JSONB AS $$
+DECLARE
+    result JSONB;
+    inserted_reads JSONB;
+    read_row JSONB;
+BEGIN
+    -- Fast path: a single set-based upsert for the whole batch
+    BEGIN
+        WITH incoming AS (
+            -- ON CONFLICT cannot touch the same row twice in one statement
+            SELECT DISTINCT ON (r.idem_key, date_trunc('second', r.read_at))
+                r.org_id, r.epc, r.reader_id, r.antenna, r.rssi,
+                date_trunc('second', r.read_at) AS read_at, r.idem_key
+            FROM jsonb_to_recordset(p_reads) AS r(
+                org_id TEXT,
+                epc TEXT,
+                reader_id UUID,
+                antenna INTEGER,
+                rssi DECIMAL(5,2),
+                read_at TIMESTAMPTZ,
+                idem_key UUID
+            )
+            ORDER BY r.idem_key, date_trunc('second', r.read_at), r.read_at DESC
+        ), upserted AS (
+            INSERT INTO reads_parent (
+                org_id, epc, reader_id, antenna, rssi, read_at, idem_key
+            )
+            SELECT org_id, epc, reader_id, antenna, rssi, read_at, idem_key
+            FROM incoming
+            ON CONFLICT (idem_key, read_at) DO UPDATE SET
+                rssi = EXCLUDED.rssi
+            RETURNING reads_parent.org_id, reads_parent.epc, reads_parent.reader_id,
+                reads_parent.antenna, reads_parent.rssi, reads_parent.read_at,
+                reads_parent.idem_key, (reads_parent.xmax = 0) AS inserted
+        )
+        SELECT
+            COALESCE(
+                jsonb_agg(jsonb_build_object('idem_key', upserted.idem_key, 'ok', true)),
+                '[]'::jsonb
+            ),
+            COALESCE(
+                jsonb_agg(jsonb_build_object(
+                    'org_id', upserted.org_id,
+                    'epc', upserted.epc,
+                    'reader_id', upserted.reader_id,
+                    'antenna', upserted.antenna,
+                    'rssi', upserted.rssi,
+                    'read_at', upserted.read_at
+                )) FILTER (WHERE upserted.inserted),
+                '[]'::jsonb
+            )
+        INTO result, inserted_reads
+        FROM upserted;
+
+        -- Inside the same subtransaction: a failure here falls back like a bad row
+        PERFORM rollup_inserted_reads(inserted_reads);
+
+        RETURN result;
+    EXCEPTION WHEN OTHERS THEN
+        -- A bad row (e.g. unknown reader_id) aborts the whole statement;
+        -- fall back to row-by-row so the rest of the batch still lands
+        result := '[]'::jsonb;
+    END;
+
+    FOR read_row IN SELECT * FROM jsonb_array_elements(p_reads) LOOP
+        BEGIN
+            PERFORM upsert_rfid_read(
+                read_row->>'org_id',
+                read_row->>'epc',
+                (read_row->>'reader_id')::UUID,
+                (read_row->>'antenna')::INTEGER,
+                (read_row->>'rssi')::DECIMAL(5,2),
+                (read_row->>'read_at')::TIMESTAMPTZ,
+                (read_row->>'idem_key')::UUID
+            );
+            result := result || jsonb_build_array(
+                jsonb_build_object('idem_key', read_row->>'idem_key', 'ok', true)
+            );
+        EXCEPTION WHEN OTHERS THEN
+            result := result || jsonb_build_array(
+                jsonb_build_object(
+                    'idem_key', read_row->>'idem_key', 'ok', false, 'error', SQLERRM, 'sqlstate', SQLSTATE
+                )
+            );
+        END;
+    END LOOP;
+
+    RETURN result;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+GRANT EXECUTE ON FUNCTION upsert_rfid_reads(JSONB) TO service_role;
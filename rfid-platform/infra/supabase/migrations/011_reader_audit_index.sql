@@ -0,0 +1,7 @@
+-- The gateway's reader cache polls audit.*.readers events by created_at every
+-- few seconds; the existing events indexes lead with org_id, so without this
+-- every poll scanned the whole events table. The predicate must match the
+-- poll's WHERE clause for the planner to use the index.
+CREATE INDEX IF NOT EXISTS idx_events_reader_audit
+    ON events (created_at)
+    WHERE type LIKE 'audit.%.readers';
@@ -0,0 +1,72 @@
+-- Key read rollups per (org, reader, antenna, location, bucket)
+-- With location_id outside the key, every write overwrote it, so a reader moved
+-- within a bucket had all of that bucket's counts attributed to its last location.
+-- Readers may have no location; NULLS NOT DISTINCT (Postgres 15+) keys all of a
+-- reader's unlocated reads in a bucket to one row.
+-- Buckets written before this migration keep the location they were last written with.
+
+ALTER TABLE read_rollups_1m DROP CONSTRAINT read_rollups_1m_pkey;
+ALTER TABLE read_rollups_1h DROP CONSTRAINT read_rollups_1h_pkey;
+
+CREATE UNIQUE INDEX read_rollups_1m_key
+    ON read_rollups_1m (org_id, reader_id, antenna, location_id, bucket) NULLS NOT DISTINCT;
+CREATE UNIQUE INDEX read_rollups_1h_key
+    ON read_rollups_1h (org_id, reader_id, antenna, location_id, bucket) NULLS NOT DISTINCT;
+
+-- Fold newly inserted reads into both granularities, one row per location
+-- p_reads is a JSON array of {org_id, epc, reader_id, antenna, rssi, read_at}
+CREATE OR REPLACE FUNCTION rollup_read_buckets(p_reads JSONB)
+RETURNS void AS $$
+BEGIN
+    WITH incoming AS (
+        SELECT r.*, rd.location_id
+        FROM jsonb_to_recordset(p_reads) AS r(
+            org_id TEXT,
+            reader_id UUID,
+            antenna INTEGER,
+            rssi DECIMAL(5,2),
+            read_at TIMESTAMPTZ
+        )
+        LEFT JOIN readers rd ON rd.id = r.reader_id
+    )
+    INSERT INTO read_rollups_1m (
+        org_id, reader_id, antenna, location_id, bucket, reads, rssi_sum, rssi_min, rssi_max
+    )
+    SELECT org_id, reader_id, antenna, location_id, date_trunc('minute', read_at),
+        COUNT(*), SUM(rssi), MIN(rssi), MAX(rssi)
+    FROM incoming
+    GROUP BY org_id, reader_id, antenna, location_id, date_trunc('minute', read_at)
+    -- Lock in key order so concurrent workers cannot deadlock
+    ORDER BY org_id, reader_id, antenna, location_id, date_trunc('minute', read_at)
+    ON CONFLICT (org_id, reader_id, antenna, location_id, bucket) DO UPDATE SET
+        reads = read_rollups_1m.reads + EXCLUDED.reads,
+        rssi_sum = read_rollups_1m.rssi_sum + EXCLUDED.rssi_sum,
+        rssi_min = LEAST(read_rollups_1m.rssi_min, EXCLUDED.rssi_min),
+        rssi_max = GREATEST(read_rollups_1m.rssi_max, EXCLUDED.rssi_max);
+
+    WITH incoming AS (
+        SELECT r.*, rd.location_id
+        FROM jsonb_to_recordset(p_reads) AS r(
+            org_id TEXT,
+            reader_id UUID,
+            antenna INTEGER,
+            rssi DECIMAL(5,2),
+            read_at TIMESTAMPTZ
+        )
+        LEFT JOIN readers rd ON rd.id = r.reader_id
+    )
+    INSERT INTO read_rollups_1h (
+        org_id, reader_id, antenna, location_id, bucket, reads, rssi_sum, rssi_min, rssi_max
+    )
+    SELECT org_id, reader_id, antenna, location_id, date_trunc('hour', read_at),
+        COUNT(*), SUM(rssi), MIN(rssi), MAX(rssi)
+    FROM incoming
+    GROUP BY org_id, reader_id, antenna, location_id, date_trunc('hour', read_at)
+    ORDER BY org_id, reader_id, antenna, location_id, date_trunc('hour', read_at)
+    ON CONFLICT (org_id, reader_id, antenna, location_id, bucket) DO UPDATE SET
+        reads = read_rollups_1h.reads + EXCLUDED.reads,
+        rssi_sum = read_rollups_1h.rssi_sum + EXCLUDED.rssi_sum,
+        rssi_min = LEAST(read_rollups_1h.rssi_min, EXCLUDED.rssi_min),
+        rssi_max = GREATEST(read_rollups_1h.rssi_max, EXCLUDED.rssi_max);
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
@@ -86,7 +86,7 @@ INSERT INTO events (org_id, type, payload) VALUES
 ('ktl', 'reader.registered', '{"reader_id": "r1111111-1111-1111-1111-111111111111", "name": "Line 1 Cut Reader", "status": "online"}'),
 ('ktl', 'asset.registered', '{"asset_id": "a1111111-1111-1111-1111-111111111111", "epc": "3034A1B2C3D4E5F6", "name": "Cotton T-Shirt"}');
 
--- Create some sample reads for the last 24 hours
+-- Create some sample reads for the last 24 hours; their idempotency keys are not pipeline-compatible (see below)
 DO $$
 DECLARE
     reader_ids UUID[] := ARRAY[
@@ -120,12 +120,12 @@ DECLARE
     epc TEXT;
     antenna INTEGER;
     rssi DECIMAL(5,2);
-    idem_key TEXT;
+    idem_key UUID;
 BEGIN
     -- Generate reads for the last 24 hours
     FOR i IN 1..1000 LOOP
         -- Random time in the last 24 hours
-        read_time := NOW() - (random() * INTERVAL '24 hours');
+        read_time := date_trunc('second', NOW() - (random() * INTERVAL '24 hours'));
         
         -- Random reader and asset
         reader_id := reader_ids[1 + floor(random() * array_length(reader_ids, 1))];
@@ -135,12 +135,14 @@ BEGIN
         antenna := 1 + floor(random() * 4);
         rssi := -30 - (random() * 50);
         
-        -- Generate idempotency key
-        idem_key := encode(digest('ktl' || epc || reader_id || antenna || floor(extract(epoch from read_time) * 1000)::text, 'sha1'), 'hex');
+        -- Demo idempotency key: unique within the seed, but NOT the ingest worker's
+        -- xxh3-128 derivation (idempotency.py), which Postgres cannot compute. The same
+        -- read replayed through the gateway gets a different key and is stored again.
+        idem_key := md5('ktl' || epc || reader_id || antenna || extract(epoch from read_time)::bigint::text)::uuid;
         
         -- Insert read
         INSERT INTO reads_parent (org_id, epc, reader_id, antenna, rssi, read_at, idem_key)
         VALUES ('ktl', epc, reader_id, antenna, rssi, read_time, idem_key)
-        ON CONFLICT (idem_key) DO NOTHING;
+        ON CONFLICT (idem_key, read_at) DO NOTHING;
     END LOOP;
 END $$;
\ No newline at end of file
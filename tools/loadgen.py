@@ -1,99 +1,515 @@
 #!/usr/bin/env python3
 """Weft load generator
 
-Generates batches of synthetic events at a target rate. By default the
-script prints per-second metrics as JSON lines. Use ``--ndjson`` to emit
-each event as NDJSON instead. With ``--url`` set, batches are POSTed to
-an ingest endpoint (e.g. tools/ingest_bench.ts) while metrics continue
-to stream to stdout.
+Drives the API gateway's RFID ingest endpoints with signed CloudEvents at a
+target rate. Requests are scheduled open-loop: each one has an intended
+send time fixed by the rate. Latency is measured from that time, so a
+stalled gateway shows up as queueing delay instead of a slower send rate.
+This avoids coordinated omission. Up to ``--connections`` requests are in
+flight at once, each on its own keep-alive HTTP/1.1 connection.
+
+With ``--batch-size 1`` every event is POSTed to ``/v1/ingest/rfid``.
+Larger batches go to ``/v1/ingest/rfid/batch`` as NDJSON. The script prints
+per-second metrics, with latency percentiles, as JSON lines on stdout, and a
+summary line at the end. Use ``--ndjson`` to print the events instead of
+sending them.
+
+Requests are signed like the gateway's ``create_hmac_signature``:
+``sha256=HMAC(api_key, timestamp + body)``. Bodies are the canonical
+(sorted-key, compact) JSON the gateway re-serialises in canonical mode.
+For a single event, the same signature therefore passes in both
+HMAC_SIGNATURE_MODE settings. The key is the reader's ``api_key_hash``.
 """
 
 from __future__ import annotations
 
 import argparse
+import asyncio
+import hashlib
+import hmac
 import json
-import time
-import random
-import string
+import math
+import os
+import ssl
 import sys
-from typing import List
-from urllib import request
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+SINGLE_PATH = "/v1/ingest/rfid"
+BATCH_PATH = "/v1/ingest/rfid/batch"
+PERCENTILES = (50, 90, 95, 99, 99.9)
+
+
+class LatencyHistogram:
+    """HDR-style histogram of microsecond values with three significant digits
+
+    Values below 2 * SUB_BUCKETS are counted exactly; above that each power of
+    two is split into SUB_BUCKETS linear buckets, so the relative error stays
+    under 0.1% at any magnitude while memory only grows with distinct buckets.
+    """
+
+    SUB_BUCKET_BITS = 10
+    SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+
+    def __init__(self) -> None:
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.max = 0
+
+    def _index(self, value: int) -> int:
+        if value < 2 * self.SUB_BUCKETS:
+            return value
+        shift = value.bit_length() - self.SUB_BUCKET_BITS - 1
+        return self.SUB_BUCKETS * (shift + 1) + (value >> shift) - self.SUB_BUCKETS
+
+    def _highest_equivalent(self, index: int) -> int:
+        if index < 2 * self.SUB_BUCKETS:
+            return index
+        shift = index // self.SUB_BUCKETS - 1
+        sub_bucket = index % self.SUB_BUCKETS + self.SUB_BUCKETS
+        return ((sub_bucket + 1) << shift) - 1
+
+    def record(self, value_us: int) -> None:
+        value_us = max(0, int(value_us))
+        index = self._index(value_us)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.max = max(self.max, value_us)
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.count += other.count
+        self.max = max(self.max, other.max)
+
+    def percentile(self, q: float) -> int:
+        if not self.count:
+            return 0
+        target = max(1, math.ceil(q / 100.0 * self.count))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= target:
+                return min(self._highest_equivalent(index), self.max)
+        return self.max
+
+    def summary_ms(self) -> dict:
+        """Percentiles and max in milliseconds, keyed p50, p90, ..., p99.9, max"""
+        out = {f"p{q:g}": round(self.percentile(q) / 1000.0, 3) for q in PERCENTILES}
+        out["max"] = round(self.max / 1000.0, 3)
+        return out
+
+
+class HttpConnection:
+    """One keep-alive HTTP/1.1 connection on asyncio streams
+
+    Reconnects lazily after an error or a ``Connection: close`` response.
+    """
+
+    def __init__(
+        self, host: str, port: int, ssl_context: Optional[ssl.SSLContext]
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.ssl_context = ssl_context
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+
+    async def request(
+        self, path: str, headers: Dict[str, str], body: bytes
+    ) -> Tuple[int, bytes]:
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(
+                self.host, self.port, ssl=self.ssl_context
+            )
+
+        head = [
+            f"POST {path} HTTP/1.1",
+            f"Host: {self.host}:{self.port}",
+            f"Content-Length: {len(body)}",
+        ]
+        head.extend(f"{name}: {value}" for name, value in headers.items())
+        try:
+            self.writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+            await self.writer.drain()
+            return await self._read_response()
+        except BaseException:
+            self.close()
+            raise
+
+    async def _read_response(self) -> Tuple[int, bytes]:
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError("connection closed by server")
+        status = int(status_line.split()[1])
+
+        response_headers: Dict[str, str] = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            response_headers[name.strip().lower()] = value.strip()
+
+        if response_headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await self.reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    await self.reader.readline()
+                    break
+                chunks.append(await self.reader.readexactly(size))
+                await self.reader.readexactly(2)
+            body = b"".join(chunks)
+        else:
+            body = await self.reader.readexactly(
+                int(response_headers.get("content-length", "0"))
+            )
+
+        if response_headers.get("connection", "").lower() == "close":
+            self.close()
+        return status, body
 
+    def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
 
-def rand_id(n: int = 8) -> str:
-    return "".join(random.choice(string.ascii_lowercase + string.digits) for _ in range(n))
 
+def sign(api_key: str, timestamp: str, body: bytes) -> str:
+    """X-Signature header value for a request body"""
+    mac = hmac.new(api_key.encode("utf-8"), timestamp.encode("utf-8"), hashlib.sha256)
+    mac.update(body)
+    return f"sha256={mac.hexdigest()}"
 
-def make_event(seq: int, tenant: str) -> dict:
-    ts = int(time.time() * 1000)
-    return {"tenant_id": tenant, "tag_id": f"T{seq:08d}", "ts_ms": ts, "source": "serial"}
 
+def canonical_json(value) -> bytes:
+    return json.dumps(value, sort_keys=True, separators=(",", ":")).encode("utf-8")
 
-def post_batch(url: str, events: List[dict]) -> None:
-    data = json.dumps({"events": events}).encode()
-    req = request.Request(url, data=data, headers={"content-type": "application/json"})
-    with request.urlopen(req) as resp:  # noqa: S310 - simple bench client
-        resp.read()  # drain to reuse connection in future expansions
+
+def make_event(seq: int, reader_id: str, antennas: int, epc_prefix: str) -> dict:
+    """One RFID read CloudEvent with a unique EPC per sequence number
+
+    Every CloudEvent model field is present. ``time`` stays null because the
+    gateway signs ``event.dict()`` in canonical mode, where a datetime would
+    not serialise. The read time travels as ``data.reader_ts``.
+    """
+    return {
+        "specversion": "1.0",
+        "type": "com.rfid.read",
+        "source": f"loadgen/{reader_id}",
+        "id": str(uuid.uuid4()),
+        "time": None,
+        "datacontenttype": "application/json",
+        "data": {
+            "epc": f"{epc_prefix}{seq:016X}",
+            "reader_id": reader_id,
+            "antenna": seq % antennas + 1,
+            "rssi": -40.0 - seq % 40,
+            "reader_ts": datetime.now(timezone.utc).isoformat(),
+        },
+    }
+
+
+class LoadGenerator:
+    """Open-loop signed ingest traffic against one gateway
+
+    ``on_sent`` is called with each request's events and its intended send
+    time as a ``time.time()`` value, e.g. to match events to stored rows later.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        device_id: str,
+        api_key: str,
+        reader_id: str,
+        events_per_sec: int,
+        batch_size: int = 1,
+        duration_sec: float = 10,
+        connections: int = 64,
+        timeout_sec: float = 30.0,
+        antennas: int = 4,
+        epc_prefix: str = "E280",
+        on_sent: Optional[Callable[[List[dict], float], None]] = None,
+        out=sys.stdout,
+    ) -> None:
+        parts = urlsplit(url)
+        self.host = parts.hostname or "localhost"
+        self.port = parts.port or (443 if parts.scheme == "https" else 80)
+        self.base_path = parts.path.rstrip("/")
+        self.ssl_context = (
+            ssl.create_default_context() if parts.scheme == "https" else None
+        )
+
+        self.device_id = device_id
+        self.api_key = api_key
+        self.reader_id = reader_id
+        self.events_per_sec = max(1, events_per_sec)
+        self.batch_size = max(1, batch_size)
+        self.duration_sec = max(0.001, duration_sec)
+        self.connections = max(1, connections)
+        self.timeout_sec = timeout_sec
+        self.antennas = max(1, antennas)
+        self.epc_prefix = epc_prefix
+        self.on_sent = on_sent
+        self.out = out
+
+        self.seq = 0
+        self.interval = LatencyHistogram()
+        self.total = LatencyHistogram()
+        self.service = LatencyHistogram()
+        self.counters = self._new_counters()
+        self.totals = self._new_counters()
+
+    @staticmethod
+    def _new_counters() -> Dict[str, int]:
+        return {"requests": 0, "events": 0, "accepted": 0, "rejected": 0, "errors": 0}
+
+    def next_request(self) -> Tuple[str, Dict[str, str], bytes, List[dict]]:
+        events = []
+        for _ in range(self.batch_size):
+            self.seq += 1
+            events.append(
+                make_event(self.seq, self.reader_id, self.antennas, self.epc_prefix)
+            )
+
+        if self.batch_size == 1:
+            path, content_type = SINGLE_PATH, "application/cloudevents+json"
+            body = canonical_json(events[0])
+        else:
+            path, content_type = BATCH_PATH, "application/x-ndjson"
+            body = b"\n".join(canonical_json(event) for event in events) + b"\n"
+
+        timestamp = datetime.now(timezone.utc).isoformat()
+        headers = {
+            "Content-Type": content_type,
+            "X-Device-ID": self.device_id,
+            "X-Timestamp": timestamp,
+            "X-Signature": sign(self.api_key, timestamp, body),
+        }
+        return self.base_path + path, headers, body, events
+
+    async def _send(self, pool: asyncio.Queue, intended: float, request) -> None:
+        path, headers, body, events = request
+        loop = asyncio.get_running_loop()
+        conn = await pool.get()
+        started = loop.time()
+        try:
+            if self.on_sent:
+                self.on_sent(events, time.time() - (started - intended))
+            status, response = await asyncio.wait_for(
+                conn.request(path, headers, body), self.timeout_sec
+            )
+        except (
+            OSError,
+            ValueError,
+            IndexError,
+            asyncio.IncompleteReadError,
+            asyncio.TimeoutError,
+        ) as e:
+            self._count(errors=1, events=len(events), rejected=len(events))
+            print(
+                json.dumps({"error": f"{type(e).__name__}: {e}"}),
+                file=sys.stderr,
+                flush=True,
+            )
+            return
+        finally:
+            pool.put_nowait(conn)
+
+        finished = loop.time()
+        # Corrected latency runs from the intended send time; service time from the actual one
+        self.interval.record((finished - intended) * 1e6)
+        self.total.record((finished - intended) * 1e6)
+        self.service.record((finished - started) * 1e6)
+
+        accepted = 0
+        if status == 202 and len(events) == 1:
+            accepted = 1
+        elif status in (202, 400) and len(events) > 1:
+            try:
+                accepted = int(json.loads(response).get("accepted", 0))
+            except (ValueError, AttributeError):
+                pass
+        self._count(
+            events=len(events),
+            accepted=accepted,
+            rejected=len(events) - accepted,
+            errors=int(status >= 500),
+        )
+
+    def _count(self, **deltas: int) -> None:
+        deltas["requests"] = 1
+        for name, delta in deltas.items():
+            self.counters[name] += delta
+            self.totals[name] += delta
+
+    def _report(self, sec: int, elapsed: float, in_flight: int) -> None:
+        line = dict(
+            self.counters,
+            sec=sec,
+            eps=round(self.counters["events"] / elapsed, 1),
+            in_flight=in_flight,
+        )
+        line["latency_ms"] = self.interval.summary_ms()
+        print(json.dumps(line), file=self.out, flush=True)
+        self.counters = self._new_counters()
+        self.interval = LatencyHistogram()
+
+    async def _report_every_second(self, start: float, tasks: set) -> None:
+        loop = asyncio.get_running_loop()
+        sec = 0
+        while True:
+            sec += 1
+            await asyncio.sleep(max(0.0, start + sec - loop.time()))
+            self._report(sec, 1.0, len(tasks))
+
+    async def run(self) -> dict:
+        """Send for duration_sec, wait for in-flight requests, and return the summary"""
+        loop = asyncio.get_running_loop()
+        pool: asyncio.Queue = asyncio.Queue()
+        conns = [
+            HttpConnection(self.host, self.port, self.ssl_context)
+            for _ in range(self.connections)
+        ]
+        for conn in conns:
+            pool.put_nowait(conn)
+
+        period = self.batch_size / self.events_per_sec
+        start = loop.time()
+        tasks: set = set()
+        reporter = asyncio.ensure_future(self._report_every_second(start, tasks))
+        n = 0
+        try:
+            while True:
+                intended = start + n * period
+                if intended - start >= self.duration_sec:
+                    break
+                delay = intended - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                task = asyncio.ensure_future(
+                    self._send(pool, intended, self.next_request())
+                )
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+                n += 1
+
+            if tasks:
+                await asyncio.wait(set(tasks))
+        finally:
+            reporter.cancel()
+            for conn in conns:
+                conn.close()
+
+        elapsed = loop.time() - start
+        if self.counters["requests"]:
+            # Requests that finished after the last full second
+            self._report(math.ceil(elapsed), max(elapsed % 1.0, 1e-3), 0)
+        summary = dict(
+            self.totals,
+            seconds=round(elapsed, 3),
+            eps=round(self.totals["events"] / elapsed, 1),
+            target_eps=self.events_per_sec,
+            batch_size=self.batch_size,
+            connections=self.connections,
+            latency_ms=self.total.summary_ms(),
+            service_ms=self.service.summary_ms(),
+        )
+        print(json.dumps({"summary": summary}), file=self.out, flush=True)
+        return summary
+
+
+def print_events(args: argparse.Namespace) -> None:
+    """--ndjson: print the events that would be sent, paced at the target rate"""
+    start = time.monotonic()
+    for seq in range(1, args.events_per_sec * args.duration_sec + 1):
+        delay = start + seq / args.events_per_sec - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        print(
+            json.dumps(make_event(seq, args.reader_id, args.antennas, args.epc_prefix))
+        )
 
 
 def main() -> None:
-    ap = argparse.ArgumentParser(description="Weft load generator (stdout metrics)")
-    ap.add_argument("-n", "--events-per-sec", type=int, default=100, help="target events/sec")
-    ap.add_argument("-b", "--batch-size", type=int, default=128, help="events per batch")
-    ap.add_argument("-d", "--duration-sec", type=int, default=10, help="run time in seconds")
-    ap.add_argument("--ndjson", action="store_true", help="emit NDJSON events to stdout")
-    ap.add_argument("--tenant", default="t_" + rand_id(6))
-    ap.add_argument("--url", help="POST batches to this ingest endpoint")
+    ap = argparse.ArgumentParser(
+        description="Weft load generator (JSON-lines metrics on stdout)"
+    )
+    ap.add_argument(
+        "-n", "--events-per-sec", type=int, default=100, help="target events/sec"
+    )
+    ap.add_argument(
+        "-b",
+        "--batch-size",
+        type=int,
+        default=1,
+        help="events per request; 1 uses the single-event endpoint",
+    )
+    ap.add_argument(
+        "-d", "--duration-sec", type=int, default=10, help="run time in seconds"
+    )
+    ap.add_argument(
+        "-c",
+        "--connections",
+        type=int,
+        default=64,
+        help="keep-alive connections, i.e. max requests in flight",
+    )
+    ap.add_argument(
+        "--timeout-sec", type=float, default=30.0, help="per-request timeout"
+    )
+    ap.add_argument("--url", help="gateway base URL, e.g. http://localhost:8000")
+    ap.add_argument(
+        "--device-id", default=os.environ.get("LOADGEN_DEVICE_ID", "impinj-r700-001")
+    )
+    ap.add_argument(
+        "--api-key",
+        default=os.environ.get("LOADGEN_API_KEY"),
+        help="reader api_key_hash used as the HMAC key (env LOADGEN_API_KEY)",
+    )
+    ap.add_argument(
+        "--reader-id",
+        default=os.environ.get("LOADGEN_READER_ID", str(uuid.uuid4())),
+        help="reader UUID placed in event data",
+    )
+    ap.add_argument("--antennas", type=int, default=4)
+    ap.add_argument("--epc-prefix", default="E280", help="hex prefix of generated EPCs")
+    ap.add_argument(
+        "--ndjson",
+        action="store_true",
+        help="print NDJSON events to stdout instead of sending",
+    )
     args = ap.parse_args()
 
-    target_eps = max(1, args.events_per_sec)
-    bs = max(1, args.batch_size)
-    duration = max(1, args.duration_sec)
-
-    seq = 0
-    start = time.time()
-
-    for sec in range(duration):
-        sec_start = time.time()
-        sent = 0
-        batches = 0
-        while sent < target_eps:
-            n = min(bs, target_eps - sent)
-            events: List[dict] = []
-            if args.ndjson or args.url:
-                for _ in range(n):
-                    seq += 1
-                    ev = make_event(seq, args.tenant)
-                    if args.ndjson:
-                        print(json.dumps(ev))
-                    events.append(ev)
-            else:
-                seq += n
-
-            if args.url:
-                try:
-                    post_batch(args.url, events)
-                except Exception as e:  # pragma: no cover - best-effort logging
-                    print(json.dumps({"error": str(e)}), flush=True)
-
-            sent += n
-            batches += 1
-
-        if not args.ndjson:
-            elapsed = time.time() - sec_start
-            eps = sent / elapsed if elapsed > 0 else sent
-            print(json.dumps({"sec": sec + 1, "events": sent, "batches": batches, "eps": round(eps, 1)}))
-
-        remaining = 1.0 - (time.time() - sec_start)
-        if remaining > 0:
-            time.sleep(remaining)
-
-    elapsed = time.time() - start
-    if not args.ndjson:
-        print(json.dumps({"summary": {"total": target_eps * duration, "seconds": round(elapsed, 2)}}), file=sys.stderr)
+    if args.ndjson:
+        print_events(args)
+        return
+    if not args.url or not args.api_key:
+        ap.error(
+            "--url and --api-key (or LOADGEN_API_KEY) are required unless --ndjson is set"
+        )
+
+    generator = LoadGenerator(
+        args.url,
+        args.device_id,
+        args.api_key,
+        args.reader_id,
+        args.events_per_sec,
+        batch_size=args.batch_size,
+        duration_sec=args.duration_sec,
+        connections=args.connections,
+        timeout_sec=args.timeout_sec,
+        antennas=args.antennas,
+        epc_prefix=args.epc_prefix,
+    )
+    summary = asyncio.run(generator.run())
+    sys.exit(1 if summary["errors"] else 0)
 
 
 if __name__ == "__main__":
     main()
-
->>>>>>> origin/w5t1y7-codex/create-top-level-repo-layout
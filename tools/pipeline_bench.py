@@ -0,0 +1,779 @@
+#!/usr/bin/env python3
+"""Weft pipeline benchmark
+
+Runs the RFID ingest pipeline end to end on one host and checks it against
+the latency SLOs in ``docs/PERFORMANCE.md``:
+
+    loadgen -> gateway -> Redis stream -> ingest worker(s) -> Postgres row
+
+Redis and Postgres are started from local binaries (``redis-server``,
+``initdb``/``postgres``) unless ``--redis-url`` / ``--database-url`` point
+at running servers. Each run gets a fresh database with the Supabase
+migrations applied. The ``anon``, ``authenticated`` and ``service_role``
+roles are created first, and a bench org and reader are added as fixtures.
+The gateway and workers talk to it over asyncpg, just as they talk to
+Supabase.
+
+Ingest-to-row latency runs from each event's intended send time to the
+``created_at`` of its stored row. ``created_at`` defaults to ``now()``,
+which is the upsert's transaction start, so it slightly flatters the
+worker. A JSON report is written to ``--report``. It holds the load
+summary, row throughput, latency percentiles, lost events and CPU/RSS per
+service. The exit status is 1 when an SLO is missed, an event is lost or
+rejected, or the generator fell short of the target rate.
+
+Needs asyncpg and the gateway and worker requirements installed, e.g.
+``pip install -r rfid-platform/apps/gateway/requirements.txt``. CPU and
+memory sampling reads ``/proc``, so it is Linux only.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import re
+import secrets
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from loadgen import LatencyHistogram, LoadGenerator  # noqa: E402
+
+try:
+    import asyncpg
+except ImportError:  # pragma: no cover - reported in main()
+    asyncpg = None
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+APPS_DIR = REPO_ROOT / "rfid-platform" / "apps"
+MIGRATIONS_DIR = REPO_ROOT / "rfid-platform" / "infra" / "supabase" / "migrations"
+PERFORMANCE_DOC = REPO_ROOT / "docs" / "PERFORMANCE.md"
+
+DEFAULT_SLOS = {"p50": 100.0, "p95": 200.0, "p99": 300.0}
+SLO_LINE = re.compile(
+    r"^- (p\d+(?:\.\d+)?)\b[^*\n]*\*\*(\d+(?:\.\d+)?) ms\*\*", re.MULTILINE
+)
+# Roles the Supabase migrations grant to; a plain Postgres server lacks them
+SUPABASE_ROLES = ("anon", "authenticated", "service_role")
+WARMUP_EPC_PREFIX = "E2800001"
+RUN_EPC_PREFIX = "E2800002"
+MIN_RATE_RATIO = 0.95  # achieved/target send rate below this fails the run
+
+
+def load_slos(path: Path = PERFORMANCE_DOC) -> Dict[str, float]:
+    """Percentile targets (ms) from the ## SLOs section, e.g. "- p95 < **200 ms**" """
+    try:
+        text = path.read_text(encoding="utf-8")
+    except OSError:
+        return dict(DEFAULT_SLOS)
+    section = (
+        text.split("## SLOs", 1)[-1].split("\n## ", 1)[0] if "## SLOs" in text else ""
+    )
+    slos = {name: float(value) for name, value in SLO_LINE.findall(section)}
+    return slos or dict(DEFAULT_SLOS)
+
+
+def parse_assignments(values: List[str], option: str) -> Dict[str, str]:
+    pairs = {}
+    for value in values:
+        name, sep, setting = value.partition("=")
+        if not sep or not name:
+            raise SystemExit(f"{option} expects NAME=VALUE, got {value!r}")
+        pairs[name.strip()] = setting.strip()
+    return pairs
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def find_binary(name: str) -> Optional[str]:
+    """A binary on PATH, or in a Debian-style /usr/lib/postgresql/<version>/bin"""
+    found = shutil.which(name)
+    if found:
+        return found
+    for candidate in sorted(
+        Path("/usr/lib/postgresql").glob(f"*/bin/{name}"), reverse=True
+    ):
+        return str(candidate)
+    return None
+
+
+class Services:
+    """Child processes of the run, each logging to <log_dir>/<name>.log"""
+
+    def __init__(self, log_dir: Path) -> None:
+        self.log_dir = log_dir
+        self.processes: Dict[str, subprocess.Popen] = {}
+
+    def start(
+        self,
+        name: str,
+        argv: List[str],
+        env: Optional[Dict[str, str]] = None,
+        cwd: Optional[Path] = None,
+    ):
+        log = open(self.log_dir / f"{name}.log", "ab")
+        process = subprocess.Popen(
+            argv,
+            env=env,
+            cwd=cwd,
+            stdout=log,
+            stderr=subprocess.STDOUT,
+            start_new_session=True,
+        )
+        log.close()
+        self.processes[name] = process
+        return process
+
+    def check(self) -> None:
+        for name, process in self.processes.items():
+            if process.poll() is not None:
+                raise SystemExit(
+                    f"{name} exited with status {process.returncode}; see {self.log_dir / name}.log"
+                )
+
+    def stop(self, names: Optional[List[str]] = None, timeout: float = 15.0) -> None:
+        if names is None:
+            names = list(reversed(list(self.processes)))
+        for name in names:
+            process = self.processes.get(name)
+            if process and process.poll() is None:
+                process.send_signal(signal.SIGTERM)
+        for name in names:
+            process = self.processes.pop(name, None)
+            if process is None:
+                continue
+            try:
+                process.wait(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+
+
+class ResourceSampler:
+    """CPU time and peak RSS per service, summed over each process tree, from /proc"""
+
+    def __init__(self, services: Services, interval: float = 1.0) -> None:
+        self.services = services
+        self.interval = interval
+        self.enabled = os.path.isdir("/proc/self")
+        self.ticks = os.sysconf("SC_CLK_TCK") if self.enabled else 100
+        self.page_size = os.sysconf("SC_PAGE_SIZE") if self.enabled else 4096
+        self.first: Dict[str, int] = {}
+        self.last: Dict[str, int] = {}
+        self.max_rss: Dict[str, int] = {}
+        self.started = self.stopped = 0.0
+        self.task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def _stat(pid: int) -> Optional[Tuple[int, int, int]]:
+        """(ppid, utime + stime ticks, rss pages) of one process"""
+        try:
+            with open(f"/proc/{pid}/stat", "rb") as f:
+                fields = f.read().rsplit(b")", 1)[1].split()
+        except (OSError, IndexError):
+            return None
+        return int(fields[1]), int(fields[11]) + int(fields[12]), int(fields[21])
+
+    def sample(self) -> None:
+        stats = {}
+        for entry in os.listdir("/proc"):
+            if entry.isdigit():
+                stat = self._stat(int(entry))
+                if stat:
+                    stats[int(entry)] = stat
+        children: Dict[int, List[int]] = {}
+        for pid, (ppid, _, _) in stats.items():
+            children.setdefault(ppid, []).append(pid)
+
+        for name, process in self.services.processes.items():
+            cpu = rss = 0
+            pending = [process.pid]
+            while pending:
+                pid = pending.pop()
+                if pid in stats:
+                    cpu += stats[pid][1]
+                    rss += stats[pid][2]
+                pending.extend(children.get(pid, ()))
+            self.first.setdefault(name, cpu)
+            self.last[name] = cpu
+            self.max_rss[name] = max(self.max_rss.get(name, 0), rss)
+
+    async def _run(self) -> None:
+        while True:
+            self.sample()
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self.enabled:
+            self.started = time.monotonic()
+            self.task = asyncio.ensure_future(self._run())
+
+    def stop(self) -> None:
+        if self.task:
+            self.task.cancel()
+            self.task = None
+            self.sample()
+            self.stopped = time.monotonic()
+
+    def report(self) -> Optional[dict]:
+        if not self.enabled or not self.stopped:
+            return None
+        wall = max(self.stopped - self.started, 1e-3)
+        report = {}
+        for name in self.first:
+            cpu_seconds = (self.last[name] - self.first[name]) / self.ticks
+            report[name] = {
+                "cpu_seconds": round(cpu_seconds, 2),
+                "cpu_percent": round(cpu_seconds / wall * 100, 1),
+                "max_rss_mb": round(self.max_rss[name] * self.page_size / 2**20, 1),
+            }
+        return report
+
+
+async def wait_until(check, what: str, timeout: float, services: Services) -> None:
+    deadline = time.monotonic() + timeout
+    last_error: Optional[BaseException] = None
+    while time.monotonic() < deadline:
+        services.check()
+        try:
+            if await check():
+                return
+        except Exception as e:  # not up yet
+            last_error = e
+        await asyncio.sleep(0.25)
+    raise SystemExit(f"Timed out waiting for {what}: {last_error}")
+
+
+async def start_redis(services: Services) -> str:
+    binary = find_binary("redis-server")
+    if not binary:
+        raise SystemExit("redis-server not found; install Redis or pass --redis-url")
+    port = free_port()
+    services.start(
+        "redis",
+        [
+            binary,
+            "--port",
+            str(port),
+            "--bind",
+            "127.0.0.1",
+            "--save",
+            "",
+            "--appendonly",
+            "no",
+        ],
+    )
+
+    async def ping() -> bool:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(b"PING\r\n")
+        reply = await reader.readline()
+        writer.close()
+        return reply.startswith(b"+PONG")
+
+    await wait_until(ping, "redis", 15, services)
+    return f"redis://127.0.0.1:{port}/0"
+
+
+async def start_postgres(services: Services, work_dir: Path) -> str:
+    initdb, postgres = find_binary("initdb"), find_binary("postgres")
+    if not initdb or not postgres:
+        raise SystemExit(
+            "initdb/postgres not found; install PostgreSQL or pass --database-url"
+        )
+    data_dir = work_dir / "pgdata"
+    result = subprocess.run(
+        [initdb, "-D", str(data_dir), "-U", "postgres", "-A", "trust", "--no-sync"],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+    )
+    if result.returncode:
+        raise SystemExit(
+            f"initdb failed (it refuses to run as root):\n{result.stdout.decode(errors='replace')}"
+        )
+    port = free_port()
+    services.start(
+        "postgres",
+        [
+            postgres,
+            "-D",
+            str(data_dir),
+            "-p",
+            str(port),
+            "-k",
+            str(work_dir),
+            "-h",
+            "127.0.0.1",
+        ],
+    )
+    url = f"postgresql://postgres@127.0.0.1:{port}/postgres"
+
+    async def connect() -> bool:
+        conn = await asyncpg.connect(url)
+        await conn.close()
+        return True
+
+    await wait_until(connect, "postgres", 30, services)
+    return url
+
+
+def database_url(server_url: str, name: str) -> str:
+    return urlsplit(server_url)._replace(path=f"/{name}").geturl()
+
+
+async def prepare_database(server_url: str, name: str, org_id: str) -> Tuple[str, dict]:
+    """Create the run's database, apply migrations and add the bench org and reader"""
+    admin = await asyncpg.connect(server_url)
+    try:
+        await admin.execute(f'CREATE DATABASE "{name}"')
+        for role in SUPABASE_ROLES:
+            await admin.execute(
+                f"DO $$ BEGIN CREATE ROLE {role} NOLOGIN; EXCEPTION WHEN duplicate_object THEN NULL; END $$"
+            )
+    finally:
+        await admin.close()
+
+    url = database_url(server_url, name)
+    conn = await asyncpg.connect(url)
+    try:
+        for migration in sorted(MIGRATIONS_DIR.glob("*.sql")):
+            try:
+                await conn.execute(migration.read_text(encoding="utf-8"))
+            except asyncpg.PostgresError as e:
+                raise SystemExit(f"Migration {migration.name} failed: {e}")
+
+        await conn.execute(
+            "INSERT INTO orgs (id, name, slug) VALUES ($1, 'Pipeline bench', $1)",
+            org_id,
+        )
+        location_id = await conn.fetchval(
+            "INSERT INTO locations (org_id, name, path) VALUES ($1, 'Bench line', '/bench') RETURNING id",
+            org_id,
+        )
+        reader = {"device_id": "bench-reader-1", "api_key": secrets.token_hex(32)}
+        reader["id"] = str(
+            await conn.fetchval(
+                """
+            INSERT INTO readers (org_id, location_id, name, device_id, api_key_hash, status)
+            VALUES ($1, $2, 'Bench reader', $3, $4, 'online')
+            RETURNING id
+            """,
+                org_id,
+                location_id,
+                reader["device_id"],
+                reader["api_key"],
+            )
+        )
+    finally:
+        await conn.close()
+    return url, reader
+
+
+async def drop_database(server_url: str, name: str) -> None:
+    conn = await asyncpg.connect(server_url)
+    try:
+        await conn.execute(f'DROP DATABASE IF EXISTS "{name}"')
+    finally:
+        await conn.close()
+
+
+def start_gateway(services: Services, env: Dict[str, str], port: int) -> None:
+    services.start(
+        "gateway",
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "gateway.main:app",
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+        ],
+        env=env,
+        cwd=APPS_DIR,
+    )
+
+
+def start_workers(
+    services: Services, env: Dict[str, str], count: int, work_dir: Path
+) -> None:
+    """Worker processes as supervisor.py would start them, without shard assignment"""
+    # ingest-worker uses package-relative imports; run it as a package under an importable name
+    package_root = work_dir / "pkg"
+    package_root.mkdir(exist_ok=True)
+    (package_root / "ingest_worker").symlink_to(
+        APPS_DIR / "ingest-worker", target_is_directory=True
+    )
+    for index in range(count):
+        worker_env = dict(
+            env,
+            WORKER_ID=f"bench-{index}",
+            WORKER_SHARD_INDEX="0",
+            WORKER_SHARD_COUNT="1",
+            METRICS_PORT=str(free_port()),
+        )
+        services.start(
+            f"worker-{index}",
+            [sys.executable, "-m", "ingest_worker.main"],
+            env=worker_env,
+            cwd=package_root,
+        )
+
+
+async def wait_for_gateway(services: Services, port: int) -> None:
+    def healthy() -> bool:
+        with urllib.request.urlopen(
+            f"http://127.0.0.1:{port}/v1/health", timeout=2
+        ) as response:  # noqa: S310
+            return bool(json.loads(response.read()).get("ok"))
+
+    async def check() -> bool:
+        return await asyncio.get_running_loop().run_in_executor(None, healthy)
+
+    await wait_until(check, "gateway health", 60, services)
+
+
+async def wait_for_rows(
+    conn,
+    org_id: str,
+    epc_prefix: str,
+    since: datetime,
+    expected: int,
+    timeout: float,
+    services: Services,
+) -> List[Tuple[str, datetime]]:
+    """Poll until expected rows for the prefix are stored or timeout passes; returns (epc, created_at)"""
+    query_filter = (
+        "FROM reads_parent WHERE org_id = $1 AND read_at >= $2 AND epc LIKE $3"
+    )
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        services.check()
+        if (
+            await conn.fetchval(
+                f"SELECT count(*) {query_filter}", org_id, since, epc_prefix + "%"
+            )
+            >= expected
+        ):
+            break
+        await asyncio.sleep(0.25)
+    rows = await conn.fetch(
+        f"SELECT epc, created_at {query_filter}", org_id, since, epc_prefix + "%"
+    )
+    return [(row["epc"], row["created_at"]) for row in rows]
+
+
+async def run(args: argparse.Namespace) -> int:
+    slos = load_slos()
+    slos.update(
+        {
+            name: float(value)
+            for name, value in parse_assignments(args.slo, "--slo").items()
+        }
+    )
+    extra_env = parse_assignments(args.env, "--env")
+
+    work_dir = Path(tempfile.mkdtemp(prefix="weft-bench-"))
+    log_dir = Path(args.log_dir) if args.log_dir else work_dir / "logs"
+    log_dir.mkdir(parents=True, exist_ok=True)
+    services = Services(log_dir)
+    sampler = ResourceSampler(services)
+    org_id = f"bench_{secrets.token_hex(4)}"
+    db_name = f"weft_bench_{os.getpid()}"
+    server_url: Optional[str] = None
+    database_created = False
+    passed = False
+
+    try:
+        redis_url = args.redis_url or await start_redis(services)
+        server_url = args.database_url or await start_postgres(services, work_dir)
+        url, reader = await prepare_database(server_url, db_name, org_id)
+        database_created = True
+
+        common_env = dict(
+            os.environ,
+            ENVIRONMENT="development",
+            DATABASE_URL=url,
+            REDIS_URL=redis_url,
+            TELEMETRY_ENABLED="false",
+            METRICS_ENABLED="true",
+        )
+        gateway_port = free_port()
+        start_gateway(
+            services,
+            dict(
+                common_env,
+                SECRET_KEY=secrets.token_hex(16),
+                ALLOWED_HOSTS="localhost,127.0.0.1",
+                HMAC_SIGNATURE_MODE=args.signature_mode,
+                RATE_LIMITING_ENABLED="false",
+                **extra_env,
+            ),
+            gateway_port,
+        )
+        start_workers(
+            services,
+            dict(common_env, PARTITION_MAINTENANCE_ENABLED="false", **extra_env),
+            args.workers,
+            work_dir,
+        )
+        await wait_for_gateway(services, gateway_port)
+
+        gateway_url = f"http://127.0.0.1:{gateway_port}"
+        conn = await asyncpg.connect(url)
+        try:
+            # Warm up connections, consumer groups and caches; these rows are not measured
+            since = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+            if args.warmup_sec > 0:
+                with open(os.devnull, "w") as devnull:
+                    warmup = await LoadGenerator(
+                        gateway_url,
+                        reader["device_id"],
+                        reader["api_key"],
+                        reader["id"],
+                        min(args.events_per_sec, 500),
+                        batch_size=args.batch_size,
+                        duration_sec=args.warmup_sec,
+                        connections=args.connections,
+                        epc_prefix=WARMUP_EPC_PREFIX,
+                        out=devnull,
+                    ).run()
+                await wait_for_rows(
+                    conn,
+                    org_id,
+                    WARMUP_EPC_PREFIX,
+                    since,
+                    warmup["accepted"],
+                    args.drain_timeout_sec,
+                    services,
+                )
+
+            sent_at: Dict[str, float] = {}
+
+            def on_sent(events: List[dict], at: float) -> None:
+                for event in events:
+                    sent_at[event["data"]["epc"]] = at
+
+            since = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+            sampler.start()
+            load = await LoadGenerator(
+                gateway_url,
+                reader["device_id"],
+                reader["api_key"],
+                reader["id"],
+                args.events_per_sec,
+                batch_size=args.batch_size,
+                duration_sec=args.duration_sec,
+                connections=args.connections,
+                epc_prefix=RUN_EPC_PREFIX,
+                on_sent=on_sent,
+                out=sys.stderr,
+            ).run()
+            rows = await wait_for_rows(
+                conn,
+                org_id,
+                RUN_EPC_PREFIX,
+                since,
+                load["accepted"],
+                args.drain_timeout_sec,
+                services,
+            )
+            sampler.stop()
+        finally:
+            await conn.close()
+
+        latency = LatencyHistogram()
+        for epc, created_at in rows:
+            if epc in sent_at:
+                latency.record((created_at.timestamp() - sent_at[epc]) * 1e6)
+        stored_seconds = (
+            max(created_at.timestamp() for _, created_at in rows)
+            - min(sent_at.values())
+            if rows
+            else 0
+        )
+        pipeline = {
+            "rows": len(rows),
+            "lost": load["accepted"] - len(rows),
+            "rows_per_sec": (
+                round(len(rows) / stored_seconds, 1) if stored_seconds > 0 else 0.0
+            ),
+            "ingest_to_row_ms": latency.summary_ms(),
+        }
+
+        failures = [
+            f"{name} ingest-to-row {pipeline['ingest_to_row_ms'].get(name)} ms > {target:g} ms"
+            for name, target in slos.items()
+            if pipeline["ingest_to_row_ms"].get(name, float("inf")) > target
+        ]
+        if pipeline["lost"]:
+            failures.append(
+                f"{pipeline['lost']} accepted events never reached reads_parent"
+            )
+        if load["rejected"] or load["errors"]:
+            failures.append(
+                f"gateway rejected {load['rejected']} events ({load['errors']} errors)"
+            )
+        if load["eps"] < MIN_RATE_RATIO * args.events_per_sec:
+            failures.append(
+                f"load generator sent {load['eps']} events/s of {args.events_per_sec} targeted"
+            )
+        passed = not failures
+
+        report = {
+            "finished_at": datetime.now(timezone.utc).isoformat(),
+            "config": {
+                "events_per_sec": args.events_per_sec,
+                "batch_size": args.batch_size,
+                "duration_sec": args.duration_sec,
+                "connections": args.connections,
+                "workers": args.workers,
+                "signature_mode": args.signature_mode,
+                "env": extra_env,
+            },
+            "environment": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+                "managed_redis": bool(args.redis_url),
+                "managed_postgres": bool(args.database_url),
+            },
+            "load": load,
+            "pipeline": pipeline,
+            "resources": sampler.report(),
+            "slo": {"targets_ms": slos, "passed": passed, "failures": failures},
+        }
+        Path(args.report).write_text(
+            json.dumps(report, indent=2) + "\n", encoding="utf-8"
+        )
+        print(json.dumps(report))
+        for failure in failures:
+            print(f"SLO FAILED: {failure}", file=sys.stderr)
+        return 0 if passed else 1
+
+    finally:
+        sampler.stop()
+        services.stop(
+            [
+                name
+                for name in list(services.processes)
+                if name not in ("postgres", "redis")
+            ]
+        )
+        if database_created and not args.keep:
+            await drop_database(server_url, db_name)
+        services.stop()
+        if args.keep or not passed:
+            print(f"Logs in {log_dir}, data in {work_dir}", file=sys.stderr)
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(
+        description="Weft end-to-end pipeline benchmark (JSON report, exit 1 on SLO miss)"
+    )
+    ap.add_argument(
+        "-n", "--events-per-sec", type=int, default=1000, help="target events/sec"
+    )
+    ap.add_argument(
+        "-b",
+        "--batch-size",
+        type=int,
+        default=100,
+        help="events per request; 1 uses the single-event endpoint",
+    )
+    ap.add_argument(
+        "-d",
+        "--duration-sec",
+        type=int,
+        default=30,
+        help="measured run time in seconds",
+    )
+    ap.add_argument(
+        "-c",
+        "--connections",
+        type=int,
+        default=32,
+        help="loadgen keep-alive connections",
+    )
+    ap.add_argument(
+        "-w", "--workers", type=int, default=1, help="ingest worker processes"
+    )
+    ap.add_argument(
+        "--warmup-sec",
+        type=int,
+        default=3,
+        help="unmeasured warm-up load before the run",
+    )
+    ap.add_argument(
+        "--drain-timeout-sec",
+        type=float,
+        default=30.0,
+        help="how long to wait for rows after the load ends",
+    )
+    ap.add_argument(
+        "--signature-mode",
+        choices=("canonical", "raw"),
+        default="canonical",
+        help="gateway HMAC_SIGNATURE_MODE",
+    )
+    ap.add_argument(
+        "--redis-url", help="use this Redis instead of starting redis-server"
+    )
+    ap.add_argument(
+        "--database-url",
+        help="Postgres server to create the bench database on, instead of starting one",
+    )
+    ap.add_argument(
+        "--env",
+        action="append",
+        default=[],
+        metavar="NAME=VALUE",
+        help="extra gateway/worker setting, repeatable",
+    )
+    ap.add_argument(
+        "--slo",
+        action="append",
+        default=[],
+        metavar="pNN=MS",
+        help="override an SLO from docs/PERFORMANCE.md",
+    )
+    ap.add_argument("--report", default="pipeline-bench.json", help="JSON report path")
+    ap.add_argument(
+        "--log-dir", help="service logs directory (default: a kept temp dir on failure)"
+    )
+    ap.add_argument(
+        "--keep", action="store_true", help="keep the bench database and temp files"
+    )
+    args = ap.parse_args()
+
+    if asyncpg is None:
+        raise SystemExit(
+            "pipeline_bench needs asyncpg: pip install -r rfid-platform/apps/ingest-worker/requirements.txt"
+        )
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()